@@ -0,0 +1,74 @@
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from app.domain.entities import DataVersion
+
+# Conditional GET: ETag / Last-Modified validators and 304 Not Modified.
+# The validators of a response come from the version of its data (last point of every series, see
+# get_market_chart_version) and from the request itself (path, query parameters, Accept). The version is taken from the
+# fetched data the response is then computed from: both are known before anything is computed, a client polling
+# unchanged data gets a 304 after the fetch (usually a cache hit) instead of a pipeline run or a plot render.
+# Cache-Control max-age is the spacing of the points of the series: no new point can appear before.
+
+
+@dataclass(frozen=True)
+class Validators:
+    etag: str
+    last_modified: datetime #UTC, whole seconds (HTTP dates have no milliseconds)
+    max_age: int
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return {
+            'ETag': self.etag,
+            'Last-Modified': format_datetime(self.last_modified, usegmt=True),
+            'Cache-Control': f'max-age={self.max_age}',
+            'Vary': 'Accept',
+        }
+
+
+def response_validators(request: Request, version: DataVersion) -> Validators:
+    '''
+    Strong ETag of the representation: same request (order of the query parameters aside) + same data -> same bytes.
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.url.path, sorted(request.query_params.multi_items()), request.headers.get('accept', ''), version.last_timestamps):
+        digest.update(repr(part).encode())
+    last_modified = datetime.fromtimestamp(version.last_modified_ms // 1000, tz=timezone.utc)
+    return Validators(f'"{digest.hexdigest()}"', last_modified, version.max_age)
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    #If-None-Match takes precedence: If-Modified-Since is only looked at when there is no If-None-Match (RFC 9110)
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or any(tag.removeprefix('W/') == validators.etag for tag in tags)
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False #invalid dates are ignored
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return validators.last_modified <= since
+    return False
+
+
+def not_modified_response(validators: Validators) -> Response:
+    return Response(status_code=304, headers=validators.headers)
+
+
+def with_validators(result, validators: Validators, response: Response):
+    '''
+    Adds the validators to the headers of result if it is a Response, else to the response FastAPI will build (response
+    is the Response parameter of the route).
+    '''
+    (result if isinstance(result, Response) else response).headers.update(validators.headers)
+    return result
@@ -0,0 +1,155 @@
+import asyncio
+import io
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+import pydantic_core
+from fastapi.responses import Response, StreamingResponse
+
+from app.api.schemas import DataFrameFormat, MarketChartShape
+from app.domain.entities import MarketChartData
+
+# Encoders for DataFrame responses (NDJSON, CSV, Arrow IPC stream, Parquet).
+# The JSON response models build one Python object per value (df.values.tolist() goes through object dtype), validate
+# them and serialize the whole body in memory, and the clients parse the text back into floats. Here the frames are
+# encoded by C writers straight from their column arrays:
+#   - ndjson / csv: the frame is cut into fixed-size row slices (pandas' JSON encoder, Arrow's CSV writer), one chunk each
+#     of a StreamingResponse: memory stays around one encoded batch and the first bytes go out after the first batch.
+#   - arrow: the frame becomes an Arrow table (the numeric columns are not copied) streamed as IPC record batches;
+#     pyarrow.ipc.open_stream(body).read_pandas() / pl.read_ipc_stream rebuild it without any parsing.
+#   - parquet: one compressed Parquet file (pd.read_parquet), the smallest body.
+# NaN -> null / empty field. NDJSON floats keep 15 significant digits (the maximum of pandas' encoder), CSV floats are
+# written in full (shortest round-trip representation), Arrow / Parquet carry the float64 values as they are.
+# Timestamps are sent with millisecond precision.
+
+STREAM_BATCH_ROWS = 5_000
+
+MEDIA_TYPES = {
+    DataFrameFormat.JSON: 'application/json',
+    DataFrameFormat.NDJSON: 'application/x-ndjson',
+    DataFrameFormat.CSV: 'text/csv',
+    DataFrameFormat.ARROW: 'application/vnd.apache.arrow.stream',
+    DataFrameFormat.PARQUET: 'application/vnd.apache.parquet',
+}
+
+_FORMATS_BY_MEDIA_TYPE = {media_type: output_format for output_format, media_type in MEDIA_TYPES.items()}
+_FORMATS_BY_MEDIA_TYPE['application/x-parquet'] = DataFrameFormat.PARQUET
+
+
+def negotiate_format(requested: DataFrameFormat | None, accept: str | None) -> DataFrameFormat:
+    '''
+    The format query parameter if given, else the first media type of the Accept header that has an encoder, else JSON.
+    '''
+    if requested is not None:
+        return requested
+    for media_range in (accept or '').split(','):
+        output_format = _FORMATS_BY_MEDIA_TYPE.get(media_range.split(';')[0].strip().lower())
+        if output_format is not None:
+            return output_format
+    return DataFrameFormat.JSON
+
+
+def iter_ndjson(df: pd.DataFrame, batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[bytes]:
+    '''
+    One JSON object per row ({"column": value, ...}), one line each, timestamps in ISO 8601 (ms).
+    '''
+    for start in range(0, len(df), batch_rows):
+        chunk = df.iloc[start:start + batch_rows].to_json(orient='records', lines=True, date_format='iso', date_unit='ms', double_precision=15)
+        if not chunk.endswith('\n'):
+            chunk += '\n'
+        yield chunk.encode()
+
+
+def _timestamps_to_ms(table: pa.Table) -> pa.Table:
+    #datetime64[ns] columns would be written with 9 decimals: same millisecond precision as the NDJSON output
+    for i, field in enumerate(table.schema):
+        if pa.types.is_timestamp(field.type) and field.type.unit != 'ms':
+            table = table.set_column(i, field.name, table.column(i).cast(pa.timestamp('ms', field.type.tz), safe=False))
+    return table
+
+
+def iter_csv(df: pd.DataFrame, batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[bytes]:
+    '''
+    Header line, then the rows batch by batch. Timestamps as "YYYY-MM-DD HH:MM:SS.mmm".
+    '''
+    for start in range(0, max(len(df), 1), batch_rows):
+        buffer = io.BytesIO()
+        batch = _timestamps_to_ms(pa.Table.from_pandas(df.iloc[start:start + batch_rows], preserve_index=False))
+        pa_csv.write_csv(batch, buffer, pa_csv.WriteOptions(include_header=start == 0))
+        yield buffer.getvalue()
+
+
+def _arrow_table(df: pd.DataFrame) -> pa.Table:
+    return _timestamps_to_ms(pa.Table.from_pandas(df, preserve_index=False))
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def iter_arrow(df: pd.DataFrame, batch_rows: int = STREAM_BATCH_ROWS) -> Iterator[bytes]:
+    '''
+    Arrow IPC stream: schema, one record batch per slice of batch_rows rows, end-of-stream marker.
+    '''
+    table = _arrow_table(df)
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, table.schema) as writer:
+        yield _drain(buffer)
+        for batch in table.to_batches(max_chunksize=batch_rows):
+            writer.write_batch(batch)
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def encode_parquet(df: pd.DataFrame) -> bytes:
+    #the footer is written last: a Parquet body can't be read before it is complete, no point in streaming it
+    sink = pa.BufferOutputStream()
+    pq.write_table(_arrow_table(df), sink)
+    return sink.getvalue().to_pybytes()
+
+
+_STREAMED = {
+    DataFrameFormat.NDJSON: iter_ndjson,
+    DataFrameFormat.CSV: iter_csv,
+    DataFrameFormat.ARROW: iter_arrow,
+}
+
+
+async def dataframe_response(df: pd.DataFrame, output_format: DataFrameFormat, batch_rows: int = STREAM_BATCH_ROWS) -> Response:
+    '''
+    Response of df in a non-JSON format. Encoding runs in worker threads, never on the event loop.
+    '''
+    media_type = MEDIA_TYPES[output_format]
+    headers = {'Vary': 'Accept'}
+    if output_format is DataFrameFormat.PARQUET:
+        return Response(await asyncio.to_thread(encode_parquet, df), media_type=media_type, headers=headers)
+    #sync iterator: Starlette consumes it in a worker thread
+    return StreamingResponse(_STREAMED[output_format](df, batch_rows), media_type=media_type, headers=headers)
+
+
+# JSON of a market chart straight from its columns.
+# MarketChartResponse.from_domain builds one pydantic model per point, and FastAPI validates the response model again and
+# encodes it with the json module. Here the timestamps are formatted in one vectorized call and the Rust encoder of
+# pydantic_core writes the body from plain lists: same document as the response models (MarketChartResponse /
+# MarketChartColumnsResponse), no model instance per point, no second validation.
+
+def encode_market_chart_json(data: MarketChartData, shape: MarketChartShape = MarketChartShape.POINTS) -> bytes:
+    '''
+    JSON body of the points (or columns) shape, timestamps in ISO 8601 (ms), missing prices as null.
+    '''
+    timestamps = np.datetime_as_string(data.datetimes, unit='ms').tolist()
+    prices = data.prices.tolist()
+    body = {'symbol': data.symbol.value, 'currency': data.currency.value}
+    if shape is MarketChartShape.COLUMNS:
+        body['timestamps'] = timestamps
+        body['prices'] = prices
+    else:
+        body['points'] = [{'timestamp': timestamp, 'price': price} for timestamp, price in zip(timestamps, prices)]
+    return pydantic_core.to_json(body, inf_nan_mode='null')
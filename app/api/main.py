@@ -1,16 +1,34 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
 from app.api.routes.market_chart import router as router_market_chart
+from app.api.routes.admin import router as router_admin
+from app.infrastructure.http_client import init_http_client, close_http_client, init_async_http_client, close_async_http_client
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: pooled keep-alive HTTP clients shared by all requests to the providers (sync and asyncio paths)
+    init_http_client()
+    init_async_http_client()
+    yield
+    # Shutdown: release the pooled connections
+    await close_async_http_client()
+    close_http_client()
+
 
 app = FastAPI(
     title="Crypto Analytics Engine",
     description="API for fetching, analyzing, and visualizing historical cryptocurrency market data.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(router_market_chart, prefix = '/api/v1')
+app.include_router(router_admin, prefix = '/api/v1')
 
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
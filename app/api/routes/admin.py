@@ -0,0 +1,34 @@
+from fastapi import APIRouter
+
+from app.domain.services import get_fetch_coalescing_stats, get_market_chart_cache_stats, get_market_chart_band_stats, flush_market_chart_cache
+
+
+router = APIRouter(prefix='/admin', tags=['admin'])
+
+
+@router.get('/singleflight',
+            summary='Inspect upstream request coalescing',
+            description='Counters of the single-flight layer: total fetch calls, upstream executions and calls coalesced into an in-flight request, for the threaded and the asyncio paths.')
+async def get_singleflight_stats() -> dict:
+    return get_fetch_coalescing_stats()
+
+
+@router.get('/cache',
+            summary='Inspect the market chart cache',
+            description='Entries, estimated bytes, bounds, hit/miss counters, expirations and LRU evictions of the in-process market chart cache.')
+async def get_cache_stats() -> dict:
+    return get_market_chart_cache_stats()
+
+
+@router.get('/bands',
+            summary='Inspect the granularity band canonicalization',
+            description='Requests per band, requests for a non-canonical number of days, how many of them were served by slicing an already cached band series (slice hits, hit ratio) and how many band series were fetched upstream.')
+async def get_band_stats() -> dict:
+    return get_market_chart_band_stats()
+
+
+@router.delete('/cache',
+               summary='Flush the market chart cache',
+               description='Remove every cached market chart. The next request for each key goes upstream again.')
+async def delete_cache() -> dict:
+    return {'flushed': flush_market_chart_cache()}
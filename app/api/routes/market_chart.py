@@ -1,22 +1,31 @@
-from typing import Optional
-from fastapi import APIRouter, HTTPException, Query
+from typing import Annotated, Awaitable, Optional, TypeVar
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from pydantic import Field
 from fastapi.responses import Response
+import asyncio
+import base64
 import tempfile
 import os
 import re
 
-from app.api.schemas import MarketChartResponse, StatsResponse, DataFrameResponse
-from app.domain.entities import ResampleFrequency, Symbol, Currency, Provider
-from app.domain.services import fetch_market_chart, compute_market_chart_stats, compute_enriched_market_chart
+from app.api.schemas import MarketChartResponse, MarketChartColumnsResponse, MarketChartShape, StatsResponse, DataFrameResponse, DataFrameFormat, CorrelationResponse, ReportResponse
+from app.api.encoders import negotiate_format, dataframe_response, encode_market_chart_json
+from app.api.conditional import response_validators, is_not_modified, not_modified_response, with_validators
+from app.domain.entities import ResampleFrequency, CandleFrequency, Symbol, Currency, Provider
+from app.domain.services import fetch_market_chart_async, fetch_market_charts_async, fetch_market_chart_stats_source_async, compute_market_chart_stats_async, compute_enriched_market_chart_async, compute_latest_enriched_row_async, compute_market_chart_candles_async, compute_panel_async, compute_rolling_correlations_async, compute_market_chart_report_async, get_market_chart_version, get_market_chart_stats_version
 from app.domain import errors
 from app.services.analytics import convert_market_chart_data_to_dataframe
 from datetime import datetime
 
-from app.reports.plots import plot_enriched_price
+from app.reports.plots import plot_enriched_price, plot_correlation_heatmap
 
 
 router = APIRouter(prefix='/market_chart', tags=['market-chart'])
 
+T = TypeVar('T')
+
+EXACT_CURRENCY_DESCRIPTION = "Always fetch the requested currency from the provider. By default a fiat currency other than the base one may be derived from already cached base-currency series with the BTC cross rate."
+
 
 def _hide_url(message: str) -> str:
     if not message:
@@ -24,14 +33,56 @@ def _hide_url(message: str) -> str:
     return re.sub(r"https?://\S+", "", message).strip()
 
 
-@router.get('/',
-            response_model=MarketChartResponse,
-            summary='Fetch crypto data for market chart',
-            description='Retrieve historical market chart data for a specified cryptocurrency, currency, and number of days.')
-def get_market_chart(symbol: Symbol, currency: Currency, days: int, provider: Provider):
+# Renders a PNG with one of the app.reports.plots functions (they write to a path) and returns its bytes.
+# Matplotlib work is CPU-bound: the routes run it in a worker thread.
+def _render_png(plot, **kwargs) -> bytes:
+    tmp_path: str | None = None
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
+            tmp_path = tmp.name
+
+        plot(out_path=tmp_path, **kwargs)
+
+        with open(tmp_path, "rb") as f:
+            return f.read()
 
+    finally:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _render_enriched_png(df, symbol: Symbol, currency: Currency, provider: Provider, frequency: ResampleFrequency | None) -> bytes:
+    return _render_png(
+        plot_enriched_price,
+        df=df,
+        symbol=symbol,
+        currency=currency,
+        provider=provider,
+        price_key="price",
+        resample_frequency=frequency,
+    )
+
+
+def _render_correlation_png(moments, currency: Currency) -> bytes:
+    #latest window
+    last = str(moments.timestamps[-1:].view("datetime64[ms]").astype("datetime64[m]")[0]).replace("T", " ")
+    return _render_png(
+        plot_correlation_heatmap,
+        correlation=moments.correlation[-1],
+        labels=moments.labels,
+        title=f"Correlation of {currency.name} returns — window of {moments.window} points ending {last} UTC",
+    )
+
+
+# The data of a response is fetched once: its version gives the validators (ETag / Last-Modified, see
+# app/api/conditional.py), then the response is computed from the same data. A client polling unchanged data gets a 304
+# after the fetch (usually a cache hit) instead of a pipeline run or a plot render.
+async def _fetched_or_http_error(fetch: Awaitable[T]) -> T:
     try:
-        data = fetch_market_chart(symbol, currency, days, provider)
+        return await fetch
 
     except errors.BusinessValidationError as e:
         raise HTTPException(status_code=400, detail=_hide_url(str(e)))
@@ -48,17 +99,60 @@ def get_market_chart(symbol: Symbol, currency: Currency, days: int, provider: Pr
     except errors.BusinessNoDataError as e:
         raise HTTPException(status_code=404, detail=_hide_url(str(e)))
 
-    return MarketChartResponse.from_domain(data)
+
+@router.get('/',
+            response_model=MarketChartResponse | MarketChartColumnsResponse,
+            summary='Fetch crypto data for market chart',
+            description='Retrieve historical market chart data for a specified cryptocurrency, currency, and number of days.')
+async def get_market_chart(
+    request: Request,
+    response: Response,
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+    format: Optional[DataFrameFormat] = Query(None, description="json (default), ndjson, csv, arrow (Arrow IPC stream) or parquet. Also negotiated from the Accept header (e.g. application/vnd.apache.arrow.stream)."),
+    accept: Optional[str] = Header(None, include_in_schema=False),
+    shape: MarketChartShape = Query(MarketChartShape.POINTS, description="JSON shape: points (list of {timestamp, price}) or columns ({timestamps: [...], prices: [...]}, about a third smaller)."),
+):
+    data = await _fetched_or_http_error(fetch_market_chart_async(symbol, currency, days, provider, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version([data], days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    output_format = negotiate_format(format, accept)
+    if output_format is not DataFrameFormat.JSON:
+        return with_validators(await dataframe_response(convert_market_chart_data_to_dataframe(data), output_format), validators, response)
+
+    #encoded from the columns, the response models only document the shapes
+    body = await asyncio.to_thread(encode_market_chart_json, data, shape)
+    return with_validators(Response(content=body, media_type='application/json'), validators, response)
 
 
 @router.get('/stats',
             response_model=StatsResponse,
             summary='Fetch statistics for market chart data',
-            description='Retrieve statistical information (mean, median, std deviation) for historical market chart data of a specified cryptocurrency, currency, and number of days.')
-def get_market_chart_stats(symbol: Symbol, currency: Currency, days: int, provider: Provider):
+            description='Retrieve statistical information (mean, median, std deviation, skewness, kurtosis, p1/p5/p50/p95/p99 price and return quantiles) for historical market chart data of a specified cryptocurrency, currency, and number of days.')
+async def get_market_chart_stats(
+    request: Request,
+    response: Response,
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    exact: Optional[bool] = Query(None, description="Exact median and quantiles (sort of the whole window). By default exact for short windows, estimated from mergeable quantile sketches for long ones."),
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+    format: Optional[DataFrameFormat] = Query(None, description="json (default), ndjson, csv, arrow or parquet (one row, quantiles as price_p1 ... return_p99 columns). Also negotiated from the Accept header."),
+    accept: Optional[str] = Header(None, include_in_schema=False),
+):
+    source = await _fetched_or_http_error(fetch_market_chart_stats_source_async(symbol, currency, days, provider, exact=exact, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_stats_version(source, days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
 
     try:
-        stats = compute_market_chart_stats(symbol, currency, days, provider)
+        stats = await compute_market_chart_stats_async(symbol, currency, days, provider, exact=exact, exact_currency=exact_currency, source=source)
     except errors.BusinessValidationError as e:
         raise HTTPException(status_code=400, detail=_hide_url(str(e)))
 
@@ -79,36 +173,251 @@ def get_market_chart_stats(symbol: Symbol, currency: Currency, days: int, provid
 
     stats = StatsResponse.from_dict(stats)
 
-    return stats
+    output_format = negotiate_format(format, accept)
+    if output_format is not DataFrameFormat.JSON:
+        return with_validators(await dataframe_response(stats.to_dataframe(), output_format), validators, response)
+
+    return with_validators(stats, validators, response)
 
 
 @router.get('/dataframe', response_model=DataFrameResponse,
             summary='Fetch enriched market chart data as DataFrame',
             description='Retrieve enriched historical market chart data for a specified cryptocurrency, currency, and number of days, with optional analytics such as resampling frequency, rolling window, normalization, and volatility calculation.')
-def get_market_chart_dataframe(
+async def get_market_chart_dataframe(
+    request: Request,
+    response: Response,
     symbol: Symbol,
     currency: Currency,
     days: int,
     provider: Provider,
     frequency: Optional[ResampleFrequency] = None,
-    window_size: Optional[int] = None,
+    window_size: Optional[list[int]] = Query(None, description="Rolling mean window(s). Repeat the parameter for several windows: window_size=7&window_size=30."),
     normalize_base: Optional[float] = None,
-    volatility_window: Optional[int] = None,
+    volatility_window: Optional[list[int]] = Query(None, description="Volatility window(s). Repeat the parameter for several windows."),
     start: Optional[datetime] = None,
     end: Optional[datetime] = None,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+    format: Optional[DataFrameFormat] = Query(None, description="json: columns + rows in one body (default). ndjson / csv / arrow: rows streamed in fixed-size batches (chunked response, bounded memory). parquet: one Parquet file. Also negotiated from the Accept header (e.g. application/vnd.apache.arrow.stream)."),
+    accept: Optional[str] = Header(None, include_in_schema=False),
+):
+    raw_chart = await _fetched_or_http_error(fetch_market_chart_async(symbol, currency, days, provider, start=start, end=end, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version([raw_chart], days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        df = await compute_enriched_market_chart_async(
+            symbol=symbol,
+            currency=currency,
+            days=days,
+            provider=provider,
+            frequency=frequency,
+            window_size=window_size,
+            normalize_base=normalize_base,
+            volatility_window=volatility_window,
+            start=start,
+            end=end,
+            exact_currency=exact_currency,
+            raw_chart=raw_chart,
+        )
+
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=_hide_url(str(e)))
+
+    except errors.BusinessComputationError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    output_format = negotiate_format(format, accept)
+    if output_format is not DataFrameFormat.JSON:
+        return with_validators(await dataframe_response(df, output_format), validators, response)
+
+    return with_validators(await asyncio.to_thread(DataFrameResponse.from_dataframe, df), validators, response)
+
+
+@router.get('/latest-enriched', response_model=DataFrameResponse,
+            summary='Fetch the latest enriched point',
+            description='Return the enriched row of the most recent point. The analytics state of the series is kept between calls and only the new points are ingested, so refreshing costs O(1) per new point instead of recomputing the whole history. Returns and normalization are relative to the first point the state ingested.')
+async def get_market_chart_latest_enriched(
+    request: Request,
+    response: Response,
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: Optional[list[int]] = Query(None, description="Rolling mean window(s). Repeat the parameter for several windows."),
+    normalize_base: Optional[float] = None,
+    volatility_window: Optional[list[int]] = Query(None, description="Volatility window(s). Repeat the parameter for several windows."),
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+):
+    raw_chart = await _fetched_or_http_error(fetch_market_chart_async(symbol, currency, days, provider, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version([raw_chart], days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        df = await compute_latest_enriched_row_async(
+            symbol=symbol,
+            currency=currency,
+            days=days,
+            provider=provider,
+            window_size=window_size,
+            normalize_base=normalize_base,
+            volatility_window=volatility_window,
+            exact_currency=exact_currency,
+            raw_chart=raw_chart,
+        )
+
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=_hide_url(str(e)))
+
+    except errors.BusinessComputationError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    return with_validators(DataFrameResponse.from_dataframe(df), validators, response)
+
+
+@router.get('/candles', response_model=DataFrameResponse,
+            summary='Fetch OHLC candles',
+            description='Open/high/low/close candles (hourly, four_hours, daily, weekly, monthly or yearly buckets, UTC, weeks start on Monday) of the market chart. volume_24h is included when the series has volumes. Closed candles are cached per series: only the open bucket is recomputed when new points arrive.')
+async def get_market_chart_candles(
+    request: Request,
+    response: Response,
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: CandleFrequency = CandleFrequency.DAILY,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
 ):
+    raw_chart = await _fetched_or_http_error(fetch_market_chart_async(symbol, currency, days, provider, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version([raw_chart], days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
     try:
-        df = compute_enriched_market_chart(
+        df = await compute_market_chart_candles_async(
             symbol=symbol,
             currency=currency,
             days=days,
             provider=provider,
             frequency=frequency,
+            exact_currency=exact_currency,
+            raw_chart=raw_chart,
+        )
+
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=_hide_url(str(e)))
+
+    return with_validators(await asyncio.to_thread(DataFrameResponse.from_dataframe, df), validators, response)
+
+
+@router.get('/panel', response_model=DataFrameResponse,
+            summary='Fetch a multi-asset panel',
+            description='Align several cryptocurrencies on a common time index (as-of join on the timestamps of the densest series, over the period covered by all of them) and enrich all of them in one vectorized pass. Rows are sorted by timestamp then asset.')
+async def get_market_chart_panel(
+    request: Request,
+    response: Response,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    symbol: list[Symbol] = Query(..., description="Assets of the panel. Repeat the parameter: symbol=bitcoin&symbol=ethereum."),
+    window_size: Optional[list[int]] = Query(None, description="Rolling mean window(s). Repeat the parameter for several windows."),
+    normalize_base: Optional[float] = None,
+    volatility_window: Optional[list[int]] = Query(None, description="Volatility window(s). Repeat the parameter for several windows."),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+):
+    charts = await _fetched_or_http_error(fetch_market_charts_async(symbol, currency, days, provider, start=start, end=end, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version(charts, days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    try:
+        df = await compute_panel_async(
+            symbols=symbol,
+            currency=currency,
+            days=days,
+            provider=provider,
             window_size=window_size,
             normalize_base=normalize_base,
             volatility_window=volatility_window,
             start=start,
             end=end,
+            exact_currency=exact_currency,
+            charts=charts,
+        )
+
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=_hide_url(str(e)))
+
+    except errors.BusinessComputationError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    return with_validators(await asyncio.to_thread(DataFrameResponse.from_dataframe, df), validators, response)
+
+
+async def _rolling_correlations_or_http_error(symbols, currency, days, provider, window, benchmark, start, end, exact_currency, charts):
+    try:
+        return await compute_rolling_correlations_async(
+            symbols=symbols,
+            currency=currency,
+            days=days,
+            provider=provider,
+            window=window,
+            benchmark=benchmark,
+            start=start,
+            end=end,
+            exact_currency=exact_currency,
+            charts=charts,
         )
 
     except errors.BusinessValidationError as e:
@@ -129,7 +438,59 @@ def get_market_chart_dataframe(
     except errors.BusinessComputationError as e:
         raise HTTPException(status_code=500, detail=_hide_url(str(e)))
 
-    return DataFrameResponse.from_dataframe(df)
+
+@router.get('/correlation', response_model=CorrelationResponse,
+            summary='Fetch rolling correlation, covariance and beta matrices',
+            description='Rolling covariance and correlation matrices of the returns of several cryptocurrencies, and the beta of every asset against the benchmark (added to the assets if missing), for every window of the aligned panel. All windows come from shared prefix sums of the cross-products.')
+async def get_market_chart_correlation(
+    request: Request,
+    response: Response,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window: int = Query(..., gt=1, description="Number of returns per window."),
+    symbol: list[Symbol] = Query(..., description="Assets. Repeat the parameter: symbol=bitcoin&symbol=ethereum."),
+    benchmark: Symbol = Query(Symbol.BTC, description="Benchmark asset of the betas."),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+):
+    #the benchmark is part of the charts (appended when missing, like the use case does)
+    charts = await _fetched_or_http_error(fetch_market_charts_async(symbol + [benchmark], currency, days, provider, start=start, end=end, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version(charts, days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    moments = await _rolling_correlations_or_http_error(symbol, currency, days, provider, window, benchmark, start, end, exact_currency, charts)
+    return with_validators(await asyncio.to_thread(CorrelationResponse.from_domain, moments, benchmark), validators, response)
+
+
+@router.get('/correlation/plot',
+            summary='Get the latest correlation matrix as a PNG heatmap',
+            description='Heatmap of the correlation matrix of the most recent window (same parameters as /correlation).',
+            response_class=Response)
+async def get_market_chart_correlation_plot(
+    request: Request,
+    response: Response,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window: int = Query(..., gt=1, description="Number of returns per window."),
+    symbol: list[Symbol] = Query(..., description="Assets. Repeat the parameter: symbol=bitcoin&symbol=ethereum."),
+    benchmark: Symbol = Query(Symbol.BTC, description="Benchmark asset (always part of the matrix)."),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+):
+    #the benchmark is part of the charts (appended when missing, like the use case does)
+    charts = await _fetched_or_http_error(fetch_market_charts_async(symbol + [benchmark], currency, days, provider, start=start, end=end, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version(charts, days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
+    moments = await _rolling_correlations_or_http_error(symbol, currency, days, provider, window, benchmark, start, end, exact_currency, charts)
+    img_bytes = await asyncio.to_thread(_render_correlation_png, moments, currency)
+    return with_validators(Response(content=img_bytes, media_type="image/png"), validators, response)
 
 
 @router.get(
@@ -141,20 +502,28 @@ def get_market_chart_dataframe(
     ),
     response_class=Response,
 )
-def get_market_chart_plot_enriched(
+async def get_market_chart_plot_enriched(
+    request: Request,
+    response: Response,
     symbol: Symbol,
     currency: Currency,
     days: int = Query(..., description="Number of historical days to fetch."),
     provider: Provider = Query(..., description="Data provider to use."),
     frequency: ResampleFrequency | None = Query(None, description="Optional resampling frequency (e.g. DAILY, WEEKLY)."),
-    window_size: int | None = Query(None, gt=0, description="Rolling window size for moving average (if provided)."),
+    window_size: list[Annotated[int, Field(gt=0)]] | None = Query(None, description="Rolling window size(s) for moving averages. Repeat the parameter for several windows."),
     normalize_base: float | None = Query(None, description="Base value for normalized price series (e.g. 100.0)."),
-    volatility_window: int | None = Query(None, gt=1, description="Rolling window size for volatility calculation."),
+    volatility_window: list[Annotated[int, Field(gt=1)]] | None = Query(None, description="Rolling window size(s) for volatility. Repeat the parameter for several windows."),
     start: datetime | None = Query(None, description="Optional start datetime (ISO-8601) to trim the dataset."),
     end: datetime | None = Query(None, description="Optional end datetime (ISO-8601) to trim the dataset."),
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
 ):
+    raw_chart = await _fetched_or_http_error(fetch_market_chart_async(symbol, currency, days, provider, start=start, end=end, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version([raw_chart], days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
+
     try:
-        df = compute_enriched_market_chart(
+        df = await compute_enriched_market_chart_async(
             symbol=symbol,
             currency=currency,
             days=days,
@@ -165,6 +534,8 @@ def get_market_chart_plot_enriched(
             volatility_window=volatility_window,
             start=start,
             end=end,
+            exact_currency=exact_currency,
+            raw_chart=raw_chart,
         )
 
     except errors.BusinessValidationError as e:
@@ -182,29 +553,76 @@ def get_market_chart_plot_enriched(
     except Exception as e:
         raise HTTPException(status_code=500, detail=_hide_url(f"Unexpected error: {e}"))
 
-    tmp_path: str | None = None
-    try:
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            tmp_path = tmp.name
+    img_bytes = await asyncio.to_thread(_render_enriched_png, df, symbol, currency, provider, frequency)
+    return with_validators(Response(content=img_bytes, media_type="image/png"), validators, response)
+
+
+@router.get('/report', response_model=ReportResponse,
+            summary='Fetch statistics, enriched data and plot in one call',
+            description='Statistics, enriched DataFrame and enriched PNG plot (base64) of a market chart, computed from one fetch and one run of the enrichment pipeline (same parameters as /dataframe). The statistics describe the enriched frame, after trimming and resampling.')
+async def get_market_chart_report(
+    request: Request,
+    response: Response,
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: Optional[ResampleFrequency] = None,
+    window_size: Optional[list[Annotated[int, Field(gt=0)]]] = Query(None, description="Rolling mean window(s). Repeat the parameter for several windows."),
+    normalize_base: Optional[float] = None,
+    volatility_window: Optional[list[Annotated[int, Field(gt=1)]]] = Query(None, description="Volatility window(s). Repeat the parameter for several windows."),
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    exact_currency: bool = Query(False, description=EXACT_CURRENCY_DESCRIPTION),
+):
+    raw_chart = await _fetched_or_http_error(fetch_market_chart_async(symbol, currency, days, provider, start=start, end=end, exact_currency=exact_currency))
+    validators = response_validators(request, get_market_chart_version([raw_chart], days))
+    if is_not_modified(request, validators):
+        return not_modified_response(validators)
 
-        plot_enriched_price(
-            df=df,
-            out_path=tmp_path,
+    try:
+        df, stats = await compute_market_chart_report_async(
             symbol=symbol,
             currency=currency,
+            days=days,
             provider=provider,
-            price_key="price",
-            resample_frequency=frequency,
+            frequency=frequency,
+            window_size=window_size,
+            normalize_base=normalize_base,
+            volatility_window=volatility_window,
+            start=start,
+            end=end,
+            exact_currency=exact_currency,
+            raw_chart=raw_chart,
         )
 
-        with open(tmp_path, "rb") as f:
-            img_bytes = f.read()
+    except errors.BusinessValidationError as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
 
-        return Response(content=img_bytes, media_type="image/png")
+    except errors.BusinessProviderNotCompatible as e:
+        raise HTTPException(status_code=400, detail=_hide_url(str(e)))
+
+    except errors.BusinessProviderGeneralError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessMalformedDataError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    except errors.BusinessNoDataError as e:
+        raise HTTPException(status_code=404, detail=_hide_url(str(e)))
+
+    except errors.BusinessComputationError as e:
+        raise HTTPException(status_code=500, detail=_hide_url(str(e)))
+
+    #the frame is serialized while the plot is rendered
+    frame, img_bytes = await asyncio.gather(
+        asyncio.to_thread(DataFrameResponse.from_dataframe, df),
+        asyncio.to_thread(_render_enriched_png, df, symbol, currency, provider, frequency),
+    )
+    report = ReportResponse(
+        stats=StatsResponse.from_dict(stats),
+        dataframe=frame,
+        image_png_base64=base64.b64encode(img_bytes).decode('ascii'),
+    )
+    return with_validators(report, validators, response)
 
-    finally:
-        if tmp_path is not None and os.path.exists(tmp_path):
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
\ No newline at end of file
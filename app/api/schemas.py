@@ -1,7 +1,10 @@
 from datetime import datetime
+from enum import Enum
 from typing import Any
 from pydantic import BaseModel
+import numpy as np
 from app.domain.entities import Symbol, Currency, MarketChartData, PricePoint
+from app.services.correlation import RollingCrossMoments
 import pandas as pd
 
 class PricePointResponse(BaseModel):
@@ -24,14 +27,22 @@ class MarketChartResponse(BaseModel):
     def from_domain(cls, domain_market_chart_data: MarketChartData) -> 'MarketChartResponse':
         sym = domain_market_chart_data.symbol
         cur = domain_market_chart_data.currency
-        pts = []
-        for price_point in domain_market_chart_data.points:
-            #Convert to PricePointResponse and append to my list of PricePointResponse
-            pts.append(PricePointResponse.from_domain(price_point))
-        #WITH LIST COMPREHENSION
-        #pts = [PricePointResponse.from_domain(p) for p in domain_market_chart_data.points]
+        #Read the columns directly (one vectorized conversion each) instead of going through the PricePoint view
+        timestamps = domain_market_chart_data.datetimes.astype(object).tolist()
+        prices = domain_market_chart_data.prices.tolist()
+        pts = [PricePointResponse(timestamp=ts, price=px) for ts, px in zip(timestamps, prices)]
         return cls(symbol=sym, currency=cur, points=pts)
 
+class MarketChartShape(Enum):
+    POINTS  = 'points'   #MarketChartResponse: {"points": [{"timestamp": ..., "price": ...}, ...]}
+    COLUMNS = 'columns'  #MarketChartColumnsResponse: {"timestamps": [...], "prices": [...]}, about a third smaller
+
+class MarketChartColumnsResponse(BaseModel):
+    symbol: Symbol
+    currency: Currency
+    timestamps: list[datetime]
+    prices: list[float | None] #missing prices are null
+
 class StatsResponse(BaseModel):
     count: int
     min_price: float
@@ -43,10 +54,30 @@ class StatsResponse(BaseModel):
     first_price: float
     last_price: float
     percent_change: float
+    skewness: float | None = None #None when there are too few points (3 for skewness, 4 for kurtosis)
+    kurtosis: float | None = None #excess kurtosis
+    price_quantiles: dict[str, float | None] | None = None #p1, p5, p50, p95, p99 of the prices
+    return_quantiles: dict[str, float | None] | None = None #same quantiles of the returns between consecutive points, in %
+    exact: bool | None = None #False: median and quantiles estimated from quantile sketches
 
     @classmethod
     def from_dict(cls, dict_stats: dict) -> 'StatsResponse':
-        return cls(**dict_stats) #cleaner and professional way to do it
+        optional = {key: None for key in ('skewness', 'kurtosis') if key in dict_stats and np.isnan(dict_stats[key])}
+        for key in ('price_quantiles', 'return_quantiles'):
+            if dict_stats.get(key) is not None:
+                optional[key] = {label: None if np.isnan(q) else q for label, q in dict_stats[key].items()}
+        return cls(**{**dict_stats, **optional}) #cleaner and professional way to do it
+
+    def to_dataframe(self) -> pd.DataFrame:
+        #one row for the tabular formats: the quantile dicts become columns (price_p1 ... return_p99)
+        #missing values back to NaN: float columns, not object ones
+        row = self.model_dump(exclude={'price_quantiles', 'return_quantiles'})
+        for key in ('skewness', 'kurtosis'):
+            row[key] = np.nan if row[key] is None else row[key]
+        for prefix, quantiles in (('price', self.price_quantiles), ('return', self.return_quantiles)):
+            for label, value in (quantiles or {}).items():
+                row[f'{prefix}_{label}'] = np.nan if value is None else value
+        return pd.DataFrame([row])
     
     '''
     Non-professional way to do it:
@@ -76,6 +107,13 @@ class StatsResponse(BaseModel):
         )
         '''
 
+class DataFrameFormat(Enum):
+    JSON    = 'json'    #response model of the route
+    NDJSON  = 'ndjson'  #streamed, one JSON object per row
+    CSV     = 'csv'     #streamed, header + rows
+    ARROW   = 'arrow'   #streamed Arrow IPC (record batches)
+    PARQUET = 'parquet' #one Parquet file
+
 class DataFrameResponse(BaseModel):
     columns: list[str]
     rows: list[list[Any]]
@@ -89,4 +127,34 @@ class DataFrameResponse(BaseModel):
         
         
         
-        
\ No newline at end of file
+        
+
+class ReportResponse(BaseModel):
+    stats: StatsResponse #statistics of the enriched frame
+    dataframe: DataFrameResponse
+    image_png_base64: str #enriched chart (same PNG as /plot-enriched), base64-encoded
+
+def _nan_to_none(values: np.ndarray) -> list:
+    #NaN is not valid JSON: missing values are sent as null
+    return np.where(np.isnan(values), None, values).tolist()
+
+class CorrelationResponse(BaseModel):
+    assets: list[str]
+    benchmark: str
+    window: int
+    timestamps: list[datetime] #end of every window
+    covariance: list[list[list[float | None]]] #[time][asset][asset]
+    correlation: list[list[list[float | None]]]
+    beta: list[list[float | None]] #[time][asset], against the benchmark
+    
+    @classmethod
+    def from_domain(cls, moments: RollingCrossMoments, benchmark: Symbol) -> 'CorrelationResponse':
+        return cls(
+            assets=moments.labels,
+            benchmark=benchmark.value,
+            window=moments.window,
+            timestamps=moments.timestamps.view('datetime64[ms]').astype(object).tolist(),
+            covariance=_nan_to_none(moments.covariance),
+            correlation=_nan_to_none(moments.correlation),
+            beta=_nan_to_none(moments.beta(benchmark.value)),
+        )
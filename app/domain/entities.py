@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from enum import Enum
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import numpy as np
 
 
 class Symbol(Enum):
@@ -28,8 +29,8 @@ class Provider(Enum):
 
 #---
 
-#The following 2 classes are immutable (no more attributes) and will be used just for storing data in timestamp, price and symbol, currency and points. 
-#@dataclass would make the code with less boilerplate (no __init__ and no __repr__). In this case I will define one class with decorator @dataclass and the other raw mode, in order to learn.
+#The following 2 classes are used just for storing data in timestamp, price and symbol, currency and points. 
+#@dataclass would make the code with less boilerplate (no __init__ and no __repr__). PricePoint uses the decorator, MarketChartData is written raw mode because it stores columns (arrays) instead of a list of points.
 
 @dataclass(frozen=True)
 class PricePoint:
@@ -37,15 +38,99 @@ class PricePoint:
     price: float
 
 
+#Timestamps are stored as int64 milliseconds since the epoch (UTC). Naive datetimes are read as UTC wall-clock time.
+_EPOCH = datetime(1970, 1, 1)
+
+def datetime_to_epoch_ms(dt: datetime) -> int:
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // timedelta(milliseconds=1)
+
+
 class MarketChartData:
+    '''
+    Columnar price series: contiguous int64 epoch-ms timestamps + float64 prices (NumPy arrays, read-only).
+    `points` is a lazy list[PricePoint] view kept for the code that still iterates point by point.
+    market_caps / total_volumes are optional float64 columns aligned with the timestamps (NaN where unknown).
+    '''
     symbol: Symbol
     currency: Currency
-    points: list[PricePoint]
+    timestamps: np.ndarray
+    prices: np.ndarray
+    market_caps: np.ndarray | None
+    total_volumes: np.ndarray | None
     
-    def __init__(self, symbol: Symbol, currency: Currency, points: list[PricePoint]):
+    def __init__(self, symbol: Symbol, currency: Currency, points: list[PricePoint] | None = None, *,
+                 timestamps: np.ndarray | None = None, prices: np.ndarray | None = None,
+                 market_caps: np.ndarray | None = None, total_volumes: np.ndarray | None = None):
         self.symbol = symbol
         self.currency = currency
-        self.points = points #Reference assignment, no copy of the list, keep in mind.
+        if points is not None:
+            #Legacy construction from PricePoints: the list is kept as the points view, the arrays are built once
+            timestamps = np.fromiter((datetime_to_epoch_ms(p.timestamp) for p in points), dtype=np.int64, count=len(points))
+            prices = np.fromiter((p.price for p in points), dtype=np.float64, count=len(points))
+        #No copy when the arrays already have the right dtype and layout; .view() so the caller's array keeps its own flags
+        self.timestamps = np.ascontiguousarray(timestamps if timestamps is not None else [], dtype=np.int64).view()
+        self.prices = np.ascontiguousarray(prices if prices is not None else [], dtype=np.float64).view()
+        if self.timestamps.shape != self.prices.shape or self.timestamps.ndim != 1:
+            raise ValueError(f'timestamps and prices must be 1-D arrays of the same length, got {self.timestamps.shape} and {self.prices.shape}')
+        #Shared between requests (cache, single-flight): nobody may write into them
+        self.timestamps.flags.writeable = False
+        self.prices.flags.writeable = False
+        self.market_caps = self._optional_column(market_caps, 'market_caps')
+        self.total_volumes = self._optional_column(total_volumes, 'total_volumes')
+        self._points = points
+
+    def _optional_column(self, values: np.ndarray | None, name: str) -> np.ndarray | None:
+        if values is None:
+            return None
+        column = np.ascontiguousarray(values, dtype=np.float64).view()
+        if column.shape != self.timestamps.shape:
+            raise ValueError(f'{name} must have the same length as timestamps, got {column.shape} and {self.timestamps.shape}')
+        column.flags.writeable = False
+        return column
+
+    @classmethod
+    def from_arrays(cls, symbol: Symbol, currency: Currency, timestamps: np.ndarray, prices: np.ndarray,
+                    market_caps: np.ndarray | None = None, total_volumes: np.ndarray | None = None) -> 'MarketChartData':
+        return cls(symbol, currency, timestamps=timestamps, prices=prices, market_caps=market_caps, total_volumes=total_volumes)
+
+    @property
+    def points(self) -> list[PricePoint]:
+        #Built on first access only
+        if self._points is None:
+            datetimes = self.timestamps.astype('datetime64[ms]').astype(object).tolist()
+            self._points = [PricePoint(timestamp=ts, price=px) for ts, px in zip(datetimes, self.prices.tolist())]
+        return self._points
+
+    def time_slice(self, start_ms: int | None = None, end_ms: int | None = None) -> 'MarketChartData':
+        '''
+        Points with start_ms <= timestamp <= end_ms, as views of the same arrays (binary search, no copy). Timestamps are sorted.
+        '''
+        first = int(np.searchsorted(self.timestamps, start_ms, side='left')) if start_ms is not None else 0
+        last = int(np.searchsorted(self.timestamps, end_ms, side='right')) if end_ms is not None else len(self)
+        last = max(first, last)
+        if first == 0 and last == len(self):
+            return self
+        window = slice(first, last)
+        return MarketChartData.from_arrays(
+            self.symbol, self.currency, self.timestamps[window], self.prices[window],
+            market_caps=self.market_caps[window] if self.market_caps is not None else None,
+            total_volumes=self.total_volumes[window] if self.total_volumes is not None else None,
+        )
+
+    @property
+    def datetimes(self) -> np.ndarray:
+        #datetime64[ms] view of the timestamps (no copy)
+        return self.timestamps.view('datetime64[ms]')
+
+    @property
+    def nbytes(self) -> int:
+        extra = sum(column.nbytes for column in (self.market_caps, self.total_volumes) if column is not None)
+        return self.timestamps.nbytes + self.prices.nbytes + extra
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
 
 
 #Class for resampling frequency options in analytics module.
@@ -61,4 +146,49 @@ PANDAS_RESAMPLING_RULES = {
     ResampleFrequency.WEEKLY: 'W-SUN',  # Week ends on Sunday
     ResampleFrequency.MONTHLY: 'ME', # Month End. 
     ResampleFrequency.YEARLY: 'Y'
-}
\ No newline at end of file
+}
+
+#Class for the bucket size of OHLC candles (candle engine). Buckets are aligned to UTC; weeks start on Monday.
+class CandleFrequency(Enum):
+    HOURLY      = 'hourly'
+    FOUR_HOURS  = 'four_hours'
+    DAILY       = 'daily'
+    WEEKLY      = 'weekly'
+    MONTHLY     = 'monthly'
+    YEARLY      = 'yearly'
+
+#Class for the spacing between points of a provider series (e.g. CoinGecko: 5-minute points for 1 day, hourly up to 90 days, daily beyond).
+class Granularity(Enum):
+    FIVE_MINUTES    = 'five_minutes'
+    HOURLY          = 'hourly'
+    DAILY           = 'daily'
+
+#Mapping from Granularity enum to the number of seconds between two points.
+GRANULARITY_SECONDS = {
+    Granularity.FIVE_MINUTES: 5 * 60,
+    Granularity.HOURLY: 60 * 60,
+    Granularity.DAILY: 24 * 60 * 60,
+}
+
+@dataclass(frozen=True)
+class DataVersion:
+    '''
+    Version of the data behind a response: the last timestamp (epoch ms) of every series it is computed from, and how
+    long (seconds) the series stay current, i.e. the spacing of their points.
+    '''
+    last_timestamps: tuple[int, ...]
+    max_age: int
+
+    @property
+    def last_modified_ms(self) -> int:
+        return max(self.last_timestamps)
+
+@dataclass(frozen=True)
+class MarketChartStatsSource:
+    '''
+    What the statistics of a market chart are computed from: the chart itself, or the summaries of its stored window
+    (moments and quantile sketches, one per year). last_timestamp (epoch ms) is the last point they cover.
+    '''
+    last_timestamp: int
+    chart: MarketChartData | None = None
+    summaries: list[dict] | None = None
@@ -1,19 +1,45 @@
-from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint, ResampleFrequency
-from app.infrastructure.coingecko import infra_get_parsed_market_chart_coingecko
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData, MarketChartStatsSource, ResampleFrequency, CandleFrequency, DataVersion, GRANULARITY_SECONDS, datetime_to_epoch_ms
+from app.infrastructure.coingecko import (
+    infra_get_granularity_coingecko,
+    infra_get_parsed_market_chart_coingecko,
+    infra_get_parsed_market_chart_coingecko_async,
+    infra_get_parsed_market_chart_range_coingecko,
+    infra_get_parsed_market_chart_range_coingecko_async,
+    infra_get_market_chart_flight_stats,
+    infra_get_market_chart_cache_stats,
+    infra_get_market_chart_band_stats,
+    infra_flush_market_chart_cache,
+    infra_get_market_chart_summaries_coingecko,
+    infra_get_market_chart_summaries_coingecko_async,
+    infra_is_market_chart_cached_coingecko,
+)
 from app.infrastructure import errors as errors_infra
 from app.domain import errors as errors_domain
 import pandas as pd
 from app.services.analytics import (
     convert_market_chart_data_to_dataframe,
-    calculate_stats,
-    compute_returns,
-    compute_rolling_window,
+    calculate_price_stats,
+    calculate_quantiles,
+    percent_returns,
+    quantile_label,
+    stats_from_moments,
+    QUANTILE_LEVELS,
     resample_price_series,
     trim_date_range,
-    normalize_series,
-    compute_volatility,
+    enrich_price_frame,
 )
+from app.services.online_analytics import OnlineEnrichment, OnlineEnrichmentRegistry
+from app.services.candles import CandleEngineRegistry
+from app.services.fx import cross_market_chart
+from app.services.moments import Moments
+from app.services.quantiles import TDigest, DEFAULT_COMPRESSION
+from app.services.panel import enrich_panel
+from app.services.correlation import RollingCrossMoments, rolling_cross_moments
+from app.infrastructure.config import env_bool, env_int, env_str
 from datetime import datetime
+from contextlib import contextmanager
+import asyncio
+import numpy as np
 
 DEFAULT_PROVIDER = Provider.COINGECKO
 # Business Logic Layer (Domain Services)
@@ -22,20 +48,19 @@ DEFAULT_PROVIDER = Provider.COINGECKO
 
 # Use case 1: Fetch historical market data from a provider
 
-def fetch_market_chart(
-    symbol: Symbol, 
-    currency: Currency, 
-    days: int, 
-    provider: Provider = DEFAULT_PROVIDER
-) -> MarketChartData:
-    #This business function will fetch market chart data for a given symbol, currency, and number of days from the specified provider.
+# Helpers shared by the sync and the async (asyncio) versions of the use cases below.
+
+def _validate_fetch_request(days: int, provider: Provider) -> None:
     if provider is not Provider.COINGECKO:
             raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} not supported yet in this use case')    
     if days <= 0:
         raise errors_domain.BusinessValidationError(f'Invalid parameters: days={days} must be positive integer')
-    
+
+@contextmanager
+def _infra_errors_as_business_errors(symbol: Symbol, currency: Currency, provider: Provider):
+    #Translates the infrastructure errors raised inside the with-block into business errors. Works around an await too.
     try:        
-        data = infra_get_parsed_market_chart_coingecko(symbol, currency, days)
+        yield
     except errors_infra.InfrastructureProviderNotCompatibleError as e:
         raise errors_domain.BusinessProviderNotCompatible(f'Provider {provider} not compatible with symbol {symbol} and/or currency {currency}: {e}')
     
@@ -53,86 +78,661 @@ def fetch_market_chart(
     
     except errors_infra.InfrastructureExternalApiTimeout as e:        
         raise errors_domain.BusinessProviderGeneralError( f'External API timeout from provider {provider}: {e}')
-    
+
+def _validate_market_chart(data, symbol: Symbol, currency: Currency, days: int, provider: Provider) -> MarketChartData:
     #check if the answer is MarketChartData. This is a safety check, in theory the infrastructure layer should always return the correct type.
     if not isinstance(data, MarketChartData):
         raise errors_domain.BusinessMalformedDataError(f'Invalid data type received from provider {provider}, expected MarketChartData, got {type(data)}')
     
     #now check if it's empty data
-    if not len(data.points):
+    if not len(data):
         raise errors_domain.BusinessNoDataError(f'No data available for symbol {symbol}, currency {currency}, days {days} from provider {provider}')
     
     return data
 
-# Use case 2: Compute basic statistics from market chart data using pandas
+def _range_ms(start: datetime | None, end: datetime | None) -> tuple[int | None, int | None]:
+    #compared as epoch ms: a naive datetime is UTC, it can be mixed with an aware one
+    start_ms = datetime_to_epoch_ms(start) if start is not None else None
+    end_ms = datetime_to_epoch_ms(end) if end is not None else None
+    if start_ms is not None and end_ms is not None and start_ms > end_ms:
+        raise errors_domain.BusinessValidationError(f'Invalid parameters: start={start} is after end={end}')
+    return start_ms, end_ms
 
-def compute_market_chart_stats(
+# FX cross rates: a coin in a fiat currency other than the base one is derived from its base-currency series and the rate
+# implied by the proxy coin (BTC) in both currencies, instead of one upstream fetch per currency. The base and proxy series
+# are shared by every coin and currency (cache, single-flight), so a multi-currency dashboard needs about one fetch per coin.
+# The cross path is only taken when it saves an upstream fetch: the requested pair is not cached and the three series of the
+# cross are. A cold request fetches the requested pair directly (one fetch instead of three).
+# The result is an approximation of CoinGecko's own conversion: exact_currency=True (or MARKET_CHART_FX_CROSS=false)
+# always fetches the requested currency directly.
+FX_CROSS_RATES = env_bool('MARKET_CHART_FX_CROSS', True)
+FX_BASE_CURRENCY = Currency(env_str('MARKET_CHART_FX_BASE_CURRENCY', Currency.USD.value))
+FX_PROXY_SYMBOL = Symbol.BTC
+
+def _use_fx_cross(symbol: Symbol, currency: Currency, days: int, exact_currency: bool) -> bool:
+    if not FX_CROSS_RATES or exact_currency or currency is FX_BASE_CURRENCY or symbol is FX_PROXY_SYMBOL:
+        return False
+    if infra_is_market_chart_cached_coingecko(symbol, currency, days):
+        return False
+    return all(infra_is_market_chart_cached_coingecko(sym, curr, days)
+               for sym, curr in ((symbol, FX_BASE_CURRENCY), (FX_PROXY_SYMBOL, FX_BASE_CURRENCY), (FX_PROXY_SYMBOL, currency)))
+
+def _fetch_direct(symbol: Symbol, currency: Currency, days: int, provider: Provider, start_ms: int | None, end_ms: int | None) -> MarketChartData:
+    with _infra_errors_as_business_errors(symbol, currency, provider):
+        if start_ms is None and end_ms is None:
+            data = infra_get_parsed_market_chart_coingecko(symbol, currency, days)
+        else:
+            data = infra_get_parsed_market_chart_range_coingecko(symbol, currency, days, start_ms, end_ms)
+    return _validate_market_chart(data, symbol, currency, days, provider)
+
+async def _fetch_direct_async(symbol: Symbol, currency: Currency, days: int, provider: Provider, start_ms: int | None, end_ms: int | None) -> MarketChartData:
+    with _infra_errors_as_business_errors(symbol, currency, provider):
+        if start_ms is None and end_ms is None:
+            data = await infra_get_parsed_market_chart_coingecko_async(symbol, currency, days)
+        else:
+            data = await infra_get_parsed_market_chart_range_coingecko_async(symbol, currency, days, start_ms, end_ms)
+    return _validate_market_chart(data, symbol, currency, days, provider)
+
+def fetch_market_chart(
     symbol: Symbol, 
     currency: Currency, 
     days: int, 
-    provider: Provider = DEFAULT_PROVIDER 
-    ) -> dict:   
-         
-    #Get MarketChartData
-    mcd = fetch_market_chart(symbol = symbol, currency=currency, days=days, provider=provider)  #reuse the fetch function to validate and get data    
-    #Convert to DataFrame
-    df = convert_market_chart_data_to_dataframe(marketchartdata=mcd)    
+    provider: Provider = DEFAULT_PROVIDER,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+) -> MarketChartData:
+    #This business function will fetch market chart data for a given symbol, currency, and number of days from the specified provider.
+    #Optional start / end restrict the window at the source (slice of the cached window, or range read of the store).
+    _validate_fetch_request(days, provider)
+    start_ms, end_ms = _range_ms(start, end)
+    if not _use_fx_cross(symbol, currency, days, exact_currency):
+        return _fetch_direct(symbol, currency, days, provider, start_ms, end_ms)
+    chart_in_base = _fetch_direct(symbol, FX_BASE_CURRENCY, days, provider, start_ms, end_ms)
+    proxy_in_base = _fetch_direct(FX_PROXY_SYMBOL, FX_BASE_CURRENCY, days, provider, start_ms, end_ms)
+    proxy_in_target = _fetch_direct(FX_PROXY_SYMBOL, currency, days, provider, start_ms, end_ms)
+    return cross_market_chart(chart_in_base, proxy_in_base, proxy_in_target)
+
+async def fetch_market_chart_async(
+    symbol: Symbol, 
+    currency: Currency, 
+    days: int, 
+    provider: Provider = DEFAULT_PROVIDER,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+) -> MarketChartData:
+    #Same use case as fetch_market_chart, for the asyncio request path: waiting on the provider doesn't hold a thread.
+    _validate_fetch_request(days, provider)
+    start_ms, end_ms = _range_ms(start, end)
+    if not _use_fx_cross(symbol, currency, days, exact_currency):
+        return await _fetch_direct_async(symbol, currency, days, provider, start_ms, end_ms)
+    #the three series are fetched concurrently
+    chart_in_base, proxy_in_base, proxy_in_target = await asyncio.gather(
+        _fetch_direct_async(symbol, FX_BASE_CURRENCY, days, provider, start_ms, end_ms),
+        _fetch_direct_async(FX_PROXY_SYMBOL, FX_BASE_CURRENCY, days, provider, start_ms, end_ms),
+        _fetch_direct_async(FX_PROXY_SYMBOL, currency, days, provider, start_ms, end_ms),
+    )
+    return cross_market_chart(chart_in_base, proxy_in_base, proxy_in_target)
+
+# Use case 2: Compute basic statistics from market chart data
+# Exact statistics sort the whole window (median and quantiles). For long windows (more than MARKET_CHART_EXACT_STATS_MAX_DAYS
+# unless exact is forced) the statistics are merged from summaries instead: moments (exact) + t-digest sketches of the prices
+# and returns (approximate median / quantiles, see app/services/quantiles.py). With the persistent store, the years fully
+# inside the window are answered from their stored summaries without reading their points. Without a store (or for a
+# derived currency) the whole chart is fetched into memory anyway: the statistics are then exact, whatever the window.
+# Summaries are per year partition: the return between the last point of a year and the first of the next one is left out.
+
+QUANTILE_COMPRESSION = env_int('MARKET_CHART_QUANTILE_COMPRESSION', DEFAULT_COMPRESSION)
+EXACT_STATS_MAX_DAYS = env_int('MARKET_CHART_EXACT_STATS_MAX_DAYS', 90)
+STATS_SUMMARY = f'stats-c{QUANTILE_COMPRESSION}' #sidecar name, a new compression builds new sidecars
+
+def _exact_stats(prices: np.ndarray, returns: np.ndarray) -> dict:
     try:
-        #Compute stats of the DataFrame
-        stats = calculate_stats(df = df, stats_key='price')    
+        #One pass over the price array for the moments, no DataFrame
+        stats = calculate_price_stats(prices)
     except (ValueError, KeyError) as e:
         raise errors_domain.BusinessComputationError(f'Error computing statistics from market chart data: {e}')
+    stats['price_quantiles'] = calculate_quantiles(prices)
+    stats['return_quantiles'] = calculate_quantiles(returns)
+    stats['exact'] = True
     return stats
 
+def _stats_from_market_chart(mcd: MarketChartData) -> dict:
+    return _exact_stats(mcd.prices, percent_returns(mcd.prices))
+
+def _stats_summary(timestamps_ms: np.ndarray, prices: np.ndarray) -> dict:
+    return {
+        'moments': Moments.from_array(prices).to_dict(),
+        'prices': TDigest.from_array(prices, QUANTILE_COMPRESSION).to_dict(),
+        'returns': TDigest.from_array(percent_returns(prices), QUANTILE_COMPRESSION).to_dict(),
+    }
+
+def _stats_from_summaries(summaries: list[dict]) -> dict:
+    moments, prices, returns = Moments(), TDigest(), TDigest()
+    for summary in summaries:
+        moments = moments.merge(Moments.from_dict(summary['moments']))
+        prices = prices.merge(TDigest.from_dict(summary['prices']))
+        returns = returns.merge(TDigest.from_dict(summary['returns']))
+    try:
+        stats = stats_from_moments(moments, median=prices.quantile(0.5))
+    except ValueError as e:
+        raise errors_domain.BusinessComputationError(f'Error computing statistics from market chart summaries: {e}')
+    stats['price_quantiles'] = {quantile_label(level): q for level, q in zip(QUANTILE_LEVELS, prices.quantile(QUANTILE_LEVELS).tolist())}
+    stats['return_quantiles'] = {quantile_label(level): q for level, q in zip(QUANTILE_LEVELS, returns.quantile(QUANTILE_LEVELS).tolist())}
+    stats['exact'] = False
+    return stats
+
+def _use_exact_stats(exact: bool | None, days: int) -> bool:
+    return exact if exact is not None else days <= EXACT_STATS_MAX_DAYS
+
+def _chart_stats_source(mcd: MarketChartData) -> MarketChartStatsSource:
+    return MarketChartStatsSource(last_timestamp=int(mcd.timestamps[-1]), chart=mcd)
+
+def _summaries_stats_source(stored: tuple[list[dict], int | None], symbol: Symbol, currency: Currency, days: int, provider: Provider) -> MarketChartStatsSource:
+    summaries, last_ms = stored
+    if not summaries:
+        raise errors_domain.BusinessNoDataError(f'No data available for symbol {symbol}, currency {currency}, days {days} from provider {provider}')
+    return MarketChartStatsSource(last_timestamp=last_ms, summaries=summaries)
+
+def _stats_from_source(source: MarketChartStatsSource) -> dict:
+    if source.chart is not None:
+        return _stats_from_market_chart(source.chart)
+    return _stats_from_summaries(source.summaries)
+
+def fetch_market_chart_stats_source(
+    symbol: Symbol, 
+    currency: Currency, 
+    days: int, 
+    provider: Provider = DEFAULT_PROVIDER,
+    exact: bool | None = None,
+    exact_currency: bool = False,
+    ) -> MarketChartStatsSource:
+    #What compute_market_chart_stats works on: fetched once, so the version of a response and its statistics come from the same data
+    if not _use_exact_stats(exact, days):
+        _validate_fetch_request(days, provider)
+        if not _use_fx_cross(symbol, currency, days, exact_currency):
+            with _infra_errors_as_business_errors(symbol, currency, provider):
+                stored = infra_get_market_chart_summaries_coingecko(symbol, currency, days, STATS_SUMMARY, _stats_summary)
+            if stored is not None:
+                return _summaries_stats_source(stored, symbol, currency, days, provider)
+    #exact statistics, or no stored summaries: the whole chart is in memory anyway, a sketch would only lose precision
+    mcd = fetch_market_chart(symbol, currency, days, provider, exact_currency=exact_currency)  #reuse the fetch function to validate and get data
+    return _chart_stats_source(mcd)
+
+async def fetch_market_chart_stats_source_async(
+    symbol: Symbol, 
+    currency: Currency, 
+    days: int, 
+    provider: Provider = DEFAULT_PROVIDER,
+    exact: bool | None = None,
+    exact_currency: bool = False,
+    ) -> MarketChartStatsSource:
+    if not _use_exact_stats(exact, days):
+        _validate_fetch_request(days, provider)
+        if not _use_fx_cross(symbol, currency, days, exact_currency):
+            with _infra_errors_as_business_errors(symbol, currency, provider):
+                stored = await infra_get_market_chart_summaries_coingecko_async(symbol, currency, days, STATS_SUMMARY, _stats_summary)
+            if stored is not None:
+                return _summaries_stats_source(stored, symbol, currency, days, provider)
+    mcd = await fetch_market_chart_async(symbol, currency, days, provider, exact_currency=exact_currency)
+    return _chart_stats_source(mcd)
+
+def compute_market_chart_stats(
+    symbol: Symbol, 
+    currency: Currency, 
+    days: int, 
+    provider: Provider = DEFAULT_PROVIDER,
+    exact: bool | None = None,
+    exact_currency: bool = False,
+    source: MarketChartStatsSource | None = None,
+    ) -> dict:   
+    #source: what fetch_market_chart_stats_source returned for these parameters, fetched here if None
+    if source is None:
+        source = fetch_market_chart_stats_source(symbol, currency, days, provider, exact, exact_currency)
+    return _stats_from_source(source)
+
+async def compute_market_chart_stats_async(
+    symbol: Symbol, 
+    currency: Currency, 
+    days: int, 
+    provider: Provider = DEFAULT_PROVIDER,
+    exact: bool | None = None,
+    exact_currency: bool = False,
+    source: MarketChartStatsSource | None = None,
+    ) -> dict:   
+    if source is None:
+        source = await fetch_market_chart_stats_source_async(symbol, currency, days, provider, exact, exact_currency)
+    #pandas work runs in a worker thread, the event loop keeps serving other requests meanwhile
+    return await asyncio.to_thread(_stats_from_source, source)
+
 # Use case 3: Compute enriched market chart data with optional analytics using pandas
 
-def compute_enriched_market_chart(
-    symbol: Symbol,
-    currency: Currency,
-    days: int,
-    provider: Provider,
+def _as_window_list(windows: int | list[int] | None) -> list[int]:
+    if windows is None:
+        return []
+    return [windows] if isinstance(windows, int) else list(windows)
+
+def _enrich_market_chart(
+    raw_chart: MarketChartData,
     frequency: ResampleFrequency | None = None,
-    window_size: int | None = None,
+    window_size: int | list[int] | None = None,
     normalize_base: float | None = None,
-    volatility_window: int | None = None,
+    volatility_window: int | list[int] | None = None,
     start: datetime | None = None,
     end: datetime | None = None,
 ) -> pd.DataFrame:
     
-    # 1) Fetch raw chart
-    raw_chart: MarketChartData = fetch_market_chart(symbol, currency, days, provider)
-    
-    # 2) Domain -> DataFrame
+    # 2) Domain -> DataFrame (read-only views of the chart arrays: the pipeline never writes them, its result owns its columns)
     df = convert_market_chart_data_to_dataframe(raw_chart)
     
     try:    
-        # 3) Optional range trim
+        # 3) Optional range trim (binary search -> slice; a no-op when the source already returned the range)
         df = trim_date_range(df, start, end)
         
         #4) Optional resampling
         if frequency is not None:
             df = resample_price_series(df, 'price', frequency)
         
-        # 5) Always compute returns
-        compute_returns(df, 'price')
-        
-        # 6) Optional rolling
-        if window_size is not None:
-            if window_size <= 0:
-                raise ValueError(f'Window size must be greater than 0. Got {window_size}')
-            compute_rolling_window(df, window_size, "price")
-        
-        # 7) Optional volatility
-        if volatility_window is not None:
-            if volatility_window <= 1:
-                raise ValueError(f'Volatility window must be greater than 1. Got {volatility_window}')
-            compute_volatility(df, "price", volatility_window)
+        # 5) Validate the optional windows (one window or a list of windows)
+        for window in _as_window_list(window_size):
+            if window <= 0:
+                raise ValueError(f'Window size must be greater than 0. Got {window}')
+        for window in _as_window_list(volatility_window):
+            if window <= 1:
+                raise ValueError(f'Volatility window must be greater than 1. Got {window}')
         
-        # 8) Optional normalization
-        if normalize_base is not None:
-            normalize_series(df, "price", normalize_base)
+        # 6) Returns (always) + optional rolling means, volatilities and normalization in one fused pass
+        df = enrich_price_frame(df, 'price', window_size, volatility_window, normalize_base)
     
     except (KeyError, ValueError) as e:
         raise errors_domain.BusinessComputationError(f'Error computing enriched market chart with pandas {e}')
     
     return df
+
+def compute_enriched_market_chart(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: ResampleFrequency | None = None,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> pd.DataFrame:
+    
+    # 1) Fetch raw chart (the range is pushed down to the data source), unless the caller already fetched it with these parameters
+    if raw_chart is None:
+        raw_chart = fetch_market_chart(symbol, currency, days, provider, start, end, exact_currency)
+    
+    # 2..8) DataFrame + analytics
+    return _enrich_market_chart(raw_chart, frequency, window_size, normalize_base, volatility_window, start, end)
+
+async def compute_enriched_market_chart_async(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: ResampleFrequency | None = None,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> pd.DataFrame:
+    
+    # 1) Fetch raw chart without blocking the event loop (the range is pushed down to the data source)
+    if raw_chart is None:
+        raw_chart = await fetch_market_chart_async(symbol, currency, days, provider, start, end, exact_currency)
+    
+    # 2..8) The pandas pipeline is CPU work -> worker thread
+    return await asyncio.to_thread(_enrich_market_chart, raw_chart, frequency, window_size, normalize_base, volatility_window, start, end)
+
+# Use case 3b: Report = enriched frame + its statistics, from one fetch and one enrichment run
+# The statistics describe the enriched frame (after trimming / resampling): exact moments and quantiles of its price
+# column, return quantiles from its pct_change column.
+
+def _stats_from_enriched_frame(df: pd.DataFrame) -> dict:
+    return _exact_stats(df['price'].to_numpy(dtype=np.float64), df['pct_change'].to_numpy(dtype=np.float64))
+
+def _market_chart_report(raw_chart: MarketChartData, *enrich_args) -> tuple[pd.DataFrame, dict]:
+    df = _enrich_market_chart(raw_chart, *enrich_args)
+    return df, _stats_from_enriched_frame(df)
+
+def compute_market_chart_report(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: ResampleFrequency | None = None,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> tuple[pd.DataFrame, dict]:
+    if raw_chart is None:
+        raw_chart = fetch_market_chart(symbol, currency, days, provider, start, end, exact_currency)
+    return _market_chart_report(raw_chart, frequency, window_size, normalize_base, volatility_window, start, end)
+
+async def compute_market_chart_report_async(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: ResampleFrequency | None = None,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> tuple[pd.DataFrame, dict]:
+    if raw_chart is None:
+        raw_chart = await fetch_market_chart_async(symbol, currency, days, provider, start, end, exact_currency)
+    return await asyncio.to_thread(_market_chart_report, raw_chart, frequency, window_size, normalize_base, volatility_window, start, end)
+
+# Use case 4: Operational metrics of the fetch path (admin endpoints)
+
+def get_fetch_coalescing_stats() -> dict:
+    #How many fetches were served by an identical upstream request that was already in flight (single-flight)
+    return infra_get_market_chart_flight_stats()
+
+def get_market_chart_cache_stats() -> dict:
+    #Size, bounds, hit/miss/eviction counters and entries of the in-process market chart cache
+    return infra_get_market_chart_cache_stats()
+
+def get_market_chart_band_stats() -> dict:
+    #How often a lookback was served by slicing the cached series of its granularity band instead of a new upstream fetch
+    return infra_get_market_chart_band_stats()
+
+def flush_market_chart_cache() -> int:
+    #Drops every cached chart, returns how many entries were flushed
+    return infra_flush_market_chart_cache()
+
+# Use case 5: Near-real-time enrichment
+# One incremental analytics state per series and configuration: every call fetches the chart (usually a cache hit) and feeds
+# the state only with the points it has not seen yet, in O(1) per point, instead of recomputing the whole history.
+# The last point of a fetched chart is provisional (CoinGecko's live point, off the grid of the series): the next call takes
+# it back before ingesting, so the state holds the same points as the chart. The registry is bounded
+# (MARKET_CHART_ONLINE_STATES, least recently used states dropped).
+
+ONLINE_ENRICHMENTS = OnlineEnrichmentRegistry(env_int('MARKET_CHART_ONLINE_STATES', 256))
+
+def _online_enrichment_key(symbol, currency, days, provider, window_size, normalize_base, volatility_window, exact_currency) -> tuple:
+    #days is part of the key: it decides the granularity of the points (5-minute, hourly, daily)
+    return (provider, symbol, currency, days, exact_currency, tuple(_as_window_list(window_size)), tuple(_as_window_list(volatility_window)), normalize_base)
+
+def _ingest_new_points(state: OnlineEnrichment, raw_chart: MarketChartData) -> dict:
+    with state.lock:
+        state.rewind() #the previous last point, re-ingested below if the chart still has it
+        start = 0
+        if state.last_timestamp is not None:
+            start = int(np.searchsorted(raw_chart.timestamps, datetime_to_epoch_ms(state.last_timestamp), side='right'))
+        timestamps = raw_chart.datetimes[start:].astype(object).tolist()
+        for timestamp, price in zip(timestamps, raw_chart.prices[start:].tolist()):
+            state.update(timestamp, price)
+        return dict(state.last_row)
+
+def _latest_enriched_row(
+    raw_chart: MarketChartData,
+    key: tuple,
+    window_size: int | list[int] | None,
+    normalize_base: float | None,
+    volatility_window: int | list[int] | None,
+) -> pd.DataFrame:
+    try:
+        #same bound as the batch path, checked before a state is created (the ring buffers only grow with the points)
+        for window in _as_window_list(window_size):
+            if window > len(raw_chart):
+                raise ValueError('window_size cannot be larger than the number of data points in the DataFrame')
+        state = ONLINE_ENRICHMENTS.get(key, lambda: OnlineEnrichment('price', window_size, volatility_window, normalize_base))
+        row = _ingest_new_points(state, raw_chart)
+    except ValueError as e:
+        raise errors_domain.BusinessComputationError(f'Error computing online enrichment {e}')
+    return pd.DataFrame([row])
+
+def compute_latest_enriched_row(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> pd.DataFrame:
+    if raw_chart is None:
+        raw_chart = fetch_market_chart(symbol, currency, days, provider, exact_currency=exact_currency)
+    key = _online_enrichment_key(symbol, currency, days, provider, window_size, normalize_base, volatility_window, exact_currency)
+    return _latest_enriched_row(raw_chart, key, window_size, normalize_base, volatility_window)
+
+async def compute_latest_enriched_row_async(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> pd.DataFrame:
+    if raw_chart is None:
+        raw_chart = await fetch_market_chart_async(symbol, currency, days, provider, exact_currency=exact_currency)
+    key = _online_enrichment_key(symbol, currency, days, provider, window_size, normalize_base, volatility_window, exact_currency)
+    #the first call of a series ingests the whole history (Python loop) -> worker thread
+    return await asyncio.to_thread(_latest_enriched_row, raw_chart, key, window_size, normalize_base, volatility_window)
+
+# Use case 6: OHLC candles
+# One candle engine per series: the closed candles are kept between requests, only the open bucket is recomputed when the
+# fetched chart has new points. The series is identified by its granularity, not by days: every lookback of a granularity
+# shares the engine (their points come from the same band series) and the registry stays bounded
+# (MARKET_CHART_CANDLE_ENGINES, least recently used engines dropped).
+
+CANDLE_ENGINES = CandleEngineRegistry(env_int('MARKET_CHART_CANDLE_ENGINES', 256))
+
+def _candle_engine_key(symbol: Symbol, currency: Currency, days: int, provider: Provider, exact_currency: bool) -> tuple:
+    return (provider, symbol, currency, infra_get_granularity_coingecko(days), exact_currency)
+
+def _candles_frame(raw_chart: MarketChartData, key: tuple, frequency: CandleFrequency) -> pd.DataFrame:
+    engine = CANDLE_ENGINES.get(key)
+    with engine.lock:
+        engine.update(raw_chart.timestamps, raw_chart.prices, raw_chart.total_volumes)
+        candles = engine.window(frequency, raw_chart.timestamps, raw_chart.prices, raw_chart.total_volumes)
+    columns = {
+        'timestamp': candles.start.view('datetime64[ms]'), #bucket start (UTC)
+        'open': candles.open,
+        'high': candles.high,
+        'low': candles.low,
+        'close': candles.close,
+    }
+    if candles.volume is not None:
+        columns['volume_24h'] = candles.volume
+    return pd.DataFrame(columns, copy=False)
+
+def compute_market_chart_candles(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: CandleFrequency = CandleFrequency.DAILY,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> pd.DataFrame:
+    if raw_chart is None:
+        raw_chart = fetch_market_chart(symbol, currency, days, provider, exact_currency=exact_currency)
+    return _candles_frame(raw_chart, _candle_engine_key(symbol, currency, days, provider, exact_currency), frequency)
+
+async def compute_market_chart_candles_async(
+    symbol: Symbol,
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    frequency: CandleFrequency = CandleFrequency.DAILY,
+    exact_currency: bool = False,
+    raw_chart: MarketChartData | None = None,
+) -> pd.DataFrame:
+    if raw_chart is None:
+        raw_chart = await fetch_market_chart_async(symbol, currency, days, provider, exact_currency=exact_currency)
+    return await asyncio.to_thread(_candles_frame, raw_chart, _candle_engine_key(symbol, currency, days, provider, exact_currency), frequency)
+
+# Use case 7: Multi-asset panel
+# Several symbols aligned on a common time index and enriched in one vectorized pass (see app/services/panel.py).
+
+def _panel_symbols(symbols: list[Symbol]) -> list[Symbol]:
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        raise errors_domain.BusinessValidationError('At least one symbol is required for a panel')
+    return symbols
+
+def fetch_market_charts(
+    symbols: list[Symbol],
+    currency: Currency,
+    days: int,
+    provider: Provider = DEFAULT_PROVIDER,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+) -> list[MarketChartData]:
+    #One chart per distinct symbol, in the order of their first occurrence (the charts of a panel)
+    return [fetch_market_chart(symbol, currency, days, provider, start, end, exact_currency) for symbol in _panel_symbols(symbols)]
+
+async def fetch_market_charts_async(
+    symbols: list[Symbol],
+    currency: Currency,
+    days: int,
+    provider: Provider = DEFAULT_PROVIDER,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+) -> list[MarketChartData]:
+    #the series are fetched concurrently
+    charts = await asyncio.gather(*(
+        fetch_market_chart_async(symbol, currency, days, provider, start, end, exact_currency) for symbol in _panel_symbols(symbols)
+    ))
+    return list(charts)
+
+def _enrich_panel(
+    charts: list[MarketChartData],
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+) -> pd.DataFrame:
+    try:
+        for window in _as_window_list(window_size):
+            if window <= 0:
+                raise ValueError(f'Window size must be greater than 0. Got {window}')
+        for window in _as_window_list(volatility_window):
+            if window <= 1:
+                raise ValueError(f'Volatility window must be greater than 1. Got {window}')
+        return enrich_panel(charts, None, window_size, volatility_window, normalize_base)
+    except ValueError as e:
+        raise errors_domain.BusinessComputationError(f'Error computing the panel: {e}')
+
+def compute_panel(
+    symbols: list[Symbol],
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    charts: list[MarketChartData] | None = None,
+) -> pd.DataFrame:
+    if charts is None:
+        charts = fetch_market_charts(symbols, currency, days, provider, start, end, exact_currency)
+    return _enrich_panel(charts, window_size, normalize_base, volatility_window)
+
+async def compute_panel_async(
+    symbols: list[Symbol],
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window_size: int | list[int] | None = None,
+    normalize_base: float | None = None,
+    volatility_window: int | list[int] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    charts: list[MarketChartData] | None = None,
+) -> pd.DataFrame:
+    #the series are fetched concurrently, the panel is computed in a worker thread
+    if charts is None:
+        charts = await fetch_market_charts_async(symbols, currency, days, provider, start, end, exact_currency)
+    return await asyncio.to_thread(_enrich_panel, charts, window_size, normalize_base, volatility_window)
+
+# Use case 8: Rolling covariance / correlation matrices and betas across assets (see app/services/correlation.py)
+
+def _correlation_symbols(symbols: list[Symbol], benchmark: Symbol) -> list[Symbol]:
+    #the benchmark of the betas is always part of the panel
+    symbols = _panel_symbols(symbols)
+    return symbols if benchmark in symbols else symbols + [benchmark]
+
+def _rolling_correlations(charts: list[MarketChartData], window: int) -> RollingCrossMoments:
+    try:
+        return rolling_cross_moments(charts, window)
+    except ValueError as e:
+        raise errors_domain.BusinessComputationError(f'Error computing rolling correlations: {e}')
+
+def compute_rolling_correlations(
+    symbols: list[Symbol],
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window: int,
+    benchmark: Symbol = Symbol.BTC,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    charts: list[MarketChartData] | None = None,
+) -> RollingCrossMoments:
+    if charts is None:
+        charts = fetch_market_charts(_correlation_symbols(symbols, benchmark), currency, days, provider, start, end, exact_currency)
+    return _rolling_correlations(charts, window)
+
+async def compute_rolling_correlations_async(
+    symbols: list[Symbol],
+    currency: Currency,
+    days: int,
+    provider: Provider,
+    window: int,
+    benchmark: Symbol = Symbol.BTC,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    exact_currency: bool = False,
+    charts: list[MarketChartData] | None = None,
+) -> RollingCrossMoments:
+    if charts is None:
+        charts = await fetch_market_charts_async(_correlation_symbols(symbols, benchmark), currency, days, provider, start, end, exact_currency)
+    return await asyncio.to_thread(_rolling_correlations, charts, window)
+
+# Use case 9: Version of the data behind a response (conditional requests, see app/api/conditional.py)
+# The last point of every series a response is computed from, and the spacing of their points (no new point can appear
+# before). Built from the fetched data itself (charts, or the stats source): the caller fetches once, takes the version,
+# and computes from the same data, so the validators always label the bytes they are sent with.
+
+def _data_version(last_timestamps: list[int], days: int) -> DataVersion:
+    return DataVersion(
+        last_timestamps=tuple(last_timestamps),
+        max_age=GRANULARITY_SECONDS[infra_get_granularity_coingecko(days)],
+    )
+
+def get_market_chart_version(charts: list[MarketChartData], days: int) -> DataVersion:
+    return _data_version([int(chart.timestamps[-1]) for chart in charts], days)
+
+def get_market_chart_stats_version(source: MarketChartStatsSource, days: int) -> DataVersion:
+    return _data_version([source.last_timestamp], days)
@@ -0,0 +1,130 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from app.domain.entities import MarketChartData
+
+# In-process cache of parsed market charts (MarketChartData).
+# - LRU: the least recently used entry is evicted first when a bound is exceeded.
+# - Bounded by number of entries AND by (estimated) bytes.
+# - TTL per entry: the caller decides it at put() time (for CoinGecko it follows the granularity of the series).
+# Cached charts are shared between requests: treat them as read-only.
+
+
+def estimate_market_chart_nbytes(chart: MarketChartData) -> int:
+    #Approximate memory of a chart: the object itself + its timestamp and price arrays (16 bytes per point).
+    return sys.getsizeof(chart) + chart.nbytes
+
+
+class _Entry:
+    __slots__ = ('value', 'expires_at', 'nbytes')
+
+    def __init__(self, value: MarketChartData, expires_at: float, nbytes: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.nbytes = nbytes
+
+
+class MarketChartCache:
+    '''
+    Thread-safe TTL + LRU cache of MarketChartData bounded by entries and bytes.
+    '''
+    def __init__(
+        self,
+        max_entries: int = 256,
+        max_bytes: int = 64 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+        sizeof: Callable[[MarketChartData], int] = estimate_market_chart_nbytes,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._clock = clock
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[Hashable, _Entry] = OrderedDict()
+        self._bytes = 0
+        #counters
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: Hashable) -> MarketChartData | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.expires_at <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key) #most recently used
+            self.hits += 1
+            return entry.value
+
+    def contains(self, key: Hashable) -> bool:
+        #fresh entry for key? Unlike get, no counter and no LRU update: used to plan fetches, not to serve them
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.expires_at > self._clock()
+
+    def put(self, key: Hashable, value: MarketChartData, ttl_seconds: float) -> None:
+        if not self.enabled or ttl_seconds <= 0:
+            return
+        nbytes = self._sizeof(value)
+        if nbytes > self.max_bytes:
+            return #a single chart bigger than the whole cache is never stored
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = _Entry(value, self._clock() + ttl_seconds, nbytes)
+            self._bytes += nbytes
+            #evict least recently used entries until both bounds hold
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def clear(self) -> int:
+        with self._lock:
+            flushed = len(self._entries)
+            self._entries.clear()
+            self._bytes = 0
+            return flushed
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.nbytes
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'expirations': self.expirations,
+                'evictions': self.evictions,
+                'items': [
+                    {
+                        'key': [k.value if hasattr(k, 'value') else k for k in key] if isinstance(key, tuple) else key,
+                        'points': len(entry.value),
+                        'bytes': entry.nbytes,
+                        'ttl_remaining_seconds': round(max(entry.expires_at - now, 0.0), 3),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
@@ -1,9 +1,20 @@
-from datetime import datetime
+import asyncio
 import os
+import time
+import numpy as np
 from app.infrastructure import errors
 from app.domain.entities import Symbol, Currency, Provider
 from app.infrastructure.mapper import map_provider_currency_id, map_provider_symbol_id
 from app.domain.entities import PricePoint, MarketChartData
+from app.infrastructure.http_client import get_http_client, get_async_http_client
+from app.infrastructure.singleflight import SingleFlight, AsyncSingleFlight
+from app.infrastructure.cache import MarketChartCache
+from app.infrastructure.store import MarketChartStore, SeriesKey
+from app.infrastructure.streaming import MarketChartStreamDecoder
+from app.infrastructure.config import env_int, env_str, env_bool
+import threading
+from collections.abc import Callable
+from app.domain.entities import Granularity, GRANULARITY_SECONDS
 
 import httpx 
 
@@ -11,18 +22,323 @@ import httpx
 from dotenv import load_dotenv
 load_dotenv() # this will load the environment variables from the .env file into the system environment variables, so we can access them using os.getenv('VAR_NAME')    
 
+COINGECKO_BASE_URL = os.getenv("COINGECKO_BASE_URL", "https://api.coingecko.com/api/v3") #configurable so we can point the adapter to a local stub server (benchmarks)
+
+# CoinGecko decides the granularity of the series from the number of days (automatic granularity):
+# 1 day -> 5-minute points, 2..90 days -> hourly points, more than 90 days -> daily points.
+def infra_get_granularity_coingecko(days: int) -> Granularity:
+    if days <= 1:
+        return Granularity.FIVE_MINUTES
+    if days <= 90:
+        return Granularity.HOURLY
+    return Granularity.DAILY
+
+# Granularity bands: every 'days' of a band gives points with the same spacing, so one series per band (the widest one,
+# canonical 'days') is enough to serve all of them by slicing its tail. 1 -> 5-minute points, 2..90 -> the 90-day hourly
+# series, more than 90 -> daily series of 365 * k days. A dashboard with many lookbacks costs one upstream call per band.
+# MARKET_CHART_BANDS=false fetches every 'days' as it is requested.
+MARKET_CHART_BANDS = env_bool('MARKET_CHART_BANDS', True)
+
+def infra_get_band_days_coingecko(days: int) -> int:
+    if not MARKET_CHART_BANDS or days <= 1:
+        return days
+    if days <= 90:
+        return 90
+    return -(-days // 365) * 365
+
+# In-process TTL/LRU cache of parsed charts, keyed by (provider, symbol, currency, days).
+# An entry lives as long as the spacing of its points: before that, CoinGecko has no new point to give us.
+MARKET_CHART_CACHE = MarketChartCache(
+    max_entries = env_int('MARKET_CHART_CACHE_MAX_ENTRIES', 256),
+    max_bytes   = env_int('MARKET_CHART_CACHE_MAX_BYTES', 64 * 1024 * 1024),
+)
+
+# Optional persistent Parquet store under the network (see 4) below). Disabled when MARKET_CHART_STORE_DIR is empty.
+MARKET_CHART_STORE: MarketChartStore | None = MarketChartStore(env_str('MARKET_CHART_STORE_DIR')) if env_str('MARKET_CHART_STORE_DIR') else None
+
+# Series parsed next to the prices and kept along them (cache, store): the volumes feed the candles (volume_24h).
+# Market caps are not used by any route and are not parsed on the request path.
+MARKET_CHART_EXTRAS = ('total_volumes',)
+
+# Single-flight groups: concurrent callers asking for the same (symbol, currency, days) share ONE upstream request and
+# the same parsed MarketChartData (treat it as read-only). One group per request path (threads / asyncio).
+# Long histories are decoded while they are downloaded (streaming.py) instead of materializing response.json() first.
+MARKET_CHART_STREAM_MIN_DAYS = env_int('MARKET_CHART_STREAM_MIN_DAYS', 365)
+
+MARKET_CHART_FLIGHT = SingleFlight()
+MARKET_CHART_FLIGHT_ASYNC = AsyncSingleFlight()
+
+def infra_get_market_chart_flight_stats() -> dict:
+    return {'threaded': MARKET_CHART_FLIGHT.stats(), 'async': MARKET_CHART_FLIGHT_ASYNC.stats()}
+
+def infra_get_market_chart_cache_stats() -> dict:
+    return MARKET_CHART_CACHE.stats()
+
+# Counters of the band canonicalization: how many requests for a non-canonical 'days' were served by slicing a band
+# series that was already cached (an upstream fetch avoided), and how many band series had to be fetched.
+_BAND_STATS_LOCK = threading.Lock()
+_BAND_STATS = {'requests': 0, 'sliced_requests': 0, 'slice_hits': 0, 'band_fetches': 0}
+
+def _count_band(counter: str) -> None:
+    with _BAND_STATS_LOCK:
+        _BAND_STATS[counter] += 1
+
+def infra_get_market_chart_band_stats() -> dict:
+    with _BAND_STATS_LOCK:
+        stats = dict(_BAND_STATS)
+    stats['slice_hit_ratio'] = stats['slice_hits'] / stats['sliced_requests'] if stats['sliced_requests'] else 0.0
+    stats['enabled'] = MARKET_CHART_BANDS
+    return stats
+
+def _band_tail(market_chart: MarketChartData, days: int, band_days: int) -> MarketChartData:
+    #last 'days' of the band series, anchored at its last point (views, no copy)
+    if days == band_days or not len(market_chart):
+        return market_chart
+    return market_chart.time_slice(int(market_chart.timestamps[-1]) - days * DAY_MS, None)
+
+def infra_flush_market_chart_cache() -> int:
+    return MARKET_CHART_CACHE.clear()
+
+def infra_is_market_chart_cached_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> bool:
+    #would infra_get_parsed_market_chart_coingecko(sym, curr, days) be served from the cache (no upstream fetch)?
+    return MARKET_CHART_CACHE.contains(_market_chart_key(sym, curr, infra_get_band_days_coingecko(days)))
+
+def _market_chart_key(sym: Symbol, curr: Currency, days: int) -> tuple:
+    return (Provider.COINGECKO, sym, curr, days)
+
+def _cache_market_chart(key: tuple, market_chart: MarketChartData, days: int) -> MarketChartData:
+    if len(market_chart):
+        MARKET_CHART_CACHE.put(key, market_chart, GRANULARITY_SECONDS[infra_get_granularity_coingecko(days)])
+    return market_chart
+
 # 3) High level function to get parsed market chart data from CoinGecko API -> returns MarketChartData (domain entity)
+# Order of the layers: band canonicalization -> cache -> single-flight -> HTTP request + parsing -> slice of the band series
 def infra_get_parsed_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> MarketChartData:
+    band_days = infra_get_band_days_coingecko(days)
+    return _band_tail(_get_band_market_chart_coingecko(sym, curr, band_days, sliced=days != band_days), days, band_days)
+
+def _get_band_market_chart_coingecko(    sym: Symbol,     curr: Currency,     band_days: int,     sliced: bool) -> MarketChartData:
+    key = _market_chart_key(sym, curr, band_days)
+    _count_band('requests')
+    if sliced:
+        _count_band('sliced_requests')
+    cached = MARKET_CHART_CACHE.get(key)
+    if cached is not None:
+        if sliced:
+            _count_band('slice_hits')
+        return cached
+    return MARKET_CHART_FLIGHT.do(key, lambda: _fetch_and_cache_market_chart_coingecko(key, sym, curr, band_days))
+
+def _fetch_and_cache_market_chart_coingecko(key: tuple, sym: Symbol, curr: Currency, days: int) -> MarketChartData:
+    _count_band('band_fetches')
+    return _cache_market_chart(key, _fetch_parsed_market_chart_coingecko(sym, curr, days), days)
+
+def _fetch_parsed_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> MarketChartData:
+    if MARKET_CHART_STORE is not None:
+        return _fetch_through_store_coingecko(sym, curr, days)
+    if days >= MARKET_CHART_STREAM_MIN_DAYS:
+        return infra_get_streamed_market_chart_coingecko(sym, curr, days)
     raw_data =      infra_get_raw_market_chart_coingecko(sym, curr, days)    
-    clean_data =    infra_clean_raw_market_chart_coingecko(raw_data, 'prices')
-    market_chart = MarketChartData(sym, curr, clean_data)
+    market_chart =  infra_parse_raw_market_chart_coingecko(raw_data, sym, curr, extras=MARKET_CHART_EXTRAS)
     return market_chart
 
-# 1 ) Function to get raw market chart data from CoinGecko API -> returns the raw JSON data as a dict
-def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> dict:
-    '''
-    Fetch market chart data from CoinGecko API.
-    '''
+# 3b) Async version of 3) for the asyncio request path. Same steps, but the HTTP wait doesn't block a thread.
+async def infra_get_parsed_market_chart_coingecko_async(    sym: Symbol,     curr: Currency,     days: int) -> MarketChartData:
+    band_days = infra_get_band_days_coingecko(days)
+    return _band_tail(await _get_band_market_chart_coingecko_async(sym, curr, band_days, sliced=days != band_days), days, band_days)
+
+async def _get_band_market_chart_coingecko_async(    sym: Symbol,     curr: Currency,     band_days: int,     sliced: bool) -> MarketChartData:
+    key = _market_chart_key(sym, curr, band_days)
+    _count_band('requests')
+    if sliced:
+        _count_band('sliced_requests')
+    cached = MARKET_CHART_CACHE.get(key)
+    if cached is not None:
+        if sliced:
+            _count_band('slice_hits')
+        return cached
+    return await MARKET_CHART_FLIGHT_ASYNC.do(key, lambda: _fetch_and_cache_market_chart_coingecko_async(key, sym, curr, band_days))
+
+async def _fetch_and_cache_market_chart_coingecko_async(key: tuple, sym: Symbol, curr: Currency, days: int) -> MarketChartData:
+    _count_band('band_fetches')
+    return _cache_market_chart(key, await _fetch_parsed_market_chart_coingecko_async(sym, curr, days), days)
+
+async def _fetch_parsed_market_chart_coingecko_async(    sym: Symbol,     curr: Currency,     days: int) -> MarketChartData:
+    if MARKET_CHART_STORE is not None:
+        return await _fetch_through_store_coingecko_async(sym, curr, days)
+    if days >= MARKET_CHART_STREAM_MIN_DAYS:
+        return await infra_get_streamed_market_chart_coingecko_async(sym, curr, days)
+    raw_data =      await infra_get_raw_market_chart_coingecko_async(sym, curr, days)
+    #Parsing is vectorized but still CPU work proportional to the payload: run it in a worker thread so the event loop never stalls on long histories.
+    market_chart =  await asyncio.to_thread(infra_parse_raw_market_chart_coingecko, raw_data, sym, curr, False, MARKET_CHART_EXTRAS)
+    return market_chart
+
+# 3c) Same as 3) restricted to start_ms <= timestamp <= end_ms (epoch ms, None = open bound).
+# A cached window is sliced in memory (views, no copy). With the store, only the requested range is read from disk; these
+# partial results are not cached (the cache holds whole 'days' windows).
+def infra_get_parsed_market_chart_range_coingecko(    sym: Symbol,     curr: Currency,     days: int,     start_ms: int | None,     end_ms: int | None) -> MarketChartData:
+    band_days = infra_get_band_days_coingecko(days)
+    cached = MARKET_CHART_CACHE.get(_market_chart_key(sym, curr, band_days))
+    if cached is not None:
+        return _band_tail(cached, days, band_days).time_slice(start_ms, end_ms)
+    if MARKET_CHART_STORE is None:
+        return infra_get_parsed_market_chart_coingecko(sym, curr, days).time_slice(start_ms, end_ms)
+    key = _market_chart_key(sym, curr, days)
+    return MARKET_CHART_FLIGHT.do(key + (start_ms, end_ms), lambda: _fetch_through_store_coingecko(sym, curr, days, start_ms, end_ms))
+
+async def infra_get_parsed_market_chart_range_coingecko_async(    sym: Symbol,     curr: Currency,     days: int,     start_ms: int | None,     end_ms: int | None) -> MarketChartData:
+    band_days = infra_get_band_days_coingecko(days)
+    cached = MARKET_CHART_CACHE.get(_market_chart_key(sym, curr, band_days))
+    if cached is not None:
+        return _band_tail(cached, days, band_days).time_slice(start_ms, end_ms)
+    if MARKET_CHART_STORE is None:
+        return (await infra_get_parsed_market_chart_coingecko_async(sym, curr, days)).time_slice(start_ms, end_ms)
+    key = _market_chart_key(sym, curr, days)
+    return await MARKET_CHART_FLIGHT_ASYNC.do(key + (start_ms, end_ms), lambda: _fetch_through_store_coingecko_async(sym, curr, days, start_ms, end_ms))
+
+# 4 ) Store-backed fetch (only when MARKET_CHART_STORE_DIR is set)
+# The series is kept on disk per granularity. Depending on what is already stored:
+#   - nothing stored, or the stored history starts after the requested window -> full 'market_chart' download (days)
+#   - the stored history covers the window -> download only the missing tail with 'market_chart/range' (from the step of
+#     the last stored point, which may be a live point to replace)
+#   - the last stored point is younger than one step of the granularity -> no download at all
+# Then the requested window is read from the local Parquet files.
+DAY_MS = 24 * 60 * 60 * 1000
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+def _plan_store_fetch(store: MarketChartStore, sym: Symbol, curr: Currency, days: int, now_ms: int) -> tuple[SeriesKey, str, int | None]:
+    granularity = infra_get_granularity_coingecko(days)
+    series_key = (Provider.COINGECKO, sym, curr, granularity)
+    step_ms = GRANULARITY_SECONDS[granularity] * 1000
+    bounds = store.bounds(series_key)
+    if bounds is None or bounds[0] > now_ms - days * DAY_MS + step_ms:
+        return series_key, 'full', None
+    if now_ms - bounds[1] < step_ms:
+        return series_key, 'none', bounds[1]
+    return series_key, 'delta', bounds[1]
+
+def _step_start_ms(timestamp_ms: int, series_key: SeriesKey) -> int:
+    #start of the step of the absolute grid holding timestamp_ms: a delta download starts there, so the last stored step
+    #(maybe a live point) is downloaded again and replaced
+    step_ms = GRANULARITY_SECONDS[series_key[3]] * 1000
+    return timestamp_ms // step_ms * step_ms
+
+def _thin_to_step(chart: MarketChartData, step_ms: int) -> MarketChartData:
+    #'market_chart/range' returns finer points for short ranges (5-minute under 1 day, hourly under 90 days), and every answer
+    #ends with the live price of the moment of the request. Keep only the first point of every step of the absolute grid
+    #(timestamp // step_ms): the stored series keeps its granularity and the grid doesn't move with the time of the request.
+    _, first_idx = np.unique(chart.timestamps // step_ms, return_index=True)
+    return MarketChartData.from_arrays(
+        chart.symbol, chart.currency, chart.timestamps[first_idx], chart.prices[first_idx],
+        total_volumes=chart.total_volumes[first_idx] if chart.total_volumes is not None else None,
+    )
+
+def _merge_store(store: MarketChartStore, series_key: SeriesKey, fetched: MarketChartData | None) -> None:
+    if fetched is not None:
+        thinned = _thin_to_step(fetched, GRANULARITY_SECONDS[series_key[3]] * 1000)
+        if not len(thinned):
+            return
+        #the fetched points replace the stored ones from the step of their first point on: a live point stored by an earlier
+        #download (the last step, still open) gives way to the point the provider now has for that step
+        store.merge(series_key, thinned.timestamps, thinned.prices, thinned.total_volumes,
+                    replace_from_ms=_step_start_ms(int(thinned.timestamps[0]), series_key))
+
+def _window_start_ms(days: int, now_ms: int, start_ms: int | None) -> int:
+    window_start_ms = now_ms - days * DAY_MS
+    return max(window_start_ms, start_ms) if start_ms is not None else window_start_ms
+
+def _read_store(store: MarketChartStore, series_key: SeriesKey, sym: Symbol, curr: Currency, days: int, now_ms: int,
+                start_ms: int | None = None, end_ms: int | None = None) -> MarketChartData:
+    #range push-down: only the year files and rows of the requested part of the window are read
+    timestamps_ms, prices, volumes = store.read(series_key, start_ms=_window_start_ms(days, now_ms, start_ms), end_ms=end_ms, with_volumes=True)
+    #no known volume in the window (e.g. stored before the volumes were kept) -> no volume column
+    return MarketChartData.from_arrays(sym, curr, timestamps_ms, prices, total_volumes=None if np.isnan(volumes).all() else volumes)
+
+def _download_for_store_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> tuple[SeriesKey, MarketChartData | None, str, int | None, int]:
+    #(series_key, fetched points or None, mode, last stored timestamp, now): what the store is missing for the window
+    now_ms = _now_ms()
+    series_key, mode, last_ms = _plan_store_fetch(MARKET_CHART_STORE, sym, curr, days, now_ms)
+    fetched = None
+    if mode == 'full' and days >= MARKET_CHART_STREAM_MIN_DAYS:
+        fetched = infra_get_streamed_market_chart_coingecko(sym, curr, days)
+    elif mode == 'full':
+        fetched = infra_parse_raw_market_chart_coingecko(infra_get_raw_market_chart_coingecko(sym, curr, days), sym, curr, extras=MARKET_CHART_EXTRAS)
+    elif mode == 'delta':
+        raw_data = infra_get_raw_market_chart_range_coingecko(sym, curr, _step_start_ms(last_ms, series_key) // 1000, now_ms // 1000)
+        fetched = infra_parse_raw_market_chart_coingecko(raw_data, sym, curr, extras=MARKET_CHART_EXTRAS)
+    return series_key, fetched, mode, last_ms, now_ms
+
+async def _download_for_store_coingecko_async(    sym: Symbol,     curr: Currency,     days: int) -> tuple[SeriesKey, MarketChartData | None, str, int | None, int]:
+    now_ms = _now_ms()
+    #file I/O goes to worker threads, the HTTP waits stay on the event loop
+    series_key, mode, last_ms = await asyncio.to_thread(_plan_store_fetch, MARKET_CHART_STORE, sym, curr, days, now_ms)
+    fetched = None
+    if mode == 'full' and days >= MARKET_CHART_STREAM_MIN_DAYS:
+        fetched = await infra_get_streamed_market_chart_coingecko_async(sym, curr, days)
+    elif mode == 'full':
+        raw_data = await infra_get_raw_market_chart_coingecko_async(sym, curr, days)
+        #parsing is CPU work proportional to the payload: worker thread, like the path without a store
+        fetched = await asyncio.to_thread(infra_parse_raw_market_chart_coingecko, raw_data, sym, curr, False, MARKET_CHART_EXTRAS)
+    elif mode == 'delta':
+        raw_data = await infra_get_raw_market_chart_range_coingecko_async(sym, curr, _step_start_ms(last_ms, series_key) // 1000, now_ms // 1000)
+        fetched = await asyncio.to_thread(infra_parse_raw_market_chart_coingecko, raw_data, sym, curr, False, MARKET_CHART_EXTRAS)
+    return series_key, fetched, mode, last_ms, now_ms
+
+# Bringing the store up to date (download what is missing + merge) is single-flight per series and window: concurrent
+# requests reading the store in any way (whole window, range, summaries) share one download and one merge, then each reads
+# what it needs. (series_key, now_ms) of the update is returned.
+def _store_update_key(sym: Symbol, curr: Currency, days: int) -> tuple:
+    return _market_chart_key(sym, curr, days) + ('store',)
+
+def _download_and_merge_store_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> tuple[SeriesKey, int]:
+    series_key, fetched, mode, last_ms, now_ms = _download_for_store_coingecko(sym, curr, days)
+    _merge_store(MARKET_CHART_STORE, series_key, fetched)
+    return series_key, now_ms
+
+async def _download_and_merge_store_coingecko_async(    sym: Symbol,     curr: Currency,     days: int) -> tuple[SeriesKey, int]:
+    series_key, fetched, mode, last_ms, now_ms = await _download_for_store_coingecko_async(sym, curr, days)
+    await asyncio.to_thread(_merge_store, MARKET_CHART_STORE, series_key, fetched)
+    return series_key, now_ms
+
+def _update_store_coingecko(    sym: Symbol,     curr: Currency,     days: int) -> tuple[SeriesKey, int]:
+    return MARKET_CHART_FLIGHT.do(_store_update_key(sym, curr, days), lambda: _download_and_merge_store_coingecko(sym, curr, days))
+
+async def _update_store_coingecko_async(    sym: Symbol,     curr: Currency,     days: int) -> tuple[SeriesKey, int]:
+    return await MARKET_CHART_FLIGHT_ASYNC.do(_store_update_key(sym, curr, days), lambda: _download_and_merge_store_coingecko_async(sym, curr, days))
+
+def _fetch_through_store_coingecko(    sym: Symbol,     curr: Currency,     days: int,     start_ms: int | None = None,     end_ms: int | None = None) -> MarketChartData:
+    series_key, now_ms = _update_store_coingecko(sym, curr, days)
+    return _read_store(MARKET_CHART_STORE, series_key, sym, curr, days, now_ms, start_ms, end_ms)
+
+async def _fetch_through_store_coingecko_async(    sym: Symbol,     curr: Currency,     days: int,     start_ms: int | None = None,     end_ms: int | None = None) -> MarketChartData:
+    series_key, now_ms = await _update_store_coingecko_async(sym, curr, days)
+    return await asyncio.to_thread(_read_store, MARKET_CHART_STORE, series_key, sym, curr, days, now_ms, start_ms, end_ms)
+
+# 4b) Summaries of the stored window (see MarketChartStore.summaries): the store is brought up to date like in 4) (same
+# single-flight update), then the window is answered from the per-year summaries, without reading the points of the years
+# it fully covers. (summaries, last summarized timestamp), None when there is no store (the caller computes from the chart
+# instead).
+def _summarize_store(store: MarketChartStore, series_key: SeriesKey, days: int, now_ms: int, name: str,
+                     build: Callable[[np.ndarray, np.ndarray], dict]) -> tuple[list[dict], int | None]:
+    return store.summaries(series_key, name, build, start_ms=_window_start_ms(days, now_ms, None))
+
+def infra_get_market_chart_summaries_coingecko(    sym: Symbol,     curr: Currency,     days: int,     name: str,     build: Callable[[np.ndarray, np.ndarray], dict]) -> tuple[list[dict], int | None] | None:
+    if MARKET_CHART_STORE is None:
+        return None
+    series_key, now_ms = _update_store_coingecko(sym, curr, days)
+    return _summarize_store(MARKET_CHART_STORE, series_key, days, now_ms, name, build)
+
+async def infra_get_market_chart_summaries_coingecko_async(    sym: Symbol,     curr: Currency,     days: int,     name: str,     build: Callable[[np.ndarray, np.ndarray], dict]) -> tuple[list[dict], int | None] | None:
+    if MARKET_CHART_STORE is None:
+        return None
+    series_key, now_ms = await _update_store_coingecko_async(sym, curr, days)
+    return await asyncio.to_thread(_summarize_store, MARKET_CHART_STORE, series_key, days, now_ms, name, build)
+
+# Helper shared by the sync and async fetchers -> returns the URL and the query params of a /coins/{id}/{endpoint} request
+# endpoint is 'market_chart' (last N days) or 'market_chart/range' (from/to UNIX seconds)
+def _build_coingecko_request(    sym: Symbol,     curr: Currency,     endpoint: str,     extra_params: dict) -> tuple[str, dict]:
     # 1 ) First we need to map if the currency and symbol are supported by this provider:
     
     # Could raise errors.InfrastructureProviderNotCompatibleError. We let them go up
@@ -34,32 +350,18 @@ def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,
     try:
         #Build the URL for the request:
         api_key = os.getenv("COINGECKO_API_KEY_DEMO")
-        URL =  f'https://api.coingecko.com/api/v3/coins/{id_sym}/market_chart?x_cg_demo_api_key={api_key}'
+        URL =  f'{COINGECKO_BASE_URL}/coins/{id_sym}/{endpoint}?x_cg_demo_api_key={api_key}'
     except errors.InfrastructureBadURL as e: #this error would be raised by us if something is wrong with the URL construction. But in this moment there is no possible error here.
         raise e  
-        
     
-    # 3 ) Now we proceed with the httpx request
     params = {
         'vs_currency': id_curr, 
-        'days': days
+        **extra_params
     }
-    try:
-        response = httpx.get(URL, params = params, timeout = 5.0) 
-        #response2 = httpx.request("GET", URL, params = params, timeout = 5.0)
-    except httpx.TimeoutException:
-        raise errors.InfrastructureExternalApiTimeout
-    except httpx.RequestError:
-        raise errors.InfrastructureExternalApiError
-    except Exception: #Generic exception for any other unexpected error
-        raise errors.InfrastructureExternalApiError
-    
-    #the reason why we first catch timeout, then requestError and then generic exception is because TimeoutException is a subclass of RequestError (https://www.python-httpx.org/exceptions/), so if we catch first RequestError, TimeoutException will never be catched. Besides that, TimeoutException is a specific case that we want to handle separately. RequestError is a more general case that includes other types of request-related errors, such as connection errors, DNS resolution failures, etc. Anyway, it's important that whatever the error catcher structure is, we must be sure that all exceptions raised in the try block are catched, otherwise the function would fail without raising our defined Infrastructure errors.
-    #The most simple way to catch all errors is:
-    #except Exception: 
-    # this would catch all exceptions, but we would lose granularity. So the best way is to catch first the specific exceptions we want to handle separately, and then a generic exception for any other unexpected error.
-    #So always, for security, we must have a generic exception catcher at the end like except Exception: This will ensure that any unexpected error is caught and handled appropriately.
-    #---
+    return URL, params
+
+# Helper shared by the sync and async fetchers -> checks the status code and decodes the JSON body
+def _parse_market_chart_response(response: httpx.Response, URL: str) -> dict:
     #in this point we have the response, so there was communication. Now we need to evaluate the type of response (status code)
     #possible status codes in this point are:
     # 200: OK 
@@ -76,16 +378,190 @@ def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,
     #in this point we have the parsed JSON data. 
     return parsed_data
 
-# 2 ) Function to clean the raw market chart data from CoinGecko API -> returns a list of PricePoint (domain entity)
+# Helper shared by every sync request -> performs the GET and returns the decoded JSON
+def _request_json(URL: str, params: dict, client: httpx.Client | None = None) -> dict:
+    # 3 ) Now we proceed with the httpx request
+    if client is None:
+        client = get_http_client()
+    try:
+        response = client.get(URL, params = params) #timeout and connection limits are configured in the shared client (http_client.py)
+    except httpx.TimeoutException:
+        raise errors.InfrastructureExternalApiTimeout
+    except httpx.RequestError:
+        raise errors.InfrastructureExternalApiError
+    except Exception: #Generic exception for any other unexpected error
+        raise errors.InfrastructureExternalApiError
+    
+    #the reason why we first catch timeout, then requestError and then generic exception is because TimeoutException is a subclass of RequestError (https://www.python-httpx.org/exceptions/), so if we catch first RequestError, TimeoutException will never be catched. Besides that, TimeoutException is a specific case that we want to handle separately. RequestError is a more general case that includes other types of request-related errors, such as connection errors, DNS resolution failures, etc. Anyway, it's important that whatever the error catcher structure is, we must be sure that all exceptions raised in the try block are catched, otherwise the function would fail without raising our defined Infrastructure errors.
+    #The most simple way to catch all errors is:
+    #except Exception: 
+    # this would catch all exceptions, but we would lose granularity. So the best way is to catch first the specific exceptions we want to handle separately, and then a generic exception for any other unexpected error.
+    #So always, for security, we must have a generic exception catcher at the end like except Exception: This will ensure that any unexpected error is caught and handled appropriately.
+    #---
+    return _parse_market_chart_response(response, URL)
+
+# Helper shared by every async request -> same as _request_json through the shared httpx.AsyncClient
+async def _request_json_async(URL: str, params: dict, client: httpx.AsyncClient | None = None) -> dict:
+    if client is None:
+        client = get_async_http_client()
+    try:
+        response = await client.get(URL, params = params)
+    except httpx.TimeoutException:
+        raise errors.InfrastructureExternalApiTimeout
+    except httpx.RequestError:
+        raise errors.InfrastructureExternalApiError
+    except Exception: #Same error structure as the sync version
+        raise errors.InfrastructureExternalApiError
+    
+    return _parse_market_chart_response(response, URL)
+
+# 1 ) Function to get raw market chart data from CoinGecko API -> returns the raw JSON data as a dict
+def infra_get_raw_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int, client: httpx.Client | None = None) -> dict:
+    '''
+    Fetch market chart data from CoinGecko API.
+    The request goes through the shared pooled client (keep-alive connections) unless a client is injected.
+    '''
+    URL, params = _build_coingecko_request(sym, curr, 'market_chart', {'days': days})
+    return _request_json(URL, params, client)
+
+# 1b) Async version of 1) -> same request through the shared httpx.AsyncClient
+async def infra_get_raw_market_chart_coingecko_async(    sym: Symbol,     curr: Currency,     days: int, client: httpx.AsyncClient | None = None) -> dict:
+    '''
+    Fetch market chart data from CoinGecko API without blocking the event loop.
+    '''
+    URL, params = _build_coingecko_request(sym, curr, 'market_chart', {'days': days})
+    return await _request_json_async(URL, params, client)
+
+# 1c) Function to get raw market chart data between two instants (UNIX seconds) -> used to download only the missing tail of a stored series
+def infra_get_raw_market_chart_range_coingecko(    sym: Symbol,     curr: Currency,     from_s: int,     to_s: int, client: httpx.Client | None = None) -> dict:
+    URL, params = _build_coingecko_request(sym, curr, 'market_chart/range', {'from': from_s, 'to': to_s})
+    return _request_json(URL, params, client)
+
+async def infra_get_raw_market_chart_range_coingecko_async(    sym: Symbol,     curr: Currency,     from_s: int,     to_s: int, client: httpx.AsyncClient | None = None) -> dict:
+    URL, params = _build_coingecko_request(sym, curr, 'market_chart/range', {'from': from_s, 'to': to_s})
+    return await _request_json_async(URL, params, client)
+
+# 1d) Streaming fetch of long histories -> returns MarketChartData directly, the body is never materialized as a dict.
+# The response is read with iter_bytes and decoded chunk by chunk into typed arrays (see streaming.py).
+def _content_length(response: httpx.Response) -> int | None:
+    value = response.headers.get('content-length')
+    return int(value) if value and value.isdigit() else None
+
+def _stream_error(response: httpx.Response, URL: str) -> errors.InfrastructureExternalApiError:
+    return errors.InfrastructureExternalApiError(f'CoinGecko API error {response.status_code} for URL: {URL}\nResponse body: {response.text[:200]}')
+
+def _streamed_market_chart(series: dict, sym: Symbol, curr: Currency) -> MarketChartData:
+    if 'prices' not in series:
+        raise errors.InfrastructureExternalApiMalformedResponse("Missing 'prices' in CoinGecko response")
+    timestamps_ms, prices = _sort_unique(*series['prices'])
+    extras = {key: _align_to(timestamps_ms, *_sort_unique(*series[key])) for key in MARKET_CHART_EXTRAS if key in series and len(series[key][0])}
+    return MarketChartData.from_arrays(sym, curr, timestamps_ms, prices, **extras)
+
+def infra_get_streamed_market_chart_coingecko(    sym: Symbol,     curr: Currency,     days: int, client: httpx.Client | None = None) -> MarketChartData:
+    '''
+    Fetch and decode market chart data while it is downloaded. Peak memory ~ final arrays + one chunk.
+    '''
+    URL, params = _build_coingecko_request(sym, curr, 'market_chart', {'days': days})
+    if client is None:
+        client = get_http_client()
+    try:
+        with client.stream('GET', URL, params = params) as response:
+            if response.status_code != 200:
+                response.read()
+                raise _stream_error(response, URL)
+            decoder = MarketChartStreamDecoder(_content_length(response), keys=('prices',) + MARKET_CHART_EXTRAS)
+            for chunk in response.iter_bytes():
+                decoder.feed(chunk)
+    except (errors.InfrastructureExternalApiError, errors.InfrastructureExternalApiMalformedResponse):
+        raise
+    except httpx.TimeoutException: #same error structure as _request_json, but the body download is inside the try too
+        raise errors.InfrastructureExternalApiTimeout
+    except httpx.RequestError:
+        raise errors.InfrastructureExternalApiError
+    except Exception:
+        raise errors.InfrastructureExternalApiError
+    return _streamed_market_chart(decoder.finish(), sym, curr)
+
+async def infra_get_streamed_market_chart_coingecko_async(    sym: Symbol,     curr: Currency,     days: int, client: httpx.AsyncClient | None = None) -> MarketChartData:
+    URL, params = _build_coingecko_request(sym, curr, 'market_chart', {'days': days})
+    if client is None:
+        client = get_async_http_client()
+    try:
+        async with client.stream('GET', URL, params = params) as response:
+            if response.status_code != 200:
+                await response.aread()
+                raise _stream_error(response, URL)
+            decoder = MarketChartStreamDecoder(_content_length(response), keys=('prices',) + MARKET_CHART_EXTRAS)
+            async for chunk in response.aiter_bytes():
+                decoder.feed(chunk) #a few vectorized passes over one chunk: cheap enough to stay on the event loop
+    except (errors.InfrastructureExternalApiError, errors.InfrastructureExternalApiMalformedResponse):
+        raise
+    except httpx.TimeoutException:
+        raise errors.InfrastructureExternalApiTimeout
+    except httpx.RequestError:
+        raise errors.InfrastructureExternalApiError
+    except Exception:
+        raise errors.InfrastructureExternalApiError
+    return _streamed_market_chart(decoder.finish(), sym, curr)
+
+# 2 ) Vectorized parser: raw CoinGecko payload -> typed NumPy columns in one pass (no Python object per point).
+# Timestamps are kept as int64 epoch milliseconds, i.e. UTC (the old loop used datetime.fromtimestamp -> server local time).
+def _parse_pairs(raw_data: dict, key: str) -> tuple[np.ndarray, np.ndarray]:
+    values = raw_data.get(key) if isinstance(raw_data, dict) else None
+    if not isinstance(values, list):
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Missing '{key}' in CoinGecko response")
+    if not values:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    try:
+        pairs = np.asarray(values, dtype=np.float64) #one C-level pass over the nested lists, null -> NaN
+    except (TypeError, ValueError) as e:
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: {e}")
+    if pairs.ndim != 2 or pairs.shape[1] != 2:
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: expected [timestamp, value] pairs, got shape {pairs.shape}")
+    if not np.isfinite(pairs[:, 0]).all():
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: missing or non-numeric timestamps")
+    return np.rint(pairs[:, 0]).astype(np.int64), np.ascontiguousarray(pairs[:, 1])
+
+def _sort_unique(timestamps_ms: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    #Fast path: CoinGecko already sends strictly increasing timestamps. Otherwise sort and keep the LAST value of every duplicated timestamp.
+    if len(timestamps_ms) < 2 or (np.diff(timestamps_ms) > 0).all():
+        return timestamps_ms, values
+    order = np.argsort(timestamps_ms, kind='stable')
+    timestamps_ms, values = timestamps_ms[order], values[order]
+    keep = np.append(timestamps_ms[1:] != timestamps_ms[:-1], True)
+    return timestamps_ms[keep], values[keep]
+
+def _parse_sorted_pairs(raw_data: dict, key: str) -> tuple[np.ndarray, np.ndarray]:
+    return _sort_unique(*_parse_pairs(raw_data, key))
+
+def _align_to(timestamps_ms: np.ndarray, other_timestamps_ms: np.ndarray, other_values: np.ndarray) -> np.ndarray:
+    #market_caps / total_volumes usually share the prices timestamps; if not, match them exactly and leave NaN where missing
+    if np.array_equal(timestamps_ms, other_timestamps_ms):
+        return other_values
+    aligned = np.full(len(timestamps_ms), np.nan)
+    if len(other_timestamps_ms):
+        idx = np.minimum(np.searchsorted(other_timestamps_ms, timestamps_ms), len(other_timestamps_ms) - 1)
+        match = other_timestamps_ms[idx] == timestamps_ms
+        aligned[match] = other_values[idx[match]]
+    return aligned
+
+def infra_parse_raw_market_chart_coingecko(raw_data: dict, sym: Symbol, curr: Currency, with_extras: bool = False,
+                                           extras: tuple[str, ...] = ()) -> MarketChartData:
+    '''
+    Parse a market_chart payload into a columnar MarketChartData (UTC epoch-ms timestamps, sorted, unique).
+    extras names the other series to parse ('market_caps', 'total_volumes'; with_extras=True -> both), aligned to the
+    price timestamps when present.
+    '''
+    timestamps_ms, prices = _parse_sorted_pairs(raw_data, 'prices')
+    columns = {}
+    for key in ('market_caps', 'total_volumes') if with_extras else extras:
+        if raw_data.get(key):
+            columns[key] = _align_to(timestamps_ms, *_parse_sorted_pairs(raw_data, key))
+    return MarketChartData.from_arrays(sym, curr, timestamps_ms, prices, **columns)
+
+# 2b) Previous point-by-point API, kept for compatibility -> returns a list of PricePoint (domain entity), built from the vectorized parser.
 def infra_clean_raw_market_chart_coingecko(raw_data: dict, mandatory_key: str = 'prices') -> list[PricePoint]:
     #raw data must have the 'prices' field
-    if (mandatory_key not in raw_data) or (not isinstance(raw_data[mandatory_key], list)):
-        raise errors.InfrastructureExternalApiMalformedResponse("Missing 'prices' in CoinGecko response")        
-    price_points = []
-    for item in raw_data.get('prices', []):
-        timestamp = datetime.fromtimestamp(item[0] / 1000.0)
-        price = float(item[1])
-        price_point = PricePoint(timestamp=timestamp, price=price)
-        price_points.append(price_point)        
-    return price_points
-
+    timestamps_ms, prices = _parse_sorted_pairs(raw_data, mandatory_key)
+    datetimes = timestamps_ms.astype('datetime64[ms]').astype(object).tolist()
+    return [PricePoint(timestamp=ts, price=px) for ts, px in zip(datetimes, prices.tolist())]
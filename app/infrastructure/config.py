@@ -0,0 +1,22 @@
+import os
+
+# Small helpers to read typed settings from environment variables (see .env.example).
+# Empty or missing variables fall back to the default.
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+def env_float(name: str, default: float | None) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if not value:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def env_str(name: str, default: str | None = None) -> str | None:
+    value = os.getenv(name)
+    return value if value else default
@@ -0,0 +1,103 @@
+import threading
+import importlib.util
+
+import httpx
+
+from app.infrastructure.config import env_int, env_float, env_bool
+
+# Shared HTTP client for the infrastructure layer.
+# Calling httpx.get() opens (and closes) a brand new connection for every request, so every hit to the provider pays a
+# full TCP + TLS handshake. Here we keep ONE long-lived httpx.Client with a connection pool: connections are kept alive and
+# reused between requests. The API creates it at startup and closes it at shutdown (see app/api/main.py, lifespan).
+# Scripts and tests that never call init_http_client() still work: get_http_client() creates the client lazily.
+# The asyncio request path uses the same idea with one shared httpx.AsyncClient (same settings, separate pool).
+
+# -------- Settings (from environment variables, see .env.example) -------- #
+
+def _http2_available() -> bool:
+    # httpx only speaks HTTP/2 if the 'h2' package is installed (pinned in requirements.txt, i.e. httpx[http2]).
+    return importlib.util.find_spec('h2') is not None
+
+def build_http_client_settings() -> dict:
+    '''
+    Build the keyword arguments for httpx.Client / httpx.AsyncClient from the environment.
+    '''
+    limits = httpx.Limits(
+        max_connections            = env_int('HTTP_MAX_CONNECTIONS', 100),
+        max_keepalive_connections  = env_int('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20),
+        keepalive_expiry           = env_float('HTTP_KEEPALIVE_EXPIRY', 30.0),
+    )
+    #waiting for a free pooled connection has no limit by default: beyond max_connections the requests queue (the asyncio
+    #path keeps thousands of upstream waits in flight) instead of failing with PoolTimeout after HTTP_TIMEOUT
+    timeout = httpx.Timeout(env_float('HTTP_TIMEOUT', 5.0), pool=env_float('HTTP_POOL_TIMEOUT', None))
+    #HTTP/2 is requested by default; installs without 'h2' (e.g. a trimmed environment) fall back to HTTP/1.1 keep-alive.
+    http2 = env_bool('HTTP_HTTP2', True) and _http2_available()
+    return {'limits': limits, 'timeout': timeout, 'http2': http2}
+
+# -------- Lifecycle -------- #
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+def init_http_client(client: httpx.Client | None = None) -> httpx.Client:
+    '''
+    Create (or inject) the shared client. Called once at API startup.
+    '''
+    global _client
+    with _client_lock:
+        if _client is not None and _client is not client:
+            _client.close()
+        _client = client if client is not None else httpx.Client(**build_http_client_settings())
+        return _client
+
+def get_http_client() -> httpx.Client:
+    '''
+    Return the shared client, creating it on first use if nobody initialised it.
+    '''
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(**build_http_client_settings())
+    return _client
+
+def close_http_client() -> None:
+    '''
+    Close the shared client and release its pooled connections. Called once at API shutdown.
+    '''
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+# -------- Async lifecycle -------- #
+# An httpx.AsyncClient belongs to the event loop that uses it, so it is created inside the running loop (API startup).
+
+_async_client: httpx.AsyncClient | None = None
+
+def init_async_http_client(client: httpx.AsyncClient | None = None) -> httpx.AsyncClient:
+    '''
+    Create (or inject) the shared async client. Called once at API startup, inside the event loop.
+    '''
+    global _async_client
+    _async_client = client if client is not None else httpx.AsyncClient(**build_http_client_settings())
+    return _async_client
+
+def get_async_http_client() -> httpx.AsyncClient:
+    '''
+    Return the shared async client, creating it on first use if nobody initialised it.
+    '''
+    global _async_client
+    if _async_client is None:
+        _async_client = httpx.AsyncClient(**build_http_client_settings())
+    return _async_client
+
+async def close_async_http_client() -> None:
+    '''
+    Close the shared async client. Called once at API shutdown.
+    '''
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Any
+
+# Single-flight ("request coalescing").
+# When several callers ask for the same key at the same time, only the first one (the leader) runs the function.
+# The others wait for that same execution and receive its result (or its exception). Once the call finishes the key is
+# released, so the next caller triggers a new execution: this is NOT a cache, it only merges calls that overlap in time.
+# There is one class for the threaded path (sync routes, scripts) and one for the asyncio path.
+
+
+class _FlightStats:
+    # Counters shared by both implementations
+    def __init__(self):
+        self.calls = 0        # every call to do()
+        self.executions = 0   # calls that really ran the function (leaders)
+        self.coalesced = 0    # calls served by an execution that was already in flight (hits)
+
+    def _stats(self, in_flight: int) -> dict:
+        return {
+            'calls': self.calls,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'coalesce_ratio': self.coalesced / self.calls if self.calls else 0.0,
+            'in_flight': in_flight,
+        }
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight(_FlightStats):
+    '''
+    Thread-based single-flight group.
+    '''
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        with self._lock:
+            return self._stats(len(self._calls))
+
+
+class AsyncSingleFlight(_FlightStats):
+    '''
+    asyncio-based single-flight group. Must be used from one event loop.
+    '''
+    def __init__(self):
+        super().__init__()
+        self._tasks: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._tasks.get(key)
+        if task is None:
+            self.executions += 1
+            #The execution runs in its own task: if the leader is cancelled (client disconnected) the followers still get the result.
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda t, key=key: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception() #mark the exception as retrieved even if every caller went away
+
+    def stats(self) -> dict:
+        return self._stats(len(self._tasks))
@@ -0,0 +1,231 @@
+import json
+import os
+import threading
+import uuid
+from collections.abc import Callable
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.domain.entities import Symbol, Currency, Provider, Granularity
+
+# Persistent columnar store of price series (Parquet files).
+# Layout (hive-style partitions, one file per calendar year so an append only rewrites the current year):
+#
+#   {root}/provider=coingecko/symbol=bitcoin/currency=usd/granularity=hourly/year=2024.parquet
+#
+# Each file has three columns: timestamp (int64, epoch milliseconds UTC, sorted, unique), price (float64) and total_volume
+# (float64, NaN when unknown; files written before the column existed read as NaN).
+# Historical points never change, so once a point is stored we never need to download it again.
+#
+# Next to every year file, optional JSON sidecars keep summaries of its points (e.g. year=2024.moments.json), so statistics
+# over many years can be merged from per-year summaries instead of reading the points again. A sidecar is built on first
+# use and deleted when its year file is rewritten.
+
+SCHEMA = pa.schema([('timestamp', pa.int64()), ('price', pa.float64()), ('total_volume', pa.float64())])
+
+SeriesKey = tuple[Provider, Symbol, Currency, Granularity]
+
+_MISSING = object() #bounds not loaded yet (None means an empty series)
+
+
+def _years_of(timestamps_ms: np.ndarray) -> np.ndarray:
+    return timestamps_ms.astype('datetime64[ms]').astype('datetime64[Y]').astype(np.int64) + 1970
+
+def _year_bounds_ms(year: int) -> tuple[int, int]:
+    start = np.datetime64(f'{year}-01-01', 'ms').astype(np.int64)
+    end = np.datetime64(f'{year + 1}-01-01', 'ms').astype(np.int64) - 1
+    return int(start), int(end)
+
+
+class MarketChartStore:
+    '''
+    Parquet time-series store partitioned by provider/symbol/currency/granularity/year.
+    '''
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._locks: dict[SeriesKey, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self._bounds: dict[SeriesKey, tuple[int, int] | None] = {} #(first, last) timestamp per series, loaded lazily
+
+    # -------- Paths & locks -------- #
+
+    def partition_dir(self, key: SeriesKey) -> Path:
+        provider, symbol, currency, granularity = key
+        return (self.root / f'provider={provider.value}' / f'symbol={symbol.value}'
+                / f'currency={currency.value}' / f'granularity={granularity.value}')
+
+    def _year_path(self, key: SeriesKey, year: int) -> Path:
+        return self.partition_dir(key) / f'year={year}.parquet'
+
+    def _years(self, key: SeriesKey) -> list[int]:
+        directory = self.partition_dir(key)
+        if not directory.is_dir():
+            return []
+        return sorted(int(p.stem.split('=')[1]) for p in directory.glob('year=*.parquet'))
+
+    def _lock(self, key: SeriesKey) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    # -------- Read -------- #
+
+    def _read_file(self, path: Path, start_ms: int | None = None, end_ms: int | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        filters = []
+        if start_ms is not None:
+            filters.append(('timestamp', '>=', start_ms))
+        if end_ms is not None:
+            filters.append(('timestamp', '<=', end_ms))
+        table = pq.read_table(path, schema=SCHEMA, filters=filters or None)
+        timestamps = table.column('timestamp').to_numpy()
+        prices = table.column('price').to_numpy()
+        volumes = table.column('total_volume').to_numpy(zero_copy_only=False) #null -> NaN
+        return timestamps, prices, volumes
+
+    def bounds(self, key: SeriesKey) -> tuple[int, int] | None:
+        '''
+        (first, last) stored timestamp in epoch ms, or None if nothing is stored for this series.
+        '''
+        bounds = self._bounds.get(key, _MISSING)
+        if bounds is not _MISSING:
+            return bounds
+        #filled and returned under the lock from a local: a merge dropping the entry (outside this lock) can't make it vanish
+        with self._lock(key):
+            years = self._years(key)
+            if not years:
+                bounds = None
+            else:
+                first_ts = self._read_file(self._year_path(key, years[0]))[0]
+                last_ts = self._read_file(self._year_path(key, years[-1]))[0]
+                bounds = (int(first_ts[0]), int(last_ts[-1]))
+            self._bounds[key] = bounds
+        return bounds
+
+    def read(self, key: SeriesKey, start_ms: int | None = None, end_ms: int | None = None,
+             with_volumes: bool = False) -> tuple[np.ndarray, ...]:
+        '''
+        Stored (timestamps, prices) with start_ms <= timestamp <= end_ms, + volumes if with_volumes. Only the year files
+        overlapping the range are opened.
+        '''
+        timestamps, prices, volumes = [], [], []
+        with self._lock(key):
+            for year in self._years(key):
+                year_start, year_end = _year_bounds_ms(year)
+                if (start_ms is not None and year_end < start_ms) or (end_ms is not None and year_start > end_ms):
+                    continue
+                ts, px, vol = self._read_file(self._year_path(key, year), start_ms, end_ms)
+                timestamps.append(ts)
+                prices.append(px)
+                volumes.append(vol)
+        if not timestamps:
+            columns = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64))
+        else:
+            columns = (np.concatenate(timestamps), np.concatenate(prices), np.concatenate(volumes))
+        return columns if with_volumes else columns[:2]
+
+    # -------- Partition summaries -------- #
+
+    def _summary_path(self, key: SeriesKey, year: int, name: str) -> Path:
+        return self.partition_dir(key) / f'year={year}.{name}.json'
+
+    def _year_summary(self, key: SeriesKey, year: int, name: str, build: Callable[[np.ndarray, np.ndarray], dict]) -> dict:
+        #sidecar of a whole year file: {'first_ms', 'last_ms', 'summary'}
+        path = self._summary_path(key, year, name)
+        if path.exists():
+            with open(path) as f:
+                return json.load(f)
+        timestamps, prices, _ = self._read_file(self._year_path(key, year))
+        sidecar = {'first_ms': int(timestamps[0]), 'last_ms': int(timestamps[-1]), 'summary': build(timestamps, prices)}
+        tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(sidecar, f)
+        os.replace(tmp_path, path)
+        return sidecar
+
+    def summaries(self, key: SeriesKey, name: str, build: Callable[[np.ndarray, np.ndarray], dict],
+                  start_ms: int | None = None, end_ms: int | None = None) -> tuple[list[dict], int | None]:
+        '''
+        Summaries of the stored points with start_ms <= timestamp <= end_ms, one per year file in time order, and the last
+        summarized timestamp (None if no point is in the range). build(timestamps, prices) summarizes some points into a
+        JSON-serializable dict. Years whose points are all in the range are answered from their sidecar; only the years cut
+        by the range read their points.
+        '''
+        result, last_ms = [], None
+        with self._lock(key):
+            for year in self._years(key):
+                year_start, year_end = _year_bounds_ms(year)
+                if (start_ms is not None and year_end < start_ms) or (end_ms is not None and year_start > end_ms):
+                    continue
+                sidecar = self._year_summary(key, year, name, build)
+                if (start_ms is None or start_ms <= sidecar['first_ms']) and (end_ms is None or sidecar['last_ms'] <= end_ms):
+                    result.append(sidecar['summary'])
+                    last_ms = sidecar['last_ms']
+                    continue
+                timestamps, prices, _ = self._read_file(self._year_path(key, year), start_ms, end_ms)
+                if len(timestamps):
+                    result.append(build(timestamps, prices))
+                    last_ms = int(timestamps[-1])
+        return result, last_ms
+
+    # -------- Write -------- #
+
+    def merge(self, key: SeriesKey, timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray | None = None,
+              replace_from_ms: int | None = None) -> None:
+        '''
+        Insert points (and their volumes, NaN if None) into the series. On duplicated timestamps the new value wins. With
+        replace_from_ms, the stored points from that timestamp on are dropped first (the new points replace them). Only the
+        touched years are rewritten.
+        '''
+        timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+        prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.full(len(prices), np.nan) if volumes is None else np.asarray(volumes, dtype=np.float64)
+        if not len(timestamps_ms):
+            return
+        years = _years_of(timestamps_ms)
+        with self._lock(key):
+            self.partition_dir(key).mkdir(parents=True, exist_ok=True)
+            touched = set(np.unique(years).tolist())
+            if replace_from_ms is not None:
+                first_year = int(_years_of(np.array([replace_from_ms]))[0])
+                touched.update(year for year in self._years(key) if year >= first_year)
+            for year in sorted(touched):
+                mask = years == year
+                path = self._year_path(key, int(year))
+                if path.exists():
+                    old_ts, old_px, old_vol = self._read_file(path)
+                    if replace_from_ms is not None:
+                        kept = old_ts < replace_from_ms
+                        old_ts, old_px, old_vol = old_ts[kept], old_px[kept], old_vol[kept]
+                    ts = np.concatenate([old_ts, timestamps_ms[mask]])
+                    px = np.concatenate([old_px, prices[mask]])
+                    vol = np.concatenate([old_vol, volumes[mask]])
+                else:
+                    ts, px, vol = timestamps_ms[mask], prices[mask], volumes[mask]
+                if not len(ts):
+                    self._delete_file(path)
+                    continue
+                #sort and keep the LAST occurrence of every timestamp (the new one)
+                order = np.argsort(ts, kind='stable')
+                ts, px, vol = ts[order], px[order], vol[order]
+                keep = np.append(ts[1:] != ts[:-1], True)
+                self._write_file(path, ts[keep], px[keep], vol[keep])
+            self._bounds.pop(key, None) #reloaded on next bounds() call
+
+    def _write_file(self, path: Path, timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray) -> None:
+        table = pa.Table.from_arrays([pa.array(timestamps_ms), pa.array(prices), pa.array(volumes)], schema=SCHEMA)
+        #write to a temporary file and rename: readers never see a half-written file
+        tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+        self._delete_summaries(path)
+
+    def _delete_file(self, path: Path) -> None:
+        path.unlink(missing_ok=True)
+        self._delete_summaries(path)
+
+    def _delete_summaries(self, path: Path) -> None:
+        #the summaries of the previous content are stale
+        for sidecar in path.parent.glob(f'{path.stem}.*.json'):
+            sidecar.unlink(missing_ok=True)
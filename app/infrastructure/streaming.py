@@ -0,0 +1,143 @@
+import re
+
+import numpy as np
+
+from app.infrastructure import errors
+
+# Streaming decoder for CoinGecko market_chart bodies:
+#
+#   {"prices": [[1700000000000, 35000.1], ...], "market_caps": [[...], ...], "total_volumes": [[...], ...]}
+#
+# response.json() first builds the whole dict of nested lists (one Python list + 2 objects per point) and the parser then
+# copies it into arrays, so the peak memory is several times the payload. Here the body is fed chunk by chunk (httpx
+# iter_bytes) and every complete block of [timestamp, value] pairs is decoded with NumPy straight into growable typed arrays.
+# Memory stays around the size of the final arrays + one chunk, whatever the size of the body.
+# Only the shape above is understood: anything else is reported as a malformed response.
+
+SERIES_KEYS = ('prices', 'market_caps', 'total_volumes')
+
+_KEY_RE = re.compile(rb'"(' + b'|'.join(k.encode() for k in SERIES_KEYS) + rb')"\s*:\s*\[')
+_ARRAY_END_RE = re.compile(rb'\]\s*\]') #closing bracket of the last pair + closing bracket of the series
+_BRACKETS_TO_SPACES = bytes.maketrans(b'[]', b'  ')
+_ALLOWED_IN_BLOCK = b'0123456789.eE+-,[]na \t\r\n' #after null -> nan
+_MAX_KEY_TAIL = 64 #bytes kept between chunks while looking for the next key
+
+
+class _GrowableSeries:
+    # int64 timestamps + float64 values, preallocated and doubled when full (amortized O(1) append of blocks)
+    def __init__(self, capacity: int):
+        capacity = max(capacity, 16)
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float64)
+        self.size = 0
+
+    def extend(self, timestamps: np.ndarray, values: np.ndarray) -> None:
+        needed = self.size + len(timestamps)
+        if needed > len(self.timestamps):
+            capacity = max(needed, 2 * len(self.timestamps))
+            self.timestamps.resize(capacity, refcheck=False)
+            self.values.resize(capacity, refcheck=False)
+        self.timestamps[self.size:needed] = timestamps
+        self.values[self.size:needed] = values
+        self.size = needed
+
+    def finish(self) -> tuple[np.ndarray, np.ndarray]:
+        #shrink in place (realloc), no extra copy of the arrays
+        self.timestamps.resize(self.size, refcheck=False)
+        self.values.resize(self.size, refcheck=False)
+        return self.timestamps, self.values
+
+
+def _decode_pairs_block(block: bytes, key: str) -> tuple[np.ndarray, np.ndarray]:
+    # block = '[t, v], [t, v], ..., [t, v]' (complete pairs only)
+    pairs = block.count(b'[')
+    block = block.replace(b'null', b'nan')
+    if block.translate(None, _ALLOWED_IN_BLOCK) or block.count(b']') != pairs or block.count(b',') != 2 * pairs - 1:
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: expected [timestamp, value] pairs")
+    try:
+        flat = np.fromstring(block.translate(_BRACKETS_TO_SPACES), dtype=np.float64, sep=',')
+    except ValueError as e:
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: {e}")
+    if len(flat) != 2 * pairs:
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: expected [timestamp, value] pairs")
+    timestamps = flat[0::2]
+    if not np.isfinite(timestamps).all():
+        raise errors.InfrastructureExternalApiMalformedResponse(f"Malformed '{key}' in CoinGecko response: missing or non-numeric timestamps")
+    return np.rint(timestamps).astype(np.int64), flat[1::2]
+
+
+class MarketChartStreamDecoder:
+    '''
+    Incremental decoder: feed() the body chunks in order, then finish() -> {key: (timestamps_ms, values)}.
+    size_hint (e.g. Content-Length) is only used to preallocate the arrays.
+    '''
+    def __init__(self, size_hint: int | None = None, keys: tuple[str, ...] = SERIES_KEYS):
+        self.keys = keys
+        #~25 bytes per '[1700000000000,35000.12],' pair, the body holds up to 3 series
+        self._capacity = (size_hint // (25 * len(SERIES_KEYS))) if size_hint else 1024
+        self._buffer = b''
+        self._current: str | None = None #series being read, None while looking for the next key
+        self._series: dict[str, _GrowableSeries] = {}
+
+    def feed(self, chunk: bytes) -> None:
+        self._buffer += chunk
+        while self._step():
+            pass
+
+    def _step(self) -> bool:
+        # Consume as much of the buffer as possible. Returns True if the state changed and another step may progress.
+        if self._current is None:
+            match = _KEY_RE.search(self._buffer)
+            if match is None:
+                self._buffer = self._buffer[-_MAX_KEY_TAIL:]
+                return False
+            rest = self._buffer[match.end():].lstrip()
+            if not rest:
+                #not sure yet whether the series is empty: keep the key and wait for more bytes
+                self._buffer = self._buffer[match.start():]
+                return False
+            key = match.group(1).decode()
+            if key in self.keys:
+                self._series.setdefault(key, _GrowableSeries(0 if rest.startswith(b']') else self._capacity))
+            if rest.startswith(b']'):
+                self._buffer = rest[1:] #'"key": []'
+            else:
+                self._buffer = rest
+                self._current = key
+            return True
+
+        self._buffer = self._buffer.lstrip(b', \t\r\n')
+        if self._buffer.startswith(b']'):
+            #the last pair was decoded with the previous chunk
+            self._buffer = self._buffer[1:]
+            self._current = None
+            return True
+        end = _ARRAY_END_RE.search(self._buffer)
+        if end is not None:
+            block, self._buffer = self._buffer[:end.start() + 1], self._buffer[end.end():]
+        else:
+            cut = self._buffer.rfind(b']')
+            if cut < 0:
+                return False
+            block, self._buffer = self._buffer[:cut + 1], self._buffer[cut + 1:]
+        timestamps, values = _decode_pairs_block(block.rstrip(), self._current)
+        if self._current in self.keys:
+            self._series[self._current].extend(timestamps, values)
+        if end is not None:
+            self._current = None
+        return True
+
+    def finish(self) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+        if self._current is not None:
+            raise errors.InfrastructureExternalApiMalformedResponse(f"Truncated '{self._current}' in CoinGecko response")
+        return {key: series.finish() for key, series in self._series.items() if key in self.keys}
+
+
+def decode_market_chart_stream(chunks, size_hint: int | None = None, keys: tuple[str, ...] = SERIES_KEYS) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    '''
+    Decode an iterable of body chunks (bytes) in one go.
+    '''
+    decoder = MarketChartStreamDecoder(size_hint, keys)
+    for chunk in chunks:
+        decoder.feed(chunk)
+    return decoder.finish()
@@ -1,5 +1,8 @@
 import pandas as pd
+import numpy as np
+import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 from app.domain.entities import Symbol, Currency, Provider, ResampleFrequency
 from app.domain.services import compute_enriched_market_chart
 from app.services.analytics import (
@@ -9,11 +12,16 @@ from app.services.analytics import (
 
 #Use matplotlib and potly
 
+def _with_datetime_timestamps(df: pd.DataFrame) -> pd.DataFrame:
+    #new frame over the same columns (df.assign would copy all of them), the caller's df is not touched
+    columns = {column: df[column] for column in df.columns}
+    columns['timestamp'] = pd.to_datetime(df['timestamp'])
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
 #Not used in the endpoint, but kept for reference
 def plot_price(df: pd.DataFrame, out_path: str) -> None:
     
-    df = df.copy()
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = _with_datetime_timestamps(df)
     
     #plot
     plt.figure(figsize=(12,6))
@@ -30,8 +38,7 @@ def plot_price(df: pd.DataFrame, out_path: str) -> None:
 #Not used in the endpoint, but kept for reference
 def plot_volatility(df: pd.DataFrame, out_path: str, volatility_window: int) -> None: 
     #price and volatility in two axes in the same plot, because they have different scales
-    df = df.copy()
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = _with_datetime_timestamps(df)
     volatility_col = f'volatility_{volatility_window}'
     fig, ax1 = plt.subplots(figsize=(12,6))
     ax1.plot(df['timestamp'], df['price'], label='Price', color='blue', linewidth=2)
@@ -67,8 +74,8 @@ def plot_enriched_price(
     Assumes df already comes from compute_enriched_market_chart and therefore
     already contains:
       - pct_change, acum_pct_change
-      - rolling_mean_*
-      - volatility_*
+      - rolling_mean_* (one or several windows)
+      - volatility_* (one or several windows)
       - normalized_* columns
 
     Layout:
@@ -77,20 +84,18 @@ def plot_enriched_price(
       - Subplot 3: normalized + volatility (2nd Y axis)
 
     NOTE: Price is plotted ONLY in the first subplot.
+
+    Thread-safe: it builds a standalone Figure instead of using the global pyplot
+    state, so the API can render several plots at once in worker threads.
     """
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = _with_datetime_timestamps(df)
 
     # ---------- Detect precomputed analytics columns ----------
-    # Rolling
-    rolling_col: str | None = next(
-        (c for c in df.columns if c.startswith("rolling_mean_")), None
-    )
+    # Rolling (one column per requested window)
+    rolling_cols: list[str] = [c for c in df.columns if c.startswith("rolling_mean_")]
 
-    # Volatility
-    volatility_col: str | None = next(
-        (c for c in df.columns if c.startswith("volatility_")), None
-    )
+    # Volatility (one column per requested window)
+    volatility_cols: list[str] = [c for c in df.columns if c.startswith("volatility_")]
 
     # Normalized
     norm_col: str | None = next(
@@ -101,7 +106,7 @@ def plot_enriched_price(
     df_resampled: pd.DataFrame | None = None
     if resample_frequency is not None:
         df_resampled = resample_price_series(
-            df[["timestamp", price_key]].copy(),
+            df[["timestamp", price_key]],
             price_key,
             resample_frequency,
         )
@@ -110,7 +115,8 @@ def plot_enriched_price(
     stats = calculate_stats(df, price_key)
 
     # ---------- Figure & subplots ----------
-    fig, (ax_price, ax_returns, ax_norm) = plt.subplots(3, 1, figsize=(14, 11), sharex=True)
+    fig = Figure(figsize=(14, 11))
+    ax_price, ax_returns, ax_norm = fig.subplots(3, 1, sharex=True)
 
     # =====================================================
     # SUBPLOT 1: Price + Rolling + Resampled
@@ -122,7 +128,7 @@ def plot_enriched_price(
         linewidth=1.5,
     )
 
-    if rolling_col is not None and rolling_col in df.columns:
+    for rolling_col in rolling_cols:
         window_str = rolling_col.split("_")[-1]
         ax_price.plot(
             df["timestamp"], df[rolling_col],
@@ -178,15 +184,20 @@ def plot_enriched_price(
     ax_norm.set_ylabel("Index")
     ax_norm.grid(True)
 
-    if volatility_col is not None and volatility_col in df.columns:
+    if volatility_cols:
         ax_vol = ax_norm.twinx()
-        ax_vol.plot(
-            df["timestamp"], df[volatility_col],
-            label=volatility_col,
-            linewidth=1.0,
-            color="red",
-            alpha=0.7,
-        )
+        # Single window keeps the red line, several windows get a red colormap (shortest window = lightest)
+        vol_colors = ["red"] if len(volatility_cols) == 1 else [
+            matplotlib.colormaps["Reds"](0.4 + 0.6 * i / (len(volatility_cols) - 1)) for i in range(len(volatility_cols))
+        ]
+        for volatility_col, color in zip(volatility_cols, vol_colors):
+            ax_vol.plot(
+                df["timestamp"], df[volatility_col],
+                label=volatility_col,
+                linewidth=1.0,
+                color=color,
+                alpha=0.7,
+            )
         ax_vol.set_ylabel("Volatility")
 
         # Combine legends from both Y axes
@@ -216,8 +227,39 @@ def plot_enriched_price(
         fontsize=13,
     )
 
-    plt.xlabel("Timestamp")
-    plt.tight_layout(rect=[0, 0.03, 1, 0.97])
+    ax_norm.set_xlabel("Timestamp")
+    fig.tight_layout(rect=[0, 0.03, 1, 0.97])
+
+    fig.savefig(out_path, format="png", dpi=300, bbox_inches="tight")
+
 
-    plt.savefig(out_path, format="png", dpi=300, bbox_inches="tight")
-    plt.close(fig)
\ No newline at end of file
+#Heatmap of a correlation matrix (e.g. the latest window of compute_rolling_correlations), used in the correlation endpoint
+def plot_correlation_heatmap(
+    correlation: np.ndarray,
+    labels: list[str],
+    out_path: str,
+    title: str | None = None,
+) -> None:
+    """
+    Correlation matrix (asset x asset) as a PNG heatmap, diverging colors from -1 (blue) to 1 (red).
+    Cells are annotated when there are few assets. NaN cells (no variance in the window) are left blank.
+    Thread-safe (standalone Figure), like plot_enriched_price.
+    """
+    size = max(4.0, 0.6 * len(labels) + 2)
+    fig = Figure(figsize=(size + 1.5, size))
+    ax = fig.subplots()
+    image = ax.imshow(np.ma.masked_invalid(correlation), cmap="RdBu_r", vmin=-1.0, vmax=1.0)
+    fig.colorbar(image, ax=ax, fraction=0.046, pad=0.04, label="Correlation")
+
+    ax.set_xticks(range(len(labels)), labels, rotation=45, ha="right")
+    ax.set_yticks(range(len(labels)), labels)
+    if len(labels) <= 15:
+        for i in range(len(labels)):
+            for j in range(len(labels)):
+                if np.isfinite(correlation[i, j]):
+                    ax.text(j, i, f"{correlation[i, j]:.2f}", ha="center", va="center", fontsize=9,
+                            color="white" if abs(correlation[i, j]) > 0.6 else "black")
+
+    ax.set_title(title or "Correlation matrix")
+    fig.tight_layout()
+    fig.savefig(out_path, format="png", dpi=150, bbox_inches="tight")
@@ -17,8 +17,8 @@ def run_enriched_plot(
     days: int,
     provider: Provider,
     out_path: Path,
-    window_size: int = 15,
-    volatility_window: int = 15,
+    window_size: int | list[int] = 15,
+    volatility_window: int | list[int] = 15,
     normalize_base: float = 100.0,
     resample_frequency: ResampleFrequency | None = ResampleFrequency.WEEKLY,
 ) -> None:
@@ -88,8 +88,9 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--window",
         type=int,
-        default=15,
-        help="Rolling window size for moving average & volatility.",
+        nargs="+",
+        default=[15],
+        help="Rolling window size(s) for moving average & volatility (e.g. --window 7 30 90).",
     )
     parser.add_argument(
         "--normalize-base",
@@ -1,9 +1,18 @@
 from app.domain.entities import MarketChartData, PANDAS_RESAMPLING_RULES, ResampleFrequency
+import numpy as np
 import pandas as pd
 from datetime import datetime
+from collections.abc import Sequence
+from app.services.moments import Moments
 
 #Analytics layer services
 
+# No defensive full-frame copies and no global pandas option: the pipeline never writes into the frames it is given.
+# A range trim is a slice, resampling builds a new two-column frame, and the enrichment builds its result from new arrays
+# (the computed columns) and one copy of the input columns. Frames over a cached chart (convert_market_chart_data_to_dataframe)
+# are read-only views shared by concurrent requests. The enriched frames returned to callers own all their columns: they
+# can be written without touching the cache or the input frame.
+
 def _validate_numeric_series(df: pd.DataFrame, column: str) -> pd.Series:
     if df.empty:
         raise ValueError('Cannot compute stats on an empty DataFrame')
@@ -24,11 +33,12 @@ def _validate_numeric_series(df: pd.DataFrame, column: str) -> pd.Series:
     return series
 
 def convert_market_chart_data_to_dataframe(marketchartdata: MarketChartData) -> pd.DataFrame:
+    #Zero-copy: the columns are views of the chart arrays (timestamps seen as datetime64[ms]), no per-point loop
     data = {
-        'timestamp'  : [p.timestamp for p in marketchartdata.points],
-        'price'     : [p.price for p in marketchartdata.points]
+        'timestamp'  : marketchartdata.datetimes,
+        'price'     : marketchartdata.prices
     }
-    return pd.DataFrame(data)
+    return pd.DataFrame(data, copy=False)
 
 #Pandas-based analytics functions:
 
@@ -37,22 +47,67 @@ def calculate_stats(df: pd.DataFrame, stats_key: str) -> dict:
     Compute basic statistics for a numeric column in a price DataFrame.
     """
     series = _validate_numeric_series(df, stats_key)
+    return calculate_price_stats(series.to_numpy(dtype=np.float64))
+
+def calculate_price_stats(prices: np.ndarray) -> dict:
+    """
+    Same statistics as calculate_stats straight from a price array (no DataFrame): the moments (count, min, max, mean,
+    std, variance, skewness, kurtosis) come from one mergeable accumulator, NaNs skipped.
+    """
+    if not len(prices):
+        raise ValueError('Cannot compute stats on an empty series')
+    moments = Moments.from_array(prices)
+    return stats_from_moments(moments, median=float(np.nanmedian(prices)) if moments.count else None)
+
+def stats_from_moments(moments: Moments, median: float | None = None) -> dict:
+    """
+    calculate_stats dictionary of a moments summary (e.g. merged from stored partitions). median_price is only included
+    when a median is given: it can't be merged from moments.
+    """
+    if not moments.count:
+        raise ValueError('All values of the series are NaN, cannot compute statistics.')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        percent_change = float((np.float64(moments.last) - moments.first) / moments.first * 100)
     
     result_dic = {
-        "count": int(series.count()),
-        "min_price": float(series.min()),
-        "max_price": float(series.max()),
-        "mean_price": float(series.mean()),
-        "median_price": float(series.median()),
-        "std_dev": float(series.std()),
-        "variance": float(series.var()),
-        "first_price": float(series.iloc[0]),
-        "last_price": float(series.iloc[-1]),
-        "percent_change": float((series.iloc[-1] - series.iloc[0]) / series.iloc[0] * 100),
+        "count": moments.count,
+        "min_price": moments.minimum,
+        "max_price": moments.maximum,
+        "mean_price": moments.mean,
+        "median_price": median,
+        "std_dev": moments.std,
+        "variance": moments.variance,
+        "first_price": moments.first,
+        "last_price": moments.last,
+        "percent_change": percent_change,
+        "skewness": moments.skewness,
+        "kurtosis": moments.kurtosis,
     }
+    if median is None:
+        del result_dic["median_price"]
     
     return result_dic
 
+#Quantile levels reported by the stats (p1, p5, p50, p95, p99)
+QUANTILE_LEVELS = (0.01, 0.05, 0.5, 0.95, 0.99)
+
+def quantile_label(level: float) -> str:
+    return f'p{level * 100:g}'
+
+def percent_returns(prices: np.ndarray) -> np.ndarray:
+    #returns between consecutive points in % (like the pct_change column), NaN next to missing prices
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (prices[1:] / prices[:-1] - 1) * 100
+
+def calculate_quantiles(values: np.ndarray, levels=QUANTILE_LEVELS) -> dict[str, float]:
+    """
+    Exact quantiles (sort, linear interpolation like pandas), NaNs skipped. NaN when there is no value.
+    """
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {quantile_label(level): float('nan') for level in levels}
+    return {quantile_label(level): float(q) for level, q in zip(levels, np.quantile(values, levels))}
+
 def compute_returns (df: pd.DataFrame, stats_key: str) -> None:
     series = _validate_numeric_series(df, stats_key)
     df['pct_change'] = series.pct_change() * 100
@@ -72,12 +127,12 @@ def compute_rolling_window(df: pd.DataFrame, window_size: int, stats_key: str) -
     #no return, it adds column to the df
 
 def resample_price_series(df: pd.DataFrame, price_key: str, frequency: ResampleFrequency) -> pd.DataFrame:
-    # Ensure timestamp is proper datetime
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
-    
     # Validate the column exists and is numeric
     _validate_numeric_series(df, price_key)
     
+    # Ensure timestamp is proper datetime (new frame with only the 2 columns, the caller's df is not touched)
+    df = pd.DataFrame({'timestamp': pd.to_datetime(df['timestamp']), price_key: df[price_key]})
+    
     # Map frequency -> pandas rule
     if frequency not in PANDAS_RESAMPLING_RULES:
         raise ValueError(f"Unsupported resampling frequency: {frequency}")    
@@ -102,13 +157,29 @@ def resample_price_series(df: pd.DataFrame, price_key: str, frequency: ResampleF
     
     return df_resampled
 
+def _as_naive_utc(moment: datetime) -> pd.Timestamp:
+    #the timestamp column is naive UTC: aware bounds are converted to UTC before comparing
+    moment = pd.Timestamp(moment)
+    return moment.tz_convert('UTC').tz_localize(None) if moment.tzinfo is not None else moment
+
 def trim_date_range(df: pd.DataFrame, start: datetime | None, end: datetime | None) -> pd.DataFrame:
-    df = df.copy()
-    if start is not None:
-        df = df[df['timestamp'] >= start]
-    if end is not None:
-        df = df[df['timestamp'] <= end]
-    return df
+    # Rows with start <= timestamp <= end. Provider timestamps are sorted, so both bounds are found by binary search and the
+    # result is a slice of df (no boolean mask over the whole column, no copy). Unsorted frames fall back to masks.
+    if start is None and end is None:
+        return df
+    timestamps = df['timestamp']
+    start = _as_naive_utc(start) if start is not None else None
+    end = _as_naive_utc(end) if end is not None else None
+    if not (pd.api.types.is_datetime64_any_dtype(timestamps) and timestamps.is_monotonic_increasing):
+        mask = pd.Series(True, index=df.index)
+        if start is not None:
+            mask &= timestamps >= start
+        if end is not None:
+            mask &= timestamps <= end
+        return df[mask]
+    first = int(timestamps.searchsorted(start, side='left')) if start is not None else 0
+    last = int(timestamps.searchsorted(end, side='right')) if end is not None else len(df)
+    return df.iloc[first:max(first, last)]
 
 def normalize_series(df: pd.DataFrame, price_key: str, base: float = 100.0) -> None:
     series = _validate_numeric_series(df, price_key)
@@ -132,4 +203,180 @@ def compute_volatility(df: pd.DataFrame, price_key: str, window_size: int) -> No
     df[vol_col_name] = aux_pct_changes.rolling(window=window_size).std() 
     
     #print(df[vol_col_name].head(30))
-    # No return, modifies df in place
\ No newline at end of file
+    # No return, modifies df in place
+
+
+#Fused NumPy engine:
+# compute_returns + compute_rolling_window + compute_volatility + normalize_series in one pass over the price array.
+# The column is validated once, the returns are computed once (volatility reuses them) and the output frame is built once.
+# Several rolling / volatility windows can be requested at once: all of them come from the same prefix sums, built once.
+# Same column names, same NaN positions and same errors as the pandas functions above.
+# Everything works along axis 0: a 2-D (time, asset) array is enriched column by column in the same vectorized pass
+# (see app/services/panel.py).
+
+Windows = int | Sequence[int] | None
+
+def _as_windows(windows: Windows) -> list[int]:
+    #int or list of ints -> list without duplicates (first occurrence order)
+    if windows is None:
+        return []
+    if isinstance(windows, (int, np.integer)):
+        windows = [windows]
+    return list(dict.fromkeys(int(w) for w in windows))
+
+class _BlockedPrefixSums:
+    # Two-level prefix sums: the running sum restarts at every block of `block` values, plus one total per block.
+    # A window no longer than a block spans at most two blocks, so its sum only combines partial sums of those two blocks.
+    # With a single global cumsum the window sum is a difference of two huge numbers and its rounding error grows with the
+    # position in the series; here the error depends on the block size only, however long the series is.
+    # values can be 2-D (time, asset): the sums run along axis 0, for every column at once.
+    def __init__(self, values: np.ndarray, block: int):
+        n, columns = len(values), values.shape[1:]
+        nblocks = n // block + 1 #one more block so the exclusive end position n always exists
+        grid = np.zeros((nblocks, block) + columns)
+        grid.reshape((nblocks * block,) + columns)[:n] = values
+        inclusive = np.cumsum(grid, axis=1)
+        self.totals = inclusive[:, -1].copy()
+        inclusive -= grid
+        self.partial = inclusive.reshape((nblocks * block,) + columns) #partial[k] = sum of the values of k's block before position k
+        self.block = block
+        self.size = n
+
+    def window_sums(self, window: int) -> np.ndarray:
+        #sums of values[a:a + window] for a = 0 .. n - window
+        count = self.size - window + 1
+        sums = self.partial[window:window + count] - self.partial[:count]
+        #windows starting in the last `window` positions of a block end in the next one: add the total of the starting block
+        block, full = self.block, count // self.block
+        sums[:full * block].reshape((full, block) + sums.shape[1:])[:, block - window:] += self.totals[:full, None]
+        tail = sums[full * block:]
+        tail[block - window:] += self.totals[full]
+        return sums
+
+def _block_size(windows: list[int]) -> int:
+    return max(1024, max(windows))
+
+def _rolling_means(values: np.ndarray, windows: list[int]) -> dict[int, np.ndarray]:
+    shift = values[0] #values close to 0 -> smaller partial sums
+    sums = _BlockedPrefixSums(values - shift, _block_size(windows))
+    result = {}
+    for window in windows:
+        out = np.full(values.shape, np.nan)
+        if window <= len(values):
+            body = out[window - 1:]
+            body[:] = sums.window_sums(window)
+            body /= window
+            body += shift
+        result[window] = out
+    return result
+
+def _rolling_stds(values: np.ndarray, windows: list[int]) -> dict[int, np.ndarray]:
+    #sample standard deviation (ddof=1), like pandas rolling().std()
+    centered = values - values.mean(axis=0)
+    sums = _BlockedPrefixSums(centered, _block_size(windows))
+    sums_sq = _BlockedPrefixSums(centered * centered, _block_size(windows))
+    #changes[k] = number of positions j <= k with values[j] != values[j - 1] (exact integer counts)
+    changes = np.cumsum(values[1:] != values[:-1], axis=0)
+    changes = np.concatenate([np.zeros((1,) + changes.shape[1:], dtype=changes.dtype), changes])
+    result = {}
+    for window in windows:
+        out = np.full(values.shape, np.nan)
+        if 2 <= window <= len(values):
+            window_sum = sums.window_sums(window)
+            body = out[window - 1:]
+            body[:] = sums_sq.window_sums(window)
+            np.multiply(window_sum, window_sum, out=window_sum)
+            window_sum /= window
+            body -= window_sum
+            body /= window - 1
+            np.maximum(body, 0.0, out=body)
+            np.sqrt(body, out=body)
+            #flat windows (no change between window start and end): the variance is rounding residue only -> exact 0
+            body[changes[window - 1:] == changes[:len(values) - window + 1]] = 0.0
+        result[window] = out
+    return result
+
+def compute_enriched_columns(
+    prices: np.ndarray,
+    price_key: str = 'price',
+    window_size: Windows = None,
+    volatility_window: Windows = None,
+    normalize_base: float | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Enrichment columns of a price array without NaNs: pct_change, acum_pct_change, rolling_mean_{w}, volatility_{w}, normalized_...
+    window_size / volatility_window accept one window or a list of windows (one column per window).
+    prices can be 2-D (time, asset): every output then has the same shape, one column per asset.
+    """
+    if len(prices) == 0:
+        raise ValueError('Cannot compute stats on an empty DataFrame')
+    first = prices[0]
+    rolling_windows = _as_windows(window_size)
+    volatility_windows = _as_windows(volatility_window)
+    
+    #zero prices give inf/NaN silently, like pandas
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.empty(prices.shape)
+        returns[0] = np.nan
+        np.divide(prices[1:], prices[:-1], out=returns[1:])
+        returns[1:] -= 1
+        columns = {
+            'pct_change': returns * 100,
+            'acum_pct_change': (prices - first) / first * 100,
+        }
+    for window in rolling_windows:
+        if window <= 0:
+            raise ValueError('window_size must be a positive integer')
+        if window > len(prices):
+            raise ValueError('window_size cannot be larger than the number of data points in the DataFrame')
+    if rolling_windows:
+        for window, values in _rolling_means(prices, rolling_windows).items():
+            columns[f'rolling_mean_{window}'] = values
+    if volatility_windows and len(prices) > 1:
+        #the first return is NaN: the first full window ends at index volatility_window
+        for window, values in _rolling_stds(returns[1:], volatility_windows).items():
+            volatility = np.empty(prices.shape)
+            volatility[0] = np.nan
+            volatility[1:] = values
+            columns[f'volatility_{window}'] = volatility
+    elif volatility_windows:
+        for window in volatility_windows:
+            columns[f'volatility_{window}'] = np.full(prices.shape, np.nan)
+    if normalize_base is not None:
+        if np.any(first == 0):
+            raise ValueError(f'Cannot normalize series of {price_key} if first element is Zero')
+        columns[f'normalized_{price_key}_base_{round(float(normalize_base), 5)}'] = (prices / first) * normalize_base
+    return columns
+
+def enrich_price_frame(
+    df: pd.DataFrame,
+    price_key: str = 'price',
+    window_size: Windows = None,
+    volatility_window: Windows = None,
+    normalize_base: float | None = None,
+) -> pd.DataFrame:
+    """
+    Returns a new DataFrame: the columns of df + the enrichment columns (same result as the pandas functions one after another).
+    The result owns its columns (the columns of df are copied once): df is never written and never aliased.
+    """
+    series = _validate_numeric_series(df, price_key)
+    prices = series.to_numpy(dtype=np.float64)
+    
+    if np.isnan(prices).any():
+        #NaN handling (pct_change padding, rolling min_periods) is left to pandas, on a copy: the new columns are added to it only
+        df = df.copy()
+        compute_returns(df, price_key)
+        for window in _as_windows(window_size):
+            compute_rolling_window(df, window, price_key)
+        for window in _as_windows(volatility_window):
+            compute_volatility(df, price_key, window)
+        if normalize_base is not None:
+            normalize_series(df, price_key, normalize_base)
+        return df
+    
+    enriched = compute_enriched_columns(prices, price_key, window_size, volatility_window, normalize_base)
+    #the input columns are copied once the temporaries of the computation are freed: they don't add to the peak
+    columns = {column: df[column].copy() for column in df.columns}
+    for column, values in enriched.items():
+        columns[column] = pd.Series(values, index=df.index, copy=False)
+    return pd.DataFrame(columns, index=df.index, copy=False)
@@ -0,0 +1,211 @@
+import threading
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.domain.entities import CandleFrequency
+
+# OHLC candle engine.
+# Candles are built in cascade: the bucket boundaries are searched once over the points (hourly buckets), and every coarser
+# frequency is aggregated from the candles of a finer one (4h <- hourly, daily <- 4h, weekly/monthly <- daily,
+# yearly <- monthly), so the coarse levels only look at a few candles instead of the whole series again.
+# CandleEngine keeps the candles of one series between requests: closed candles are final, when new points arrive only the
+# open (last) bucket of every level is recomputed.
+
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+_MONDAY_OFFSET_MS = 4 * DAY_MS #1970-01-01 was a Thursday, the first Monday is 1970-01-05
+
+#(frequency, finer frequency it is aggregated from); None = built from the points
+CANDLE_LEVELS: list[tuple[CandleFrequency, CandleFrequency | None]] = [
+    (CandleFrequency.HOURLY, None),
+    (CandleFrequency.FOUR_HOURS, CandleFrequency.HOURLY),
+    (CandleFrequency.DAILY, CandleFrequency.FOUR_HOURS),
+    (CandleFrequency.WEEKLY, CandleFrequency.DAILY),
+    (CandleFrequency.MONTHLY, CandleFrequency.DAILY),
+    (CandleFrequency.YEARLY, CandleFrequency.MONTHLY),
+]
+
+
+def bucket_starts(timestamps_ms: np.ndarray, frequency: CandleFrequency) -> np.ndarray:
+    '''
+    Start (epoch ms, UTC) of the bucket of every timestamp.
+    '''
+    timestamps_ms = np.asarray(timestamps_ms, dtype=np.int64)
+    if frequency is CandleFrequency.HOURLY:
+        return timestamps_ms // HOUR_MS * HOUR_MS
+    if frequency is CandleFrequency.FOUR_HOURS:
+        return timestamps_ms // (4 * HOUR_MS) * (4 * HOUR_MS)
+    if frequency is CandleFrequency.DAILY:
+        return timestamps_ms // DAY_MS * DAY_MS
+    if frequency is CandleFrequency.WEEKLY:
+        return (timestamps_ms - _MONDAY_OFFSET_MS) // (7 * DAY_MS) * (7 * DAY_MS) + _MONDAY_OFFSET_MS
+    unit = 'M' if frequency is CandleFrequency.MONTHLY else 'Y'
+    return timestamps_ms.astype('datetime64[ms]').astype(f'datetime64[{unit}]').astype('datetime64[ms]').astype(np.int64)
+
+
+@dataclass(frozen=True)
+class Candles:
+    '''
+    Columns of a candle series: bucket start (epoch ms) + open/high/low/close. volume is the last reported volume of the
+    bucket (CoinGecko total_volumes are rolling 24h volumes), None when the series has no volumes.
+    '''
+    start: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __getitem__(self, window: slice) -> 'Candles':
+        return Candles(self.start[window], self.open[window], self.high[window], self.low[window], self.close[window],
+                       self.volume[window] if self.volume is not None else None)
+
+    @classmethod
+    def from_points(cls, timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray | None = None) -> 'Candles':
+        #one-point candles, the input of the first aggregation
+        return cls(np.asarray(timestamps_ms, dtype=np.int64), prices, prices, prices, prices, volumes)
+
+    def aggregate(self, frequency: CandleFrequency) -> 'Candles':
+        '''
+        Merge consecutive candles that fall in the same bucket of frequency (the candles must be sorted by start).
+        '''
+        if not len(self):
+            return self
+        starts = bucket_starts(self.start, frequency)
+        first = np.concatenate(([0], np.flatnonzero(starts[1:] != starts[:-1]) + 1))
+        last = np.append(first[1:] - 1, len(starts) - 1)
+        return Candles(
+            starts[first],
+            self.open[first],
+            np.fmax.reduceat(self.high, first), #fmax / fmin skip missing (NaN) prices
+            np.fmin.reduceat(self.low, first),
+            self.close[last],
+            self.volume[last] if self.volume is not None else None,
+        )
+
+    def concat(self, other: 'Candles') -> 'Candles':
+        volume = None
+        if self.volume is not None and other.volume is not None:
+            volume = np.concatenate([self.volume, other.volume])
+        return Candles(*(np.concatenate([a, b]) for a, b in zip(
+            (self.start, self.open, self.high, self.low, self.close), (other.start, other.open, other.high, other.low, other.close)
+        )), volume)
+
+
+def compute_candles(timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray | None = None) -> dict[CandleFrequency, Candles]:
+    '''
+    Candles of every frequency for a sorted series, built in cascade (see CANDLE_LEVELS).
+    '''
+    levels: dict[CandleFrequency, Candles] = {}
+    for frequency, parent in CANDLE_LEVELS:
+        source = Candles.from_points(timestamps_ms, prices, volumes) if parent is None else levels[parent]
+        levels[frequency] = source.aggregate(frequency)
+    return levels
+
+
+class CandleEngine:
+    '''
+    Candles of one series kept between requests. update() with the latest points (sorted, the new ones appended at the end):
+    the closed candles are reused, only the open bucket of every level is recomputed.
+    '''
+    def __init__(self):
+        self.lock = threading.Lock() #callers sharing one engine (see CandleEngineRegistry) update it under this lock
+        self._levels: dict[CandleFrequency, Candles] = {}
+        self._first_ms: int | None = None
+        self._last_ms: int | None = None
+        self.rebuilds = 0
+        self.incremental_updates = 0
+
+    def update(self, timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray | None = None) -> None:
+        if not len(timestamps_ms):
+            return
+        #points older than the cached history (longer window), or volumes appear / disappear -> build everything
+        changed = bool(self._levels) and (int(timestamps_ms[0]) < self._first_ms
+                                          or (volumes is not None) != (self._levels[CandleFrequency.HOURLY].volume is not None))
+        if self._last_ms is not None and int(timestamps_ms[-1]) <= self._last_ms and not changed:
+            return #no new point
+        if not self._levels or changed or int(timestamps_ms[0]) > int(self._levels[CandleFrequency.HOURLY].start[-1]):
+            #first call, or the new points don't reach the cached open bucket (gap) -> build everything
+            self._levels = compute_candles(timestamps_ms, prices, volumes)
+            self._first_ms = int(timestamps_ms[0])
+            self.rebuilds += 1
+        else:
+            self._levels = self._update_open_buckets(timestamps_ms, prices, volumes)
+            self.incremental_updates += 1
+        self._last_ms = int(timestamps_ms[-1])
+
+    def _update_open_buckets(self, timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray | None) -> dict[CandleFrequency, Candles]:
+        levels: dict[CandleFrequency, Candles] = {}
+        for frequency, parent in CANDLE_LEVELS:
+            cached = self._levels[frequency]
+            open_start = cached.start[-1]
+            if parent is None:
+                cut = int(np.searchsorted(timestamps_ms, open_start, side='left'))
+                tail = Candles.from_points(timestamps_ms[cut:], prices[cut:], volumes[cut:] if volumes is not None else None)
+            else:
+                source = levels[parent]
+                tail = source[int(np.searchsorted(source.start, open_start, side='left')):]
+            levels[frequency] = cached[:-1].concat(tail.aggregate(frequency))
+        return levels
+
+    def candles(self, frequency: CandleFrequency, start_ms: int | None = None) -> Candles:
+        '''
+        Candles of frequency, from the bucket that contains start_ms (all of them if None).
+        '''
+        candles = self._levels.get(frequency)
+        if candles is None:
+            return Candles.from_points(np.empty(0, dtype=np.int64), np.empty(0))
+        if start_ms is None:
+            return candles
+        first_bucket = bucket_starts(np.array([start_ms]), frequency)[0]
+        return candles[int(np.searchsorted(candles.start, first_bucket, side='left')):]
+
+    def window(self, frequency: CandleFrequency, timestamps_ms: np.ndarray, prices: np.ndarray, volumes: np.ndarray | None = None) -> Candles:
+        '''
+        Candles of frequency over the points of one request (already passed to update()). The engine may hold a longer
+        history of the series: the first candle is rebuilt from the given points only, as if they were the whole series.
+        '''
+        candles = self.candles(frequency, start_ms=int(timestamps_ms[0]))
+        if not len(candles) or int(timestamps_ms[0]) <= self._first_ms:
+            return candles
+        end = int(np.searchsorted(timestamps_ms, candles.start[1], side='left')) if len(candles) > 1 else len(timestamps_ms)
+        head = Candles.from_points(timestamps_ms[:end], prices[:end], volumes[:end] if volumes is not None else None)
+        return head.aggregate(frequency).concat(candles[1:])
+
+
+class CandleEngineRegistry:
+    '''
+    One CandleEngine per key (e.g. provider, symbol, currency and granularity), created on first use. At most max_engines
+    are kept: the least recently used one is dropped (its candles are rebuilt if its series is asked again).
+    '''
+    def __init__(self, max_engines: int = 256):
+        self.max_engines = max_engines
+        self._engines: OrderedDict[Hashable, CandleEngine] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> CandleEngine:
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = self._engines[key] = CandleEngine()
+                while len(self._engines) > max(self.max_engines, 1):
+                    self._engines.popitem(last=False)
+            else:
+                self._engines.move_to_end(key) #most recently used
+            return engine
+
+    def reset(self, key: Hashable | None = None) -> None:
+        with self._lock:
+            if key is None:
+                self._engines.clear()
+            else:
+                self._engines.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._engines)
@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+from app.domain.entities import MarketChartData
+from app.services.analytics import _BlockedPrefixSums, _block_size
+from app.services.panel import align_panel
+
+# Rolling covariance / correlation matrices and betas across assets.
+# The covariance of a pair over a window only needs three window sums: sum(x), sum(y) and sum(x * y). They come from
+# prefix sums of the returns and of their cross-products (upper triangle of the pairs), built once for the whole panel,
+# so every window of every pair costs O(1): O(assets² × n) in total whatever the window size, instead of
+# O(assets² × n × window) for pandas rolling().cov() / rolling().corr() pair by pair.
+# Same results as pandas (sample covariance, ddof=1), on the simple returns of the aligned panel (see panel.py).
+
+
+@dataclass(frozen=True)
+class RollingCrossMoments:
+    '''
+    Rolling matrices of a panel: covariance[t] / correlation[t] are (asset, asset) matrices of the window ending at
+    timestamps[t] (epoch ms).
+    '''
+    timestamps: np.ndarray
+    labels: list[str]
+    window: int
+    covariance: np.ndarray
+    correlation: np.ndarray
+
+    def beta(self, benchmark: str) -> np.ndarray:
+        '''
+        (time, asset): beta of every asset against the benchmark asset = cov(asset, benchmark) / var(benchmark).
+        '''
+        b = self.labels.index(benchmark)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self.covariance[:, :, b] / self.covariance[:, b, b][:, None]
+
+
+def rolling_covariances(values: np.ndarray, window: int) -> np.ndarray:
+    '''
+    Sample covariance matrices of the columns of values (time, asset) over every window: (time - window + 1, asset, asset).
+    values must not contain NaNs.
+    '''
+    n, assets = values.shape
+    if window < 2:
+        raise ValueError('window must be greater than 1')
+    if window > n:
+        raise ValueError('window cannot be larger than the number of returns')
+    centered = values - values.mean(axis=0) #covariances don't depend on the shift, the sums get smaller
+    rows, cols = np.triu_indices(assets)
+    block = _block_size([window])
+    sums = _BlockedPrefixSums(centered, block).window_sums(window)
+    cross = _BlockedPrefixSums(centered[:, rows] * centered[:, cols], block).window_sums(window)
+    cross -= sums[:, rows] * sums[:, cols] / window
+    cross /= window - 1
+
+    covariance = np.empty((len(cross), assets, assets))
+    covariance[:, rows, cols] = cross
+    covariance[:, cols, rows] = cross
+    #flat windows: the variance is rounding residue only -> exact 0, and so are the covariances of that asset
+    diagonal = np.arange(assets)
+    flat = covariance[:, diagonal, diagonal] <= (centered * centered).mean(axis=0) * 1e-12
+    if flat.any():
+        covariance[flat[:, :, None] | flat[:, None, :]] = 0.0
+    return covariance
+
+
+def covariances_to_correlations(covariance: np.ndarray) -> np.ndarray:
+    '''
+    Correlation matrices of covariance matrices (..., asset, asset). Assets without variance in a window get NaN.
+    '''
+    std = np.sqrt(np.diagonal(covariance, axis1=-2, axis2=-1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = covariance / std[..., :, None] / std[..., None, :]
+    np.clip(correlation, -1.0, 1.0, out=correlation)
+    diagonal = np.arange(covariance.shape[-1])
+    correlation[..., diagonal, diagonal] = np.where(std > 0, 1.0, np.nan)
+    return correlation
+
+
+def rolling_cross_moments(charts: list[MarketChartData], window: int, labels: list[str] | None = None) -> RollingCrossMoments:
+    '''
+    Rolling covariance and correlation matrices of the simple returns of charts, aligned on a common index.
+    labels name the assets (the symbol values by default).
+    '''
+    if labels is None:
+        labels = [chart.symbol.value for chart in charts]
+    if len(labels) != len(charts):
+        raise ValueError('One label per series is required')
+    index, prices = align_panel(charts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = prices[1:] / prices[:-1] - 1
+    if not np.isfinite(returns).all():
+        raise ValueError('Cannot compute returns of series with zero prices')
+    covariance = rolling_covariances(returns, window)
+    #returns[k] ends at index[k + 1]: the first window ends at index[window]
+    return RollingCrossMoments(index[window:], list(labels), window, covariance, covariances_to_correlations(covariance))
@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.domain.entities import MarketChartData
+
+# Cross-currency series.
+# A coin quoted in a base currency (e.g. USD) is converted to another fiat currency with the FX rate implied by a proxy
+# coin quoted in both currencies (BTC/EUR / BTC/USD = EUR per USD). The series are aligned "as of": each point uses the
+# last known rate at or before its timestamp, so the conversion is a searchsorted + one vectorized multiplication.
+
+
+def asof_values(timestamps_ms: np.ndarray, source_timestamps_ms: np.ndarray, source_values: np.ndarray) -> np.ndarray:
+    '''
+    Value of the source series at every timestamp: the last source point at or before it (the first point for earlier
+    timestamps). source_timestamps_ms must be sorted and not empty.
+    '''
+    if not len(source_timestamps_ms):
+        raise ValueError('Cannot align to an empty series')
+    idx = np.searchsorted(source_timestamps_ms, timestamps_ms, side='right') - 1
+    np.clip(idx, 0, len(source_timestamps_ms) - 1, out=idx)
+    return source_values[idx]
+
+
+def fx_rate_series(proxy_in_base: MarketChartData, proxy_in_target: MarketChartData) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    (timestamps_ms, rate): units of the target currency per unit of the base currency, on the timestamps of proxy_in_base.
+    '''
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = asof_values(proxy_in_base.timestamps, proxy_in_target.timestamps, proxy_in_target.prices) / proxy_in_base.prices
+    return proxy_in_base.timestamps, rate
+
+
+def cross_market_chart(chart_in_base: MarketChartData, proxy_in_base: MarketChartData, proxy_in_target: MarketChartData) -> MarketChartData:
+    '''
+    chart_in_base converted to the currency of proxy_in_target, on the timestamps of chart_in_base.
+    '''
+    fx_timestamps, rate = fx_rate_series(proxy_in_base, proxy_in_target)
+    rate = asof_values(chart_in_base.timestamps, fx_timestamps, rate)
+    #market caps and volumes are amounts of the base currency too
+    extras = {name: column * rate for name, column in (('market_caps', chart_in_base.market_caps), ('total_volumes', chart_in_base.total_volumes))
+              if column is not None}
+    return MarketChartData.from_arrays(chart_in_base.symbol, proxy_in_target.currency, chart_in_base.timestamps, chart_in_base.prices * rate, **extras)
@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+# Mergeable moments.
+# Count, min, max, mean and the central moment sums M2, M3, M4 (Welford / Pébay) of a series. The moments of two
+# consecutive chunks merge exactly into the moments of the whole series, so statistics over long histories can be
+# combined from per-chunk (or per-partition) summaries instead of scanning the raw points again.
+# variance / std / skewness / kurtosis follow pandas (sample estimators, bias-corrected skewness and excess kurtosis).
+
+
+@dataclass(frozen=True)
+class Moments:
+    '''
+    Summary of a series (NaNs skipped). first / last are the first and last values in time order: merge() expects its
+    argument to come after self.
+    '''
+    count: int = 0
+    minimum: float = np.inf
+    maximum: float = -np.inf
+    mean: float = 0.0
+    m2: float = 0.0
+    m3: float = 0.0
+    m4: float = 0.0
+    first: float = np.nan
+    last: float = np.nan
+
+    @classmethod
+    def from_array(cls, values: np.ndarray) -> 'Moments':
+        values = np.asarray(values, dtype=np.float64)
+        if np.isnan(values).any():
+            values = values[~np.isnan(values)]
+        if not len(values):
+            return cls()
+        mean = float(values.mean())
+        #central sums from the deviations (two-pass): exact 0 for constant chunks, no cancellation
+        deviations = values - mean
+        squares = deviations * deviations
+        return cls(
+            count=len(values),
+            minimum=float(values.min()),
+            maximum=float(values.max()),
+            mean=mean,
+            m2=float(squares.sum()),
+            m3=float(np.dot(squares, deviations)),
+            m4=float(np.dot(squares, squares)),
+            first=float(values[0]),
+            last=float(values[-1]),
+        )
+
+    @classmethod
+    def from_chunks(cls, chunks) -> 'Moments':
+        #streaming: any iterable of arrays in time order, one chunk in memory at a time
+        result = cls()
+        for chunk in chunks:
+            result = result.merge(cls.from_array(chunk))
+        return result
+
+    def merge(self, other: 'Moments') -> 'Moments':
+        '''
+        Moments of self followed by other (Pébay's pairwise update formulas).
+        '''
+        if not other.count:
+            return self
+        if not self.count:
+            return other
+        na, nb = self.count, other.count
+        n = na + nb
+        delta = other.mean - self.mean
+        delta_n = delta / n
+        m2 = self.m2 + other.m2 + delta * delta_n * na * nb
+        m3 = (self.m3 + other.m3 + delta * delta_n * delta_n * na * nb * (na - nb)
+              + 3 * delta_n * (na * other.m2 - nb * self.m2))
+        m4 = (self.m4 + other.m4 + delta * delta_n ** 3 * na * nb * (na * na - na * nb + nb * nb)
+              + 6 * delta_n * delta_n * (na * na * other.m2 + nb * nb * self.m2)
+              + 4 * delta_n * (na * other.m3 - nb * self.m3))
+        return Moments(
+            count=n,
+            minimum=min(self.minimum, other.minimum),
+            maximum=max(self.maximum, other.maximum),
+            mean=self.mean + delta_n * nb,
+            m2=m2,
+            m3=m3,
+            m4=m4,
+            first=self.first,
+            last=other.last,
+        )
+
+    @property
+    def total(self) -> float:
+        return self.mean * self.count
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else np.nan
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    @property
+    def skewness(self) -> float:
+        n = self.count
+        if n < 3:
+            return np.nan
+        if self.m2 == 0:
+            return 0.0
+        g1 = np.sqrt(n) * self.m3 / self.m2 ** 1.5
+        return float(g1 * np.sqrt(n * (n - 1)) / (n - 2))
+
+    @property
+    def kurtosis(self) -> float:
+        #excess kurtosis (0 for a normal distribution)
+        n = self.count
+        if n < 4:
+            return np.nan
+        if self.m2 == 0:
+            return 0.0
+        g2 = n * self.m4 / (self.m2 * self.m2) - 3
+        return float(((n + 1) * g2 + 6) * (n - 1) / ((n - 2) * (n - 3)))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Moments':
+        return cls(**{name: data[name] for name in cls.__dataclass_fields__})
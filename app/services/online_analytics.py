@@ -0,0 +1,254 @@
+import math
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterable
+from datetime import datetime
+
+from app.domain.entities import PricePoint
+from app.services.analytics import Windows, _as_windows
+
+# Incremental (online) version of the enrichment pipeline.
+# The batch functions recompute everything over the whole history; here the state of every rolling window is kept
+# between calls (ring buffer + running sums), so each new point costs O(1) per window and returns its enriched row.
+# The rows have the same columns, NaN positions and values (up to float rounding) as enrich_price_frame over the same points.
+# The state is anchored at the first ingested point: acum_pct_change and the normalized column are relative to it.
+# Missing (NaN) prices are handled like pandas: the return is taken from the last known price and a rolling mean is NaN
+# while its window holds a missing price.
+# The last ingested point can be taken back (rewind()): a provider's last point is often a live one, off the grid of the
+# series, that the next fetch replaces with an aligned point.
+
+
+class _KahanSum:
+    # Running sum with compensation: adding and removing values for hours does not accumulate rounding error
+    def __init__(self, value: float = 0.0):
+        self.value = value
+        self._compensation = 0.0
+
+    def add(self, x: float) -> None:
+        y = x - self._compensation
+        t = self.value + y
+        self._compensation = (t - self.value) - y
+        self.value = t
+
+
+class _RollingMean:
+    # NaN values are kept in the ring but not in the sum: the mean is NaN while the window holds one (pandas' min_periods)
+    def __init__(self, window: int):
+        self.window = window
+        self._ring: list[float] = [] #grows up to window values
+        self._count = 0
+        self._nans = 0
+        self._sum = _KahanSum()
+        self._undo: tuple | None = None
+
+    def push(self, x: float) -> float:
+        slot = self._count % self.window
+        full = self._count >= self.window
+        self._undo = (slot, self._ring[slot] if full else None, self._count, self._nans, self._sum.value, self._sum._compensation)
+        if full:
+            old = self._ring[slot]
+            if math.isnan(old):
+                self._nans -= 1
+            else:
+                self._sum.add(-old)
+            self._ring[slot] = x
+        else:
+            self._ring.append(x)
+        if math.isnan(x):
+            self._nans += 1
+        else:
+            self._sum.add(x)
+        self._count += 1
+        if self._count % self.window == 0:
+            #resync once per window: amortized O(1), no drift
+            self._sum = _KahanSum(math.fsum(v for v in self._ring if not math.isnan(v)))
+        return self._sum.value / self.window if self._count >= self.window and not self._nans else math.nan
+
+    def undo(self) -> None:
+        slot, old, self._count, self._nans, value, compensation = self._undo
+        if old is None:
+            self._ring.pop()
+        else:
+            self._ring[slot] = old
+        self._sum = _KahanSum(value)
+        self._sum._compensation = compensation
+        self._undo = None
+
+
+class _RollingStd:
+    # Welford's algorithm on a sliding window (add the new value, remove the oldest one). Sample std (ddof=1).
+    def __init__(self, window: int):
+        self.window = window
+        self._ring: list[float] = [] #grows up to window values
+        self._count = 0
+        self._n = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._run = 0 #length of the run of identical values ending at the last one
+        self._undo: tuple | None = None
+
+    def push(self, x: float) -> float:
+        slot = self._count % self.window
+        full = self._count >= self.window
+        self._undo = (slot, self._ring[slot] if full else None, self._count, self._n, self._mean, self._m2, self._run)
+        self._run = self._run + 1 if self._count and x == self._ring[(slot - 1) % self.window] else 1
+        if full:
+            old = self._ring[slot]
+            self._n -= 1
+            delta = old - self._mean
+            self._mean -= delta / self._n
+            self._m2 -= delta * (old - self._mean)
+            self._ring[slot] = x
+        else:
+            self._ring.append(x)
+        self._n += 1
+        delta = x - self._mean
+        self._mean += delta / self._n
+        self._m2 += delta * (x - self._mean)
+        self._count += 1
+        if self._count % self.window == 0:
+            #removing values from the running moments accumulates rounding error: recompute them from the ring once per
+            #window (two-pass, amortized O(1) per point)
+            self._mean = math.fsum(self._ring) / self.window
+            self._m2 = math.fsum((v - self._mean) ** 2 for v in self._ring)
+        if self._count < self.window:
+            return math.nan
+        if self._run >= self.window:
+            #flat window (e.g. a price that did not move): the residue of the removed values would give a tiny non-zero std
+            self._mean, self._m2 = x, 0.0
+            return 0.0
+        return math.sqrt(max(self._m2, 0.0) / (self.window - 1))
+
+    def undo(self) -> None:
+        slot, old, self._count, self._n, self._mean, self._m2, self._run = self._undo
+        if old is None:
+            self._ring.pop()
+        else:
+            self._ring[slot] = old
+        self._undo = None
+
+
+class OnlineEnrichment:
+    '''
+    Enrichment state of one price series. update() ingests one point (timestamps strictly increasing) and returns its row,
+    rewind() takes the last one back.
+    '''
+    def __init__(
+        self,
+        price_key: str = 'price',
+        window_size: Windows = None,
+        volatility_window: Windows = None,
+        normalize_base: float | None = None,
+    ):
+        self.price_key = price_key
+        self.normalize_base = normalize_base
+        self.lock = threading.Lock() #callers sharing one state (see OnlineEnrichmentRegistry) update it under this lock
+        self.last_timestamp: datetime | None = None
+        self.last_row: dict | None = None
+        self._first: float | None = None
+        self._previous: float | None = None #last known (not NaN) price
+        self._undo: tuple | None = None
+        for window in _as_windows(window_size):
+            if window <= 0:
+                raise ValueError('window_size must be a positive integer')
+        for window in _as_windows(volatility_window):
+            if window <= 1:
+                raise ValueError(f'Volatility window must be greater than 1. Got {window}')
+        self._means = [_RollingMean(w) for w in _as_windows(window_size)]
+        self._stds = [_RollingStd(w) for w in _as_windows(volatility_window)]
+        self._normalized_column = (
+            f'normalized_{price_key}_base_{round(float(normalize_base), 5)}' if normalize_base is not None else None
+        )
+
+    def update(self, timestamp: datetime, price: float) -> dict:
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            raise ValueError(f'Points must arrive in time order: {timestamp} is not after {self.last_timestamp}')
+        price = math.nan if price is None else float(price)
+        if self._first is None:
+            if self._normalized_column is not None and price == 0:
+                raise ValueError(f'Cannot normalize series of {self.price_key} if first element is Zero')
+        self._undo = (self._first, self._previous, self.last_timestamp, self.last_row)
+        if self._first is None:
+            self._first = price #a missing first price makes acum_pct_change and the normalized column NaN, like pandas
+
+        row = {'timestamp': timestamp, self.price_key: price}
+        first, previous = self._first, self._previous
+        #a missing price is padded with the last known one for the return (pandas' pct_change)
+        known = previous if math.isnan(price) and previous is not None else price
+        #same float operations as the batch engine (zero prices give inf/NaN like pandas)
+        ret = _divide(known, previous) - 1 if previous is not None else math.nan
+        row['pct_change'] = ret * 100
+        row['acum_pct_change'] = _divide(price - first, first) * 100
+        for mean in self._means:
+            row[f'rolling_mean_{mean.window}'] = mean.push(price)
+        for std in self._stds:
+            #the first known price has no return: the window of returns starts with the next point
+            row[f'volatility_{std.window}'] = std.push(ret) if previous is not None else math.nan
+        if self._normalized_column is not None:
+            row[self._normalized_column] = (price / first) * self.normalize_base
+
+        if not math.isnan(known):
+            self._previous = known
+        self.last_timestamp = timestamp
+        self.last_row = row
+        return row
+
+    def rewind(self) -> bool:
+        '''
+        Takes the last ingested point back (one point only). False if there is nothing to take back.
+        '''
+        if self._undo is None:
+            return False
+        pushed_returns = self._undo[1] is not None #a return is pushed once a price is known
+        self._first, self._previous, self.last_timestamp, self.last_row = self._undo
+        self._undo = None
+        for mean in self._means:
+            mean.undo()
+        if pushed_returns:
+            for std in self._stds:
+                std.undo()
+        return True
+
+    def update_point(self, point: PricePoint) -> dict:
+        return self.update(point.timestamp, point.price)
+
+    def extend(self, points: Iterable[PricePoint]) -> list[dict]:
+        return [self.update(p.timestamp, p.price) for p in points]
+
+
+def _divide(a: float, b: float) -> float:
+    if b == 0:
+        return math.nan if a == 0 or math.isnan(a) else math.copysign(math.inf, a)
+    return a / b
+
+
+class OnlineEnrichmentRegistry:
+    '''
+    One OnlineEnrichment per key (e.g. provider, symbol, currency and the requested windows), created on first use. At most
+    max_states are kept: the least recently used one is dropped (its series is ingested again if it is asked again).
+    '''
+    def __init__(self, max_states: int = 256):
+        self.max_states = max_states
+        self._states: OrderedDict[Hashable, OnlineEnrichment] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, factory: Callable[[], OnlineEnrichment]) -> OnlineEnrichment:
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = factory()
+                while len(self._states) > max(self.max_states, 1):
+                    self._states.popitem(last=False)
+            else:
+                self._states.move_to_end(key) #most recently used
+            return state
+
+    def reset(self, key: Hashable | None = None) -> None:
+        with self._lock:
+            if key is None:
+                self._states.clear()
+            else:
+                self._states.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._states)
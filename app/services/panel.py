@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+
+from app.domain.entities import MarketChartData
+from app.services.analytics import Windows, compute_enriched_columns
+from app.services.fx import asof_values
+
+# Multi-asset panel.
+# Many series are aligned on one common time index into a 2-D (time, asset) price array, then enriched by the fused engine
+# of app/services/analytics.py in a single vectorized pass over all the columns (returns, rolling means, volatilities,
+# normalization), instead of one DataFrame pipeline per asset.
+
+
+def panel_index(charts: list[MarketChartData]) -> np.ndarray:
+    '''
+    Common time index (epoch ms): the timestamps of the densest series, restricted to the period covered by every series.
+    '''
+    if not charts:
+        raise ValueError('Cannot build a panel without series')
+    if any(not len(chart.timestamps) for chart in charts):
+        raise ValueError('Cannot build a panel with an empty series')
+    reference = max(charts, key=lambda chart: len(chart.timestamps)).timestamps
+    first = max(int(chart.timestamps[0]) for chart in charts)
+    last = min(int(chart.timestamps[-1]) for chart in charts)
+    if first > last:
+        raise ValueError('The series of the panel have no period in common')
+    index = reference[np.searchsorted(reference, first, side='left'):np.searchsorted(reference, last, side='right')]
+    if not len(index) or index[0] != first:
+        index = np.concatenate(([first], index)) #first is not a point of the reference either
+    return index
+
+
+def align_panel(charts: list[MarketChartData], index: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    (index, prices): prices[i, j] is the last price of charts[j] at or before index[i] (as-of join, missing prices skipped).
+    '''
+    if index is None:
+        index = panel_index(charts)
+    prices = np.empty((len(index), len(charts)))
+    for column, chart in enumerate(charts):
+        valid = ~np.isnan(chart.prices)
+        timestamps, values = (chart.timestamps, chart.prices) if valid.all() else (chart.timestamps[valid], chart.prices[valid])
+        prices[:, column] = asof_values(index, timestamps, values)
+    return index, prices
+
+
+def enrich_panel(
+    charts: list[MarketChartData],
+    labels: list[str] | None = None,
+    window_size: Windows = None,
+    volatility_window: Windows = None,
+    normalize_base: float | None = None,
+) -> pd.DataFrame:
+    '''
+    Long (tidy) frame of the enriched panel, sorted by timestamp then asset: timestamp, asset, price + the enrichment columns
+    of compute_enriched_columns. labels name the assets (the symbol values by default).
+    '''
+    if labels is None:
+        labels = [chart.symbol.value for chart in charts]
+    if len(labels) != len(charts):
+        raise ValueError('One label per series is required')
+    index, prices = align_panel(charts)
+    columns = compute_enriched_columns(prices, 'price', window_size, volatility_window, normalize_base)
+    frame = {
+        'timestamp': np.repeat(index, len(charts)).view('datetime64[ms]'),
+        'asset': np.tile(np.asarray(labels, dtype=object), len(index)),
+        'price': prices.ravel(),
+    }
+    for column, values in columns.items():
+        frame[column] = values.ravel() #(time, asset) in C order = rows by timestamp then asset, no copy
+    return pd.DataFrame(frame, copy=False)
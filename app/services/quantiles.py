@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+
+import numpy as np
+
+# Quantile sketch (merging t-digest).
+# The sorted values are summarized by centroids (mean, weight). With the arcsin scale function, the clusters are small
+# near the tails and larger around the median: a cluster spans at most about pi / compression of the ranks around the
+# median and proportionally less towards p1 / p99 (2 * sqrt(q * (1 - q)) times that), so tail quantiles stay accurate.
+# Digests of consecutive chunks (e.g. stored year partitions) merge into the digest of the whole series, and quantile
+# queries only look at the ~compression / 2 centroids, never at the raw points.
+
+DEFAULT_COMPRESSION = 500
+
+
+def _scale(q: np.ndarray, compression: float) -> np.ndarray:
+    return compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+
+
+def _compress(means: np.ndarray, weights: np.ndarray, compression: float) -> tuple[np.ndarray, np.ndarray]:
+    #means sorted. Every centroid goes to the integer bucket of the scale at its mid rank: one cluster per bucket.
+    total = weights.sum()
+    mid_ranks = np.cumsum(weights) - weights / 2
+    buckets = np.floor(_scale(mid_ranks / total, compression))
+    first = np.concatenate(([0], np.flatnonzero(buckets[1:] != buckets[:-1]) + 1))
+    cluster_weights = np.add.reduceat(weights, first)
+    cluster_means = np.add.reduceat(means * weights, first) / cluster_weights
+    return cluster_means, cluster_weights
+
+
+@dataclass(frozen=True)
+class TDigest:
+    '''
+    t-digest of a series (NaNs skipped). Empty digests answer NaN.
+    '''
+    means: np.ndarray = field(default_factory=lambda: np.empty(0))
+    weights: np.ndarray = field(default_factory=lambda: np.empty(0))
+    minimum: float = np.inf
+    maximum: float = -np.inf
+    compression: float = DEFAULT_COMPRESSION
+
+    @property
+    def count(self) -> int:
+        return int(round(self.weights.sum()))
+
+    @classmethod
+    def from_array(cls, values: np.ndarray, compression: float = DEFAULT_COMPRESSION) -> 'TDigest':
+        values = np.asarray(values, dtype=np.float64)
+        values = np.sort(values[~np.isnan(values)])
+        if not len(values):
+            return cls(compression=compression)
+        means, weights = _compress(values, np.ones(len(values)), compression)
+        return cls(means, weights, float(values[0]), float(values[-1]), compression)
+
+    def merge(self, other: 'TDigest') -> 'TDigest':
+        if not len(other.means):
+            return self
+        if not len(self.means):
+            return other
+        compression = min(self.compression, other.compression)
+        means = np.concatenate([self.means, other.means])
+        weights = np.concatenate([self.weights, other.weights])
+        order = np.argsort(means, kind='stable')
+        means, weights = _compress(means[order], weights[order], compression)
+        return TDigest(means, weights, min(self.minimum, other.minimum), max(self.maximum, other.maximum), compression)
+
+    def quantile(self, q: float | np.ndarray) -> float | np.ndarray:
+        '''
+        Estimated quantile(s) q in [0, 1]: linear interpolation between the centroids (at their mid ranks), exact min / max.
+        '''
+        q = np.asarray(q, dtype=np.float64)
+        if not len(self.means):
+            result = np.full(q.shape, np.nan)
+        else:
+            total = self.weights.sum()
+            mid_ranks = np.cumsum(self.weights) - self.weights / 2
+            ranks = np.concatenate(([0.0], mid_ranks, [total]))
+            values = np.concatenate(([self.minimum], self.means, [self.maximum]))
+            result = np.interp(q * total, ranks, values)
+        return float(result) if result.ndim == 0 else result
+
+    def to_dict(self) -> dict:
+        return {
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist(),
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'compression': self.compression,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'TDigest':
+        return cls(np.asarray(data['means'], dtype=np.float64), np.asarray(data['weights'], dtype=np.float64),
+                   data['minimum'], data['maximum'], data['compression'])
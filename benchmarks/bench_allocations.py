@@ -0,0 +1,84 @@
+# bench_allocations.py
+# Allocations of one /dataframe request (DataFrame -> range trim -> enrichment) measured with tracemalloc:
+# the pipeline with defensive copies (df.copy(), boolean masks, columns added in place) vs the current one
+# (zero-copy frame, binary-search slice, fused enrichment returning a new frame).
+#
+#   python -m benchmarks.bench_allocations
+#   python -m benchmarks.bench_allocations --rows 100000 --window 7 30
+
+import argparse
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from app.domain.entities import Symbol, Currency, MarketChartData
+from app.domain.services import _enrich_market_chart
+from app.services.analytics import (
+    convert_market_chart_data_to_dataframe,
+    compute_returns,
+    compute_rolling_window,
+    compute_volatility,
+    normalize_series,
+)
+
+
+def _build_chart(rows: int) -> MarketChartData:
+    rng = np.random.default_rng(0)
+    timestamps = 1_500_000_000_000 + np.arange(rows, dtype=np.int64) * 3_600_000
+    prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    return MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps, prices)
+
+
+def _legacy_request(chart: MarketChartData, windows: list[int], start, end) -> pd.DataFrame:
+    #Copy of the pipeline with defensive copies
+    df = convert_market_chart_data_to_dataframe(chart).copy()
+    df = df.copy()
+    df = df[df['timestamp'] >= start]
+    df = df[df['timestamp'] <= end]
+    df = df.copy()
+    compute_returns(df, 'price')
+    for window in windows:
+        compute_rolling_window(df, window, 'price')
+        compute_volatility(df, 'price', window)
+    normalize_series(df, 'price', 100.0)
+    return df
+
+
+def _current_request(chart: MarketChartData, windows: list[int], start, end) -> pd.DataFrame:
+    return _enrich_market_chart(chart, None, windows, 100.0, windows, start, end)
+
+
+def _measure(fn) -> tuple[float, float]:
+    #(peak, retained) MiB allocated by one request; retained = what the returned frame keeps alive
+    fn() #warm-up (imports, caches)
+    tracemalloc.start()
+    try:
+        result = fn()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 2**20, retained / 2**20
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Allocations per request: defensive copies vs the current pipeline.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000], help='Series lengths to test.')
+    parser.add_argument('--window', type=int, nargs='+', default=[30], help='Rolling mean / volatility window(s).')
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        chart = _build_chart(rows)
+        datetimes = chart.datetimes.astype(object)
+        #zoom into the second half of the history
+        start, end = datetimes[rows // 2], datetimes[-1] - timedelta(hours=1)
+        legacy_peak, legacy_retained = _measure(lambda: _legacy_request(chart, args.window, start, end))
+        current_peak, current_retained = _measure(lambda: _current_request(chart, args.window, start, end))
+        print(f'rows={rows:>9,}   legacy peak={legacy_peak:8.2f} MiB (retained {legacy_retained:7.2f})   '
+              f'new peak={current_peak:8.2f} MiB (retained {current_retained:7.2f})   x{legacy_peak / current_peak:.1f} lower peak')
+
+
+if __name__ == '__main__':
+    main()
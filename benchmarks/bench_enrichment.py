@@ -0,0 +1,69 @@
+# bench_enrichment.py
+# Benchmark: the pandas enrichment pipeline (compute_returns -> compute_rolling_window -> compute_volatility -> normalize_series,
+# each one validating the column again) vs the fused NumPy engine (enrich_price_frame).
+#
+#   python -m benchmarks.bench_enrichment
+#   python -m benchmarks.bench_enrichment --rows 10000 --window 7 30 90 200 --volatility-window 7 30
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.services.analytics import (
+    compute_returns,
+    compute_rolling_window,
+    compute_volatility,
+    normalize_series,
+    enrich_price_frame,
+)
+
+
+def _build_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    return pd.DataFrame({'timestamp': pd.date_range('2015-01-01', periods=rows, freq='h'), 'price': prices})
+
+
+def _pandas_pipeline(df: pd.DataFrame, windows: list[int], volatility_windows: list[int]) -> pd.DataFrame:
+    df = df.copy()
+    compute_returns(df, 'price')
+    for window in windows:
+        compute_rolling_window(df, window, 'price')
+    for volatility_window in volatility_windows:
+        compute_volatility(df, 'price', volatility_window)
+    normalize_series(df, 'price', 100.0)
+    return df
+
+
+def _fused_pipeline(df: pd.DataFrame, windows: list[int], volatility_windows: list[int]) -> pd.DataFrame:
+    return enrich_price_frame(df, 'price', windows, volatility_windows, 100.0)
+
+
+def _best_ms(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - t0) * 1000)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='pandas enrichment pipeline vs fused NumPy engine.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000], help='Series lengths to test.')
+    parser.add_argument('--window', type=int, nargs='+', default=[30], help='Rolling mean window(s).')
+    parser.add_argument('--volatility-window', type=int, nargs='+', default=[30], help='Volatility window(s).')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per size (best is reported).')
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = _build_frame(rows)
+        pandas_ms = _best_ms(lambda: _pandas_pipeline(df, args.window, args.volatility_window), args.repeat)
+        fused_ms = _best_ms(lambda: _fused_pipeline(df, args.window, args.volatility_window), args.repeat)
+        print(f'rows={rows:>9,}   pandas best={pandas_ms:9.2f} ms   fused best={fused_ms:8.2f} ms   speedup x{pandas_ms / fused_ms:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+# bench_formats.py
+# Response formats of an enriched frame (what /market_chart/dataframe sends): body size, encode time on the server and
+# decode time back into a DataFrame on the client, for JSON (columns + rows), NDJSON, CSV, Arrow IPC stream and Parquet.
+#
+#   python -m benchmarks.bench_formats
+#   python -m benchmarks.bench_formats --rows 2160 43800 --repeat 3
+
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.api.encoders import iter_ndjson, iter_csv, iter_arrow, encode_parquet
+from app.api.schemas import DataFrameResponse
+from app.domain.entities import Symbol, Currency, MarketChartData
+from app.domain.services import _enrich_market_chart
+
+
+def _build_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    timestamps = 1_700_000_000_000 + np.arange(rows, dtype=np.int64) * 3_600_000
+    prices = 30_000 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+    chart = MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps, prices)
+    return _enrich_market_chart(chart, None, [7, 30, 200], 100.0, [24, 168])
+
+
+def _decode_json(body: bytes) -> pd.DataFrame:
+    data = json.loads(body)
+    return pd.DataFrame(data['rows'], columns=data['columns'])
+
+
+FORMATS = {
+    'json': (lambda df: DataFrameResponse.from_dataframe(df).model_dump_json().encode(), _decode_json),
+    'ndjson': (lambda df: b''.join(iter_ndjson(df)), lambda body: pd.read_json(io.BytesIO(body), lines=True)),
+    'csv': (lambda df: b''.join(iter_csv(df)), lambda body: pd.read_csv(io.BytesIO(body))),
+    'arrow': (lambda df: b''.join(iter_arrow(df)), lambda body: pa.ipc.open_stream(body).read_pandas()),
+    'parquet': (encode_parquet, lambda body: pd.read_parquet(io.BytesIO(body))),
+}
+
+
+def _best_of(fn, repeat: int) -> tuple[float, object]:
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - begin)
+    return best, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Size and encode / decode time of the response formats.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[2160, 43800], help='Hourly rows (90 days and 5 years by default).')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        df = _build_frame(rows)
+        print(f'rows={rows}   columns={len(df.columns)}')
+        for name, (encode, decode) in FORMATS.items():
+            encode_time, body = _best_of(lambda: encode(df), args.repeat)
+            decode_time, _ = _best_of(lambda: decode(body), args.repeat)
+            print(f'  {name:<8} size={len(body) / 1024:10.1f} KiB   encode={encode_time * 1000:9.2f} ms   decode={decode_time * 1000:9.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
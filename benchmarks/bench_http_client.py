@@ -0,0 +1,108 @@
+# bench_http_client.py
+# Benchmark: one new connection per request (old httpx.get behaviour) vs the shared pooled keep-alive client.
+# Runs a local stub of the CoinGecko market_chart endpoint, so no API key or network is needed.
+#
+#   python -m benchmarks.bench_http_client --requests 300
+#   python -m benchmarks.bench_http_client --certfile cert.pem --keyfile key.pem   # include the TLS handshake
+
+import argparse
+import json
+import ssl
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.domain.entities import Symbol, Currency
+from app.infrastructure import coingecko
+from app.infrastructure.http_client import build_http_client_settings
+
+
+def _build_payload(points: int) -> bytes:
+    start_ms = 1_700_000_000_000
+    prices = [[start_ms + i * 3_600_000, 30000.0 + i] for i in range(points)]
+    return json.dumps({'prices': prices, 'market_caps': [], 'total_volumes': []}).encode()
+
+
+def start_stub_server(points: int, certfile: str | None, keyfile: str | None) -> tuple[ThreadingHTTPServer, str]:
+    payload = _build_payload(points)
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1' #keep-alive support
+        disable_nagle_algorithm = True #headers and body are written separately
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    scheme = 'http'
+    if certfile and keyfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = 'https'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f'{scheme}://{host}:{port}/api/v3'
+
+
+def _timed_calls(n: int, get_client) -> list[float]:
+    latencies = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        client, close = get_client()
+        coingecko.infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1, client=client)
+        if close:
+            client.close()
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return latencies
+
+
+def _report(name: str, latencies: list[float]) -> None:
+    latencies = sorted(latencies)
+    p50 = statistics.median(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f'{name:<28} p50={p50:7.3f} ms   p95={p95:7.3f} ms   mean={statistics.mean(latencies):7.3f} ms')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Fresh connection per request vs pooled keep-alive client.')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per scenario.')
+    parser.add_argument('--points', type=int, default=288, help='Price points in the stub payload (288 = 1 day of 5-min data).')
+    parser.add_argument('--certfile', type=str, default=None, help='PEM certificate to serve the stub over TLS.')
+    parser.add_argument('--keyfile', type=str, default=None, help='PEM private key to serve the stub over TLS.')
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(args.points, args.certfile, args.keyfile)
+    coingecko.COINGECKO_BASE_URL = base_url
+    verify = False if base_url.startswith('https') else True #self-signed certificate
+
+    settings = build_http_client_settings()
+    settings['http2'] = False #the stub server only speaks HTTP/1.1
+
+    try:
+        fresh = _timed_calls(args.requests, lambda: (httpx.Client(verify=verify, **settings), True))
+        pooled_client = httpx.Client(verify=verify, **settings)
+        _timed_calls(5, lambda: (pooled_client, False)) #warm-up: open the pooled connection
+        pooled = _timed_calls(args.requests, lambda: (pooled_client, False))
+        pooled_client.close()
+    finally:
+        server.shutdown()
+
+    print(f'Stub: {base_url}  payload points={args.points}  requests={args.requests}')
+    _report('new connection per request', fresh)
+    _report('pooled keep-alive client', pooled)
+    print(f'p50 speedup: x{statistics.median(fresh) / statistics.median(pooled):.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+# bench_panel.py
+# Market overview of many assets: one single-series pipeline per asset (DataFrame + fused enrichment each) vs the panel
+# engine (as-of alignment into one 2-D array + one vectorized enrichment pass).
+#
+#   python -m benchmarks.bench_panel
+#   python -m benchmarks.bench_panel --assets 10 100 500 --rows 2160
+
+import argparse
+import time
+
+import numpy as np
+
+from app.domain.entities import Symbol, Currency, MarketChartData
+from app.domain.services import _enrich_market_chart
+from app.services.panel import enrich_panel
+
+
+def _build_charts(assets: int, rows: int) -> list[MarketChartData]:
+    rng = np.random.default_rng(0)
+    charts = []
+    for _ in range(assets):
+        #hourly points with a few seconds of jitter per asset
+        timestamps = 1_700_000_000_000 + np.arange(rows, dtype=np.int64) * 3_600_000 + rng.integers(0, 5000, rows)
+        prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, rows)))
+        charts.append(MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps, prices))
+    return charts
+
+
+def _best_of(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - begin)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Per-asset pipelines vs one panel pass.')
+    parser.add_argument('--assets', type=int, nargs='+', default=[10, 100, 300], help='Number of assets.')
+    parser.add_argument('--rows', type=int, default=2160, help='Points per asset (90 days of hourly points by default).')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for assets in args.assets:
+        charts = _build_charts(assets, args.rows)
+        labels = [f'asset_{i}' for i in range(assets)]
+        per_asset = _best_of(lambda: [_enrich_market_chart(chart, None, [7, 30], 100.0, [24]) for chart in charts], args.repeat)
+        panel = _best_of(lambda: enrich_panel(charts, labels, [7, 30], [24], 100.0), args.repeat)
+        print(f'assets={assets:>5}   per-asset={per_asset * 1000:9.2f} ms   panel={panel * 1000:9.2f} ms   x{per_asset / panel:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# bench_parser.py
+# Benchmark: the old point-by-point cleaner (one datetime + one PricePoint per row) vs the vectorized parser (NumPy columns).
+# The payload is built in memory (already decoded JSON), so only the parsing step is measured.
+#
+#   python -m benchmarks.bench_parser
+#   python -m benchmarks.bench_parser --rows 1000 100000 --repeat 5
+
+import argparse
+import statistics
+import time
+from datetime import datetime
+
+from app.domain.entities import Symbol, Currency, PricePoint, MarketChartData
+from app.infrastructure.coingecko import infra_parse_raw_market_chart_coingecko
+
+
+def _build_payload(rows: int) -> dict:
+    start_ms = 1_500_000_000_000
+    return {'prices': [[start_ms + i * 3_600_000, 30000.0 + (i % 1000) * 0.5] for i in range(rows)]}
+
+
+def _legacy_parse(raw_data: dict) -> MarketChartData:
+    #Copy of the cleaner loop before vectorization (local time datetimes)
+    price_points = []
+    for item in raw_data.get('prices', []):
+        timestamp = datetime.fromtimestamp(item[0] / 1000.0)
+        price = float(item[1])
+        price_points.append(PricePoint(timestamp=timestamp, price=price))
+    return MarketChartData(Symbol.BTC, Currency.USD, price_points)
+
+
+def _vectorized_parse(raw_data: dict) -> MarketChartData:
+    return infra_parse_raw_market_chart_coingecko(raw_data, Symbol.BTC, Currency.USD)
+
+
+def _best_ms(fn, payload: dict, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(payload)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return min(timings), statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Point-by-point cleaner vs vectorized parser.')
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000, 1_000_000], help='Payload sizes to test.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size (best and median are reported).')
+    args = parser.parse_args()
+
+    for rows in args.rows:
+        payload = _build_payload(rows)
+        legacy_best, legacy_median = _best_ms(_legacy_parse, payload, args.repeat)
+        vector_best, vector_median = _best_ms(_vectorized_parse, payload, args.repeat)
+        print(f'rows={rows:>9,}   loop best={legacy_best:9.2f} ms (median {legacy_median:9.2f})   '
+              f'vectorized best={vector_best:8.2f} ms (median {vector_median:8.2f})   speedup x{legacy_best / vector_best:.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
+import base64
 import os
 from datetime import date
 from typing import Any
@@ -151,13 +152,13 @@ def _parse_dataframe_payload(payload: Any) -> pd.DataFrame:
     return pd.DataFrame([payload])
 
 
-def _fetch_stats(config: dict) -> dict:
-    url = f"{API_BASE_URL}/market_chart/stats"
+def _fetch_report(config: dict) -> dict:
+    # One call: the API fetches the series and runs the enrichment once for the stats, the dataframe and the plot
+    url = f"{API_BASE_URL}/market_chart/report"
     params = {
         "symbol": config["symbol"],
         "currency": config["currency"],
-        "days": config["days"],
-        "provider": PROVIDER_VALUE,
+        **_build_common_params(config),
     }
 
     response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
@@ -165,46 +166,20 @@ def _fetch_stats(config: dict) -> dict:
     return response.json()
 
 
-def _fetch_dataframe(config: dict) -> pd.DataFrame:
-    url = f"{API_BASE_URL}/market_chart/dataframe"
-    params = {
-        "symbol": config["symbol"],
-        "currency": config["currency"],
-        **_build_common_params(config),
-    }
-
-    response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-    _raise_for_api_error(response)
+def _compute_payload(config: dict) -> dict:
+    report = _fetch_report(config)
 
-    df = _parse_dataframe_payload(response.json())
+    df = _parse_dataframe_payload(report["dataframe"])
     if "timestamp" in df.columns:
         df["timestamp"] = pd.to_datetime(df["timestamp"], errors="coerce")
 
-    return df
-
-
-def _fetch_png(config: dict) -> bytes:
-    url = f"{API_BASE_URL}/market_chart/{config['symbol']}/{config['currency']}/plot-enriched"
-    params = _build_common_params(config)
-
-    response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
-    _raise_for_api_error(response)
-    return response.content
-
-
-def _compute_payload(config: dict) -> dict:
-    stats = _fetch_stats(config)
-    df = _fetch_dataframe(config)
-
     if df.empty:
         raise ValueError("No data returned.")
 
-    image_bytes = _fetch_png(config)
-
     return {
-        "stats": stats,
+        "stats": report["stats"],
         "df": df,
-        "image_bytes": image_bytes,
+        "image_bytes": base64.b64decode(report["image_png_base64"]),
         "caption": f"{config['symbol']}/{config['currency']} enriched chart",
     }
 
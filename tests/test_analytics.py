@@ -21,6 +21,7 @@ Functions to test:
 '''
 import pytest
 from datetime import datetime
+import numpy as np
 import pandas as pd
 from app.domain.services import compute_enriched_market_chart
 from app.services.analytics import (
@@ -32,7 +33,8 @@ from app.services.analytics import (
     resample_price_series,
     trim_date_range,
     normalize_series,
-    compute_volatility
+    compute_volatility,
+    enrich_price_frame,
 )
 from app.domain.entities import Symbol, Currency, PricePoint, MarketChartData, ResampleFrequency
 
@@ -90,6 +92,42 @@ def test_convert_market_chart_data_to_dataframe():
     df_empty = convert_market_chart_data_to_dataframe(empty_data)
     assert len(df_empty) == 0
     assert list(df_empty.columns) == ['timestamp', 'price']
+
+def test_convert_market_chart_data_to_dataframe_is_zero_copy():
+    sample_data = build_sample_marketchartdata()
+    df = convert_market_chart_data_to_dataframe(sample_data)
+    assert np.shares_memory(df['price'].to_numpy(), sample_data.prices)
+    assert df['timestamp'].dtype == 'datetime64[ms]'
+
+# Test the columnar MarketChartData (arrays + lazy points view)
+def test_market_chart_data_arrays_and_points_view():
+    from_points = build_sample_marketchartdata()
+    assert len(from_points) == 5
+    assert from_points.timestamps.dtype == np.int64 and from_points.prices.dtype == np.float64
+    assert from_points.timestamps[0] == 1672531200000  #2023-01-01 00:00 UTC in ms
+    assert from_points.nbytes == 5 * 16
+
+    from_arrays = MarketChartData.from_arrays(Symbol.BTC, Currency.USD, from_points.timestamps, from_points.prices)
+    assert from_arrays.points == from_points.points
+    assert from_arrays.points[4] == PricePoint(timestamp=datetime(2023, 1, 5), price=120.0)
+
+    #shared between requests -> read-only
+    with pytest.raises(ValueError):
+        from_arrays.prices[0] = 1.0
+
+def test_market_chart_data_time_slice_is_a_view():
+    chart = build_sample_marketchartdata() #2023-01-01 .. 2023-01-05, one point per day
+    day_ms = 86_400_000
+    sliced = chart.time_slice(chart.timestamps[1], chart.timestamps[3] + day_ms - 1)
+    assert list(sliced.prices) == [110.0, 105.0, 115.0]
+    assert np.shares_memory(sliced.prices, chart.prices)
+    assert chart.time_slice(None, None) is chart
+    assert len(chart.time_slice(chart.timestamps[-1] + 1, None)) == 0
+    assert len(chart.time_slice(chart.timestamps[3], chart.timestamps[1])) == 0 #start after end
+
+def test_market_chart_data_rejects_mismatched_arrays():
+    with pytest.raises(ValueError):
+        MarketChartData.from_arrays(Symbol.BTC, Currency.USD, np.array([1, 2]), np.array([1.0]))
     
 
 # Test _validate_numeric_series
@@ -128,6 +166,8 @@ def test_calculate_stats():
     assert stats['first_price'] == 100.0
     assert stats['last_price'] == 120.0
     assert round(stats['percent_change'], 5) == 20.0
+    assert stats['skewness'] == pytest.approx(df['price'].skew())
+    assert stats['kurtosis'] == pytest.approx(df['price'].kurt())
     
     #error empty dataframe
     empty_df = pd.DataFrame(columns=['timestamp', 'price'])
@@ -142,6 +182,7 @@ def test_calculate_stats():
     stats_constant = calculate_stats(constant_df, 'price')
     assert stats_constant['std_dev'] == 0.0
     assert stats_constant['variance'] == 0.0
+    assert stats_constant['skewness'] == 0.0
 
 # Test compute_returns
 def test_compute_returns():
@@ -267,6 +308,16 @@ def test_trim_date_range():
     assert len(trimmed_empty_df) == 0
     #side: original df should remain unchanged
     assert len(df) == 8
+    #sorted timestamps -> binary search, the result is a slice of df (no copy of the columns)
+    assert np.shares_memory(trimmed_df['price'].to_numpy(), df['price'].to_numpy())
+    #timezone-aware bounds are compared in UTC
+    from datetime import timezone, timedelta
+    aware_start = datetime(2025, 11, 19, 2, tzinfo=timezone(timedelta(hours=2)))
+    assert trim_date_range(df, aware_start, None).iloc[0]['timestamp'] == start_date
+    #unsorted frame -> mask fallback, same rows
+    shuffled = df.iloc[::-1]
+    assert sorted(trim_date_range(shuffled, start_date, end_date)['price']) == [3.0, 4.0, 5.0, 6.0]
+    assert sorted(trim_date_range(shuffled, aware_start, end_date)['price']) == [3.0, 4.0, 5.0, 6.0]
     
 #test normalize_series
 def test_normalize_series():
@@ -336,6 +387,159 @@ def test_compute_volatility():
         else:
             assert round(df.iloc[i]['volatility_2'], 5) == round(expected_volatility_2[i], 5)
     
+#frames over the cached chart are read-only views; the pipeline never writes them and its result owns its columns
+def test_pipeline_shares_cached_arrays_without_writing_them():
+    chart = build_sample_marketchartdata()
+    prices_before = chart.prices.copy()
+    base = convert_market_chart_data_to_dataframe(chart)
+    assert np.shares_memory(base['price'].to_numpy(), chart.prices)
+    trimmed = trim_date_range(base, datetime(2023, 1, 2), None)
+    enriched = enrich_price_frame(trimmed, 'price', 2, 2, 100.0)
+    assert not np.shares_memory(enriched['price'].to_numpy(), chart.prices)
+
+    #the caller can write into the frame it gets
+    enriched.loc[enriched.index[0], 'price'] = -1.0
+    enriched.loc[enriched.index[0], 'timestamp'] = pd.Timestamp('2000-01-01')
+    assert np.array_equal(chart.prices, prices_before)
+    assert base['price'].iloc[1] == 110.0
+
+    #resampling does not rewrite the caller's timestamp column
+    resample_price_series(base, 'price', ResampleFrequency.DAILY)
+    assert np.shares_memory(base['timestamp'].to_numpy(), chart.timestamps)
+
+#the pandas options of the process are never changed, and a frame of the caller is never aliased
+def test_enrichment_leaves_pandas_options_and_input_alone():
+    option = pd.get_option('mode.copy_on_write')
+    df = pd.DataFrame({'timestamp': pd.date_range('2023-01-01', periods=6, freq='h'), 'price': [1.0, 2.0, np.nan, 4.0, 5.0, 6.0]})
+    for frame in (df, df.dropna()):
+        enriched = enrich_price_frame(frame, 'price', 2, None, None)
+        enriched.loc[enriched.index[0], 'price'] = -1.0
+    assert df['price'].iloc[0] == 1.0
+    assert pd.get_option('mode.copy_on_write') == option
+
+#test enrich_price_frame (fused NumPy engine) against the pandas functions
+# Property tests: random price paths and windows, the fused result must match the pandas pipeline column by column.
+
+def _pandas_enrichment(df, window_size, volatility_window, normalize_base):
+    df = df.copy()
+    compute_returns(df, 'price')
+    if window_size is not None:
+        compute_rolling_window(df, window_size, 'price')
+    if volatility_window is not None:
+        compute_volatility(df, 'price', volatility_window)
+    if normalize_base is not None:
+        normalize_series(df, 'price', normalize_base)
+    return df
+
+def _random_price_frame(rng, n, kind):
+    if kind == 'walk':
+        prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    elif kind == 'large':
+        prices = 1e9 + rng.normal(0, 1e3, n).cumsum()
+    elif kind == 'tiny':
+        prices = 1e-6 * (1 + rng.random(n))
+    else: #constant with a few jumps -> windows with zero variance
+        prices = np.repeat(rng.integers(1, 5, max(1, n // 7)).astype(float), 7)[:n]
+        prices = np.pad(prices, (0, n - len(prices)), mode='edge')
+    timestamps = pd.date_range('2024-01-01', periods=n, freq='h')
+    return pd.DataFrame({'timestamp': timestamps, 'price': prices})
+
+@pytest.mark.parametrize('seed', range(40))
+def test_enrich_price_frame_matches_pandas(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 3000))
+    kind = ['walk', 'large', 'tiny', 'steps'][seed % 4]
+    df = _random_price_frame(rng, n, kind)
+    window_size = int(rng.integers(1, n + 1)) if rng.random() < 0.8 else None
+    volatility_window = int(rng.integers(2, n + 2)) if rng.random() < 0.8 else None
+    normalize_base = float(rng.choice([1.0, 100.0, 123.456789])) if rng.random() < 0.8 else None
+
+    expected = _pandas_enrichment(df, window_size, volatility_window, normalize_base)
+    fused = enrich_price_frame(df, 'price', window_size, volatility_window, normalize_base)
+
+    assert list(fused.columns) == list(expected.columns)
+    assert fused.index.equals(expected.index)
+    for column in expected.columns:
+        if column == 'timestamp':
+            assert fused[column].equals(expected[column])
+            continue
+        np.testing.assert_allclose(fused[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=column)
+
+@pytest.mark.parametrize('seed', range(10))
+def test_enrich_price_frame_multiple_windows_match_pandas(seed):
+    rng = np.random.default_rng(100 + seed)
+    n = int(rng.integers(50, 5000))
+    df = _random_price_frame(rng, n, 'walk')
+    windows = [int(w) for w in rng.integers(1, n + 1, 4)] + [7, 7] #duplicates give one column
+    volatility_windows = [int(w) for w in rng.integers(2, n + 2, 4)]
+
+    fused = enrich_price_frame(df, 'price', windows, volatility_windows, None)
+    expected = df.copy()
+    compute_returns(expected, 'price')
+    for window in dict.fromkeys(windows):
+        compute_rolling_window(expected, window, 'price')
+    for window in dict.fromkeys(volatility_windows):
+        compute_volatility(expected, 'price', window)
+
+    assert list(fused.columns) == list(expected.columns)
+    for column in expected.columns[1:]:
+        np.testing.assert_allclose(fused[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=column)
+
+def test_rolling_windows_stable_on_long_series():
+    #Long trending series: the blocked prefix sums must stay close to the exact window means / stds (no drift with the position)
+    from numpy.lib.stride_tricks import sliding_window_view
+    from app.services.analytics import _rolling_means, _rolling_stds
+    rng = np.random.default_rng(7)
+    n = 300_000
+    prices = np.linspace(1.0, 1e6, n) + rng.normal(0, 1, n)
+    returns = rng.normal(1e-3, 1e-4, n)
+    for window in (3, 50):
+        exact_mean = sliding_window_view(prices, window).mean(axis=1)
+        rel_err = np.abs(_rolling_means(prices, [window])[window][window - 1:] - exact_mean) / np.abs(exact_mean)
+        assert rel_err.max() < 1e-12
+    exact_std = sliding_window_view(returns, 50).std(axis=1, ddof=1)
+    rel_err = np.abs(_rolling_stds(returns, [50])[50][49:] - exact_std) / exact_std
+    assert rel_err.max() < 1e-12
+
+def test_rolling_stds_flat_window_after_volatile_history_is_zero():
+    #a constant run after noisy data: the prefix sums carry the earlier volatility, the flat windows must still be exactly 0
+    from app.services.analytics import _rolling_stds
+    rng = np.random.default_rng(3)
+    returns = np.concatenate([rng.normal(0, 0.05, 1200), np.zeros(218)])
+    volatility = _rolling_stds(returns, [160])[160]
+    assert np.all(volatility[1200 + 159:] == 0.0) #windows entirely inside the constant run
+    assert np.all(volatility[159:1200 + 159] > 0.0)
+    prices = 100 * np.cumprod(np.concatenate([[1.0], 1 + returns]))
+    df = pd.DataFrame({'timestamp': pd.date_range('2024-01-01', periods=len(prices), freq='h'), 'price': prices})
+    enriched = enrich_price_frame(df, 'price', None, 160, None)
+    assert (enriched['volatility_160'].iloc[-50:] == 0.0).all()
+
+def test_enrich_price_frame_keeps_index_and_input():
+    df = _random_price_frame(np.random.default_rng(0), 50, 'walk').iloc[10:40] #trimmed frame: index starts at 10
+    before = df.copy()
+    fused = enrich_price_frame(df, 'price', 5, 5, 100.0)
+    assert list(fused.index) == list(range(10, 40))
+    assert df.equals(before) #input not modified
+
+def test_enrich_price_frame_nan_falls_back_to_pandas():
+    df = _random_price_frame(np.random.default_rng(1), 30, 'walk')
+    df.loc[5, 'price'] = np.nan
+    expected = _pandas_enrichment(df, 3, 4, 100.0)
+    fused = enrich_price_frame(df, 'price', 3, 4, 100.0)
+    pd.testing.assert_frame_equal(fused, expected)
+
+def test_enrich_price_frame_errors():
+    df = _random_price_frame(np.random.default_rng(2), 10, 'walk')
+    with pytest.raises(ValueError):
+        enrich_price_frame(df, 'price', window_size=11)
+    with pytest.raises(KeyError):
+        enrich_price_frame(df, 'missing_column')
+    with pytest.raises(ValueError):
+        enrich_price_frame(df.iloc[0:0], 'price')
+    df['price'] = 0.0
+    with pytest.raises(ValueError):
+        enrich_price_frame(df, 'price', normalize_base=100.0)
+
 #test compute_enriched_market_chart 
 
     
@@ -1,16 +1,18 @@
 # tests/test_api_market_chart.py
 
 from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 import pytest
 from fastapi import FastAPI
 from fastapi.testclient import TestClient
 
 from app.api.routes.market_chart import router as market_chart_router
-from app.domain.entities import Symbol, Currency, Provider, PricePoint, MarketChartData
+from app.domain.entities import Symbol, Currency, Provider, PricePoint, MarketChartData, MarketChartStatsSource, ResampleFrequency
 from app.domain import errors as domain_errors
 
 from app.api.routes import market_chart as api_market_chart
+from app.services.correlation import rolling_cross_moments
 
 #Test the dataframe endpoints of the market_chart router
 # We will mock the domain service functions to return controlled data
@@ -18,6 +20,23 @@ app = FastAPI()
 app.include_router(market_chart_router)
 client = TestClient(app)
 
+# Data the routes fetch before computing (its version gives the ETag / Last-Modified): fixed two-point charts, the
+# responses come from the mocked use cases
+def _fake_chart(symbol=Symbol.BTC, currency=Currency.USD, last_ms=1_672_617_600_000) -> MarketChartData:
+    return MarketChartData.from_arrays(symbol, currency, np.array([last_ms - 86_400_000, last_ms]), np.array([100.0, 110.0]))
+
+@pytest.fixture(autouse=True)
+def _fake_fetched_data(monkeypatch):
+    async def fake_fetch(symbol, currency, days, provider, **kwargs):
+        return _fake_chart(symbol, currency)
+    async def fake_fetch_many(symbols, currency, days, provider, **kwargs):
+        return [_fake_chart(symbol, currency) for symbol in dict.fromkeys(symbols)]
+    async def fake_stats_source(symbol, currency, days, provider, **kwargs):
+        return MarketChartStatsSource(last_timestamp=1_672_617_600_000, chart=_fake_chart(symbol, currency))
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_async", fake_fetch)
+    monkeypatch.setattr(api_market_chart, "fetch_market_charts_async", fake_fetch_many)
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_stats_source_async", fake_stats_source)
+
 # --- Helpers -----------------------------------------------------------------
 
 # Deterministic MarketChartData for testing.
@@ -38,8 +57,8 @@ def _build_fake_marketchartdata(days: int = 10) -> MarketChartData:
         )
     return MarketChartData(Symbol.BTC, Currency.USD, points)
 
-# Fake fetch_market_chart to return deterministic data
-def _fake_fetch_market_chart(symbol, currency, days, provider) -> MarketChartData:
+# Fake fetch_market_chart_async to return deterministic data (the routes use the asyncio path)
+async def _fake_fetch_market_chart(symbol, currency, days, provider, **kwargs) -> MarketChartData:
     # Ignore parameters and just return deterministic data
     return _build_fake_marketchartdata(days=days)   
 
@@ -48,7 +67,7 @@ def _fake_fetch_market_chart(symbol, currency, days, provider) -> MarketChartDat
 # Test the /market_chart/ endpoint
 def test_get_market_chart_success(monkeypatch):
     # Patch fetch_market_chart to return fake data
-    monkeypatch.setattr(api_market_chart,"fetch_market_chart",_fake_fetch_market_chart)
+    monkeypatch.setattr(api_market_chart,"fetch_market_chart_async",_fake_fetch_market_chart)
 
     # Make the API call
     response = client.get(
@@ -72,13 +91,33 @@ def test_get_market_chart_success(monkeypatch):
         assert point["price"] == expected_price
 
 
+#column-oriented shape, and both shapes documented in the OpenAPI schema
+def test_get_market_chart_columns_shape(monkeypatch):
+    async def _fake_fetch_market_chart(symbol, currency, days, provider, **kwargs):
+        return _build_fake_marketchartdata(days=3)
+
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_async", _fake_fetch_market_chart)
+
+    response = client.get("/market_chart/", params={"symbol": "bitcoin", "currency": "usd", "days": 3, "provider": "coingecko", "shape": "columns"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "symbol": "bitcoin",
+        "currency": "usd",
+        "timestamps": ["2023-01-01T00:00:00.000", "2023-01-02T00:00:00.000", "2023-01-03T00:00:00.000"],
+        "prices": [100.0, 110.0, 120.0],
+    }
+
+    schema = app.openapi()["paths"]["/market_chart/"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+    assert {ref["$ref"].rsplit("/", 1)[-1] for ref in schema["anyOf"]} == {"MarketChartResponse", "MarketChartColumnsResponse"}
+
+
 # Test error handling for BusinessNoDataError
 def test_get_market_chart_no_data_error(monkeypatch):
     # Patch fetch_market_chart to raise BusinessNoDataError
-    def _raise_no_data_error(symbol, currency, days, provider):
+    async def _raise_no_data_error(symbol, currency, days, provider, **kwargs):
         raise domain_errors.BusinessNoDataError("No data available for the given parameters.")
     
-    monkeypatch.setattr(api_market_chart,"fetch_market_chart",_raise_no_data_error)
+    monkeypatch.setattr(api_market_chart,"fetch_market_chart_async",_raise_no_data_error)
 
     # Make the API call
     response = client.get(
@@ -115,7 +154,7 @@ def test_get_market_chart_stats_success(monkeypatch):
         def from_dict(cls, dict_stats: dict) -> 'StatsResponse':
             return cls(**dict_stats) #cleaner and professional way to do it
     '''
-    def _fake_compute_market_chart_stats(symbol, currency, days, provider) -> dict:
+    async def _fake_compute_market_chart_stats(symbol, currency, days, provider, **kwargs) -> dict:
         return {
             "count": days,
             "min_price": 100.0,
@@ -128,7 +167,7 @@ def test_get_market_chart_stats_success(monkeypatch):
             "last_price": 100.0 + 10.0 * (days - 1),
             "percent_change": ((100.0 + 10.0 * (days - 1)) - 100.0) / 100.0 * 100,
         }
-    monkeypatch.setattr(api_market_chart,"compute_market_chart_stats",_fake_compute_market_chart_stats)
+    monkeypatch.setattr(api_market_chart,"compute_market_chart_stats_async",_fake_compute_market_chart_stats)
     # Make the API call
     response = client.get(
         "/market_chart/stats",
@@ -149,13 +188,27 @@ def test_get_market_chart_stats_success(monkeypatch):
     assert data["median_price"] == 120.0
     assert data["first_price"] == 100.0
     assert data["last_price"] == 140.0
+    assert data["skewness"] is None
+
+def test_get_market_chart_stats_shape_moments(monkeypatch):
+    async def _fake_stats(symbol, currency, days, provider, **kwargs) -> dict:
+        return {
+            "count": 3, "min_price": 1.0, "max_price": 3.0, "mean_price": 2.0, "median_price": 2.0, "std_dev": 1.0,
+            "variance": 1.0, "first_price": 1.0, "last_price": 3.0, "percent_change": 200.0,
+            "skewness": 0.0, "kurtosis": float("nan"),
+        }
+    monkeypatch.setattr(api_market_chart, "compute_market_chart_stats_async", _fake_stats)
+    response = client.get("/market_chart/stats", params={"symbol": "bitcoin", "currency": "usd", "days": 3, "provider": "coingecko"})
+    assert response.status_code == 200
+    assert response.json()["skewness"] == 0.0
+    assert response.json()["kurtosis"] is None #too few points
 # Test error handling for BusinessComputationError
 def test_get_market_chart_stats_computation_error(monkeypatch):
     # Patch compute_market_chart_stats to raise BusinessComputationError
-    def _raise_computation_error(symbol, currency, days, provider):
+    async def _raise_computation_error(symbol, currency, days, provider, **kwargs):
         raise domain_errors.BusinessComputationError("Error computing statistics from market chart data.")
     
-    monkeypatch.setattr(api_market_chart,"compute_market_chart_stats",_raise_computation_error)
+    monkeypatch.setattr(api_market_chart,"compute_market_chart_stats_async",_raise_computation_error)
 
     # Make the API call
     response = client.get(
@@ -192,11 +245,11 @@ def test_get_market_chart_dataframe_success(monkeypatch):
     )
 
     # Monkeypatch the domain service used by the endpoint
-    def fake_enriched(*args, **kwargs):
+    async def fake_enriched(*args, **kwargs):
         return fake_df
 
     monkeypatch.setattr(
-        api_market_chart, "compute_enriched_market_chart", fake_enriched
+        api_market_chart, "compute_enriched_market_chart_async", fake_enriched
     )
 
     # Perform request
@@ -229,11 +282,11 @@ def test_get_market_chart_dataframe_computation_error(monkeypatch):
     """
     from app.domain import errors as domain_errors
 
-    def fake_error(*args, **kwargs):
+    async def fake_error(*args, **kwargs):
         raise domain_errors.BusinessComputationError("Computation failed")
 
     monkeypatch.setattr(
-        api_market_chart, "compute_enriched_market_chart", fake_error
+        api_market_chart, "compute_enriched_market_chart_async", fake_error
     )
 
     response = client.get(
@@ -247,4 +300,409 @@ def test_get_market_chart_dataframe_computation_error(monkeypatch):
     )
 
     assert response.status_code == 500
-    assert response.json()["detail"] == "Computation failed"
\ No newline at end of file
+    assert response.json()["detail"] == "Computation failed"
+
+#several rolling / volatility windows in one call: repeated query parameters -> lists for the domain
+def test_get_market_chart_dataframe_multiple_windows(monkeypatch):
+    received = {}
+
+    async def fake_enriched(*args, **kwargs):
+        received.update(kwargs)
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 1)], "price": [100.0]})
+
+    monkeypatch.setattr(api_market_chart, "compute_enriched_market_chart_async", fake_enriched)
+
+    response = client.get(
+        "/market_chart/dataframe",
+        params=[("symbol", "bitcoin"), ("currency", "usd"), ("days", 30), ("provider", "coingecko"),
+                ("window_size", 7), ("window_size", 30), ("volatility_window", 14)],
+    )
+    assert response.status_code == 200
+    assert received["window_size"] == [7, 30]
+    assert received["volatility_window"] == [14]
+
+#streamed output: NDJSON / CSV rows instead of columns + rows
+def test_get_market_chart_dataframe_streamed_formats(monkeypatch):
+    async def fake_enriched(*args, **kwargs):
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 1), datetime(2023, 1, 2)], "price": [100.0, np.nan]})
+
+    monkeypatch.setattr(api_market_chart, "compute_enriched_market_chart_async", fake_enriched)
+    params = {"symbol": "bitcoin", "currency": "usd", "days": 2, "provider": "coingecko"}
+
+    response = client.get("/market_chart/dataframe", params={**params, "format": "ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.splitlines() == [
+        '{"timestamp":"2023-01-01T00:00:00.000","price":100.0}',
+        '{"timestamp":"2023-01-02T00:00:00.000","price":null}',
+    ]
+
+    response = client.get("/market_chart/dataframe", params={**params, "format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.splitlines() == ['"timestamp","price"', "2023-01-01 00:00:00.000,100", "2023-01-02 00:00:00.000,"]
+
+    response = client.get("/market_chart/dataframe", params={**params, "format": "xml"})
+    assert response.status_code == 422
+
+#binary formats: Arrow IPC stream / Parquet, by query parameter or Accept header
+def test_market_chart_routes_arrow_and_parquet(monkeypatch):
+    import io
+    import pyarrow as pa
+
+    async def fake_enriched(*args, **kwargs):
+        return pd.DataFrame({"timestamp": pd.to_datetime(["2023-01-01", "2023-01-02"]), "price": [100.0, np.nan]})
+
+    async def fake_fetch(*args, **kwargs):
+        return _build_fake_marketchartdata(days=3)
+
+    async def fake_stats(*args, **kwargs):
+        return {"count": 3, "min_price": 1.0, "max_price": 3.0, "mean_price": 2.0, "median_price": 2.0, "std_dev": 1.0,
+                "variance": 1.0, "first_price": 1.0, "last_price": 3.0, "percent_change": 200.0,
+                "price_quantiles": {"p1": 1.0, "p99": np.nan}}
+
+    monkeypatch.setattr(api_market_chart, "compute_enriched_market_chart_async", fake_enriched)
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_async", fake_fetch)
+    monkeypatch.setattr(api_market_chart, "compute_market_chart_stats_async", fake_stats)
+    params = {"symbol": "bitcoin", "currency": "usd", "days": 3, "provider": "coingecko"}
+
+    response = client.get("/market_chart/dataframe", params=params, headers={"Accept": "application/vnd.apache.arrow.stream"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    df = pa.ipc.open_stream(response.content).read_pandas()
+    assert list(df.columns) == ["timestamp", "price"]
+    assert df["price"].iloc[0] == 100.0 and np.isnan(df["price"].iloc[1])
+
+    response = client.get("/market_chart/", params={**params, "format": "parquet"})
+    assert response.headers["content-type"] == "application/vnd.apache.parquet"
+    df = pd.read_parquet(io.BytesIO(response.content))
+    assert list(df["price"]) == [100.0, 110.0, 120.0]
+    assert df["timestamp"].iloc[0] == pd.Timestamp("2023-01-01")
+
+    response = client.get("/market_chart/stats", params={**params, "format": "arrow"})
+    df = pa.ipc.open_stream(response.content).read_pandas()
+    assert len(df) == 1
+    assert df["mean_price"].iloc[0] == 2.0
+    assert df["price_p1"].iloc[0] == 1.0 and np.isnan(df["price_p99"].iloc[0])
+
+#latest enriched row (incremental state in the domain)
+def test_get_market_chart_latest_enriched(monkeypatch):
+    received = {}
+
+    async def fake_latest(*args, **kwargs):
+        received.update(kwargs)
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 2)], "price": [101.0], "rolling_mean_5": [100.5]})
+
+    monkeypatch.setattr(api_market_chart, "compute_latest_enriched_row_async", fake_latest)
+
+    response = client.get(
+        "/market_chart/latest-enriched",
+        params=[("symbol", "bitcoin"), ("currency", "usd"), ("days", 1), ("provider", "coingecko"), ("window_size", 5)],
+    )
+    assert response.status_code == 200
+    assert response.json()["columns"] == ["timestamp", "price", "rolling_mean_5"]
+    assert len(response.json()["rows"]) == 1
+    assert received["window_size"] == [5]
+
+def test_get_market_chart_plot_enriched_invalid_window():
+    response = client.get(
+        "/market_chart/bitcoin/usd/plot-enriched",
+        params=[("days", 10), ("provider", "coingecko"), ("window_size", 7), ("window_size", 0)],
+    )
+    assert response.status_code == 422
+
+#test /market_chart/{symbol}/{currency}/plot-enriched endpoint (rendered in a worker thread)
+def test_get_market_chart_plot_enriched_success(monkeypatch):
+    fake_df = pd.DataFrame(
+        {
+            "timestamp": [datetime(2023, 1, 1) + timedelta(days=i) for i in range(10)],
+            "price": [100.0 + i for i in range(10)],
+        }
+    )
+    fake_df["pct_change"] = fake_df["price"].pct_change() * 100
+    fake_df["acum_pct_change"] = (fake_df["price"] - 100.0)
+    fake_df["normalized_price_base_100.0"] = fake_df["price"]
+    for window in (2, 5):
+        fake_df[f"rolling_mean_{window}"] = fake_df["price"].rolling(window).mean()
+        fake_df[f"volatility_{window}"] = fake_df["price"].pct_change().rolling(window).std()
+
+    async def fake_enriched(*args, **kwargs):
+        return fake_df
+
+    monkeypatch.setattr(api_market_chart, "compute_enriched_market_chart_async", fake_enriched)
+
+    response = client.get(
+        "/market_chart/bitcoin/usd/plot-enriched",
+        params={"days": 10, "provider": "coingecko"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.content[:8] == b"\x89PNG\r\n\x1a\n"
+
+
+#OHLC candles
+def test_get_market_chart_candles(monkeypatch):
+    received = {}
+
+    async def fake_candles(*args, **kwargs):
+        received.update(kwargs)
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 2)], "open": [1.0], "high": [3.0], "low": [0.5], "close": [2.0]})
+
+    monkeypatch.setattr(api_market_chart, "compute_market_chart_candles_async", fake_candles)
+
+    response = client.get(
+        "/market_chart/candles",
+        params={"symbol": "bitcoin", "currency": "usd", "days": 30, "provider": "coingecko", "frequency": "four_hours"},
+    )
+    assert response.status_code == 200
+    assert response.json()["columns"] == ["timestamp", "open", "high", "low", "close"]
+    assert received["frequency"].value == "four_hours"
+
+def test_get_market_chart_candles_invalid_frequency():
+    response = client.get(
+        "/market_chart/candles",
+        params={"symbol": "bitcoin", "currency": "usd", "days": 30, "provider": "coingecko", "frequency": "minutely"},
+    )
+    assert response.status_code == 422
+
+#Multi-asset panel
+def test_get_market_chart_panel(monkeypatch):
+    received = {}
+
+    async def fake_panel(*args, **kwargs):
+        received.update(kwargs)
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 1)] * 2, "asset": ["bitcoin", "ethereum"], "price": [100.0, 10.0]})
+
+    monkeypatch.setattr(api_market_chart, "compute_panel_async", fake_panel)
+
+    response = client.get(
+        "/market_chart/panel",
+        params={"symbol": ["bitcoin", "ethereum"], "currency": "usd", "days": 30, "provider": "coingecko", "window_size": [7]},
+    )
+    assert response.status_code == 200
+    assert response.json()["columns"] == ["timestamp", "asset", "price"]
+    assert received["symbols"] == [Symbol.BTC, Symbol.ETH]
+    assert received["window_size"] == [7]
+
+def test_get_market_chart_panel_requires_symbols():
+    response = client.get("/market_chart/panel", params={"currency": "usd", "days": 30, "provider": "coingecko"})
+    assert response.status_code == 422
+
+#Rolling correlations
+def _fake_moments():
+    timestamps = np.arange(6, dtype=np.int64) * 3_600_000
+    btc = MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps, np.array([1.0, 2.0, 1.0, 2.0, 1.0, 2.0]))
+    eth = MarketChartData.from_arrays(Symbol.ETH, Currency.USD, timestamps, np.array([1.0, 1.0, 1.0, 1.0, 1.0, 1.0]))
+    return rolling_cross_moments([btc, eth], 3)
+
+def test_get_market_chart_correlation(monkeypatch):
+    received = {}
+
+    async def fake_correlations(*args, **kwargs):
+        received.update(kwargs)
+        return _fake_moments()
+
+    monkeypatch.setattr(api_market_chart, "compute_rolling_correlations_async", fake_correlations)
+
+    response = client.get(
+        "/market_chart/correlation",
+        params={"symbol": ["ethereum"], "currency": "usd", "days": 30, "provider": "coingecko", "window": 3},
+    )
+    assert response.status_code == 200
+    body = response.json()
+    assert body["assets"] == ["bitcoin", "ethereum"]
+    assert body["benchmark"] == "bitcoin"
+    assert len(body["timestamps"]) == len(body["correlation"]) == 3
+    assert body["correlation"][0][0] == [1.0, None] #flat ETH: no correlation
+    assert body["beta"][0] == [1.0, 0.0]
+    assert received["window"] == 3 and received["benchmark"] is Symbol.BTC
+
+def test_get_market_chart_correlation_plot(monkeypatch):
+    async def fake_correlations(*args, **kwargs):
+        return _fake_moments()
+
+    monkeypatch.setattr(api_market_chart, "compute_rolling_correlations_async", fake_correlations)
+
+    response = client.get(
+        "/market_chart/correlation/plot",
+        params={"symbol": ["ethereum"], "currency": "usd", "days": 30, "provider": "coingecko", "window": 3},
+    )
+    assert response.status_code == 200
+    assert response.content[:8] == b"\x89PNG\r\n\x1a\n"
+
+def test_get_market_chart_correlation_invalid_window():
+    response = client.get(
+        "/market_chart/correlation",
+        params={"symbol": ["ethereum"], "currency": "usd", "days": 30, "provider": "coingecko", "window": 1},
+    )
+    assert response.status_code == 422
+
+def test_get_market_chart_stats_exact_switch(monkeypatch):
+    received = {}
+    async def _fake_stats(symbol, currency, days, provider, **kwargs) -> dict:
+        received.update(kwargs)
+        return {
+            "count": 3, "min_price": 1.0, "max_price": 3.0, "mean_price": 2.0, "median_price": 2.0, "std_dev": 1.0,
+            "variance": 1.0, "first_price": 1.0, "last_price": 3.0, "percent_change": 200.0,
+            "price_quantiles": {"p1": 1.02, "p50": 2.0}, "return_quantiles": {"p1": float("nan")}, "exact": False,
+        }
+    monkeypatch.setattr(api_market_chart, "compute_market_chart_stats_async", _fake_stats)
+    response = client.get("/market_chart/stats", params={"symbol": "bitcoin", "currency": "usd", "days": 3000, "provider": "coingecko", "exact": "false"})
+    assert response.status_code == 200
+    assert received["exact"] is False
+    assert response.json()["price_quantiles"] == {"p1": 1.02, "p50": 2.0}
+    assert response.json()["return_quantiles"] == {"p1": None}
+    assert response.json()["exact"] is False
+
+
+#exact_currency reaches the fetch of every route, the use case computes from the fetched data
+@pytest.mark.parametrize("path, use_case, params, result", [
+    ("/market_chart/stats", "compute_market_chart_stats_async", {"symbol": "bitcoin"}, None),
+    ("/market_chart/dataframe", "compute_enriched_market_chart_async", {"symbol": "bitcoin"}, "frame"),
+    ("/market_chart/latest-enriched", "compute_latest_enriched_row_async", {"symbol": "bitcoin"}, "frame"),
+    ("/market_chart/candles", "compute_market_chart_candles_async", {"symbol": "bitcoin"}, "frame"),
+    ("/market_chart/panel", "compute_panel_async", {"symbol": ["bitcoin"]}, "frame"),
+    ("/market_chart/report", "compute_market_chart_report_async", {"symbol": "bitcoin"}, "report"),
+    ("/market_chart/bitcoin/eur/plot-enriched", "compute_enriched_market_chart_async", {}, "frame"),
+])
+def test_exact_currency_on_every_route(monkeypatch, path, use_case, params, result):
+    received = {}
+    frame = pd.DataFrame({"timestamp": [datetime(2023, 1, 1), datetime(2023, 1, 2)], "price": [100.0, 110.0], "pct_change": [np.nan, 10.0]})
+    stats = {
+        "count": 2, "min_price": 100.0, "max_price": 110.0, "mean_price": 105.0, "median_price": 105.0, "std_dev": 7.0,
+        "variance": 50.0, "first_price": 100.0, "last_price": 110.0, "percent_change": 10.0,
+        "price_quantiles": {}, "return_quantiles": {}, "exact": True,
+    }
+
+    fetched = []
+
+    async def fake_fetch(symbol, currency, days, provider, **kwargs):
+        received["fetch"] = kwargs["exact_currency"]
+        fetched.append(_fake_chart(symbol, currency))
+        return fetched[-1]
+
+    async def fake_fetch_many(symbols, currency, days, provider, **kwargs):
+        received["fetch"] = kwargs["exact_currency"]
+        fetched.append([_fake_chart(symbol, currency) for symbol in symbols])
+        return fetched[-1]
+
+    async def fake_stats_source(symbol, currency, days, provider, **kwargs):
+        received["fetch"] = kwargs["exact_currency"]
+        fetched.append(MarketChartStatsSource(last_timestamp=1_672_617_600_000, chart=_fake_chart(symbol, currency)))
+        return fetched[-1]
+
+    async def fake_use_case(*args, **kwargs):
+        received["use_case"] = kwargs["exact_currency"]
+        #computed from what the route fetched for the version, not fetched again
+        assert [kwargs.get("raw_chart", kwargs.get("charts", kwargs.get("source")))] == fetched
+        return {"frame": frame, "report": (frame, stats), None: stats}[result]
+
+    monkeypatch.setattr(api_market_chart, use_case, fake_use_case)
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_async", fake_fetch)
+    monkeypatch.setattr(api_market_chart, "fetch_market_charts_async", fake_fetch_many)
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_stats_source_async", fake_stats_source)
+    monkeypatch.setattr(api_market_chart, "_render_enriched_png", lambda *args: b"png")
+    query = {"currency": "eur", "days": 7, "provider": "coingecko", "exact_currency": "true", **params}
+    if "plot-enriched" in path:
+        query.pop("currency")
+    response = client.get(path, params=query)
+    assert response.status_code == 200, response.text
+    assert received == {"use_case": True, "fetch": True}
+
+
+#conditional requests: validators from the version of the fetched data, 304 before any computation / rendering
+def test_conditional_get_returns_304_before_computing(monkeypatch):
+    last_ms = {"value": 1_672_621_200_000}
+    calls = {"compute": 0, "render": 0}
+
+    async def fake_fetch(symbol, currency, days, provider, **kwargs):
+        return _fake_chart(symbol, currency, last_ms["value"])
+
+    async def fake_enriched(*args, **kwargs):
+        calls["compute"] += 1
+        return pd.DataFrame({"timestamp": [datetime(2023, 1, 1)], "price": [100.0]})
+
+    def fake_render(*args, **kwargs):
+        calls["render"] += 1
+        return b"png"
+
+    monkeypatch.setattr(api_market_chart, "fetch_market_chart_async", fake_fetch)
+    monkeypatch.setattr(api_market_chart, "compute_enriched_market_chart_async", fake_enriched)
+    monkeypatch.setattr(api_market_chart, "_render_enriched_png", fake_render)
+    params = {"symbol": "bitcoin", "currency": "usd", "days": 30, "provider": "coingecko", "window_size": 7}
+
+    first = client.get("/market_chart/dataframe", params=params)
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and etag.endswith('"')
+    assert first.headers["last-modified"] == "Mon, 02 Jan 2023 01:00:00 GMT" #last point
+    assert first.headers["cache-control"] == "max-age=3600"
+    assert calls["compute"] == 1
+
+    #same request, same data: 304 without computing
+    response = client.get("/market_chart/dataframe", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    response = client.get("/market_chart/dataframe", params=params, headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+    response = client.get("/market_chart/dataframe", params=params, headers={"If-Modified-Since": "Mon, 02 Jan 2023 01:00:00 GMT"})
+    assert response.status_code == 304
+    assert calls["compute"] == 1
+
+    #other parameters or another format: another representation
+    assert client.get("/market_chart/dataframe", params={**params, "window_size": 30}).headers["etag"] != etag
+    assert client.get("/market_chart/dataframe", params={**params, "format": "csv"}).headers["etag"] != etag
+    assert client.get("/market_chart/dataframe", params=params, headers={"If-Modified-Since": "Mon, 02 Jan 2023 00:59:59 GMT"}).status_code == 200
+
+    #a new point: new ETag, full response
+    last_ms["value"] = 1_672_624_800_000
+    response = client.get("/market_chart/dataframe", params=params, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+
+    #the PNG is not rendered again either
+    plot = client.get("/market_chart/bitcoin/usd/plot-enriched", params={"days": 30, "provider": "coingecko"})
+    assert plot.status_code == 200 and calls["render"] == 1
+    response = client.get("/market_chart/bitcoin/usd/plot-enriched", params={"days": 30, "provider": "coingecko"}, headers={"If-None-Match": plot.headers["etag"]})
+    assert response.status_code == 304 and calls["render"] == 1
+
+
+#report: stats + dataframe + PNG from one use case call
+def test_get_market_chart_report(monkeypatch):
+    import base64
+    calls = []
+
+    async def fake_report(*args, **kwargs):
+        calls.append(kwargs)
+        df = pd.DataFrame({"timestamp": [datetime(2023, 1, 1), datetime(2023, 1, 2)], "price": [100.0, 110.0], "pct_change": [np.nan, 10.0]})
+        stats = {"count": 2, "min_price": 100.0, "max_price": 110.0, "mean_price": 105.0, "median_price": 105.0, "std_dev": 7.0,
+                 "variance": 50.0, "first_price": 100.0, "last_price": 110.0, "percent_change": 10.0, "skewness": np.nan}
+        return df, stats
+
+    monkeypatch.setattr(api_market_chart, "compute_market_chart_report_async", fake_report)
+    monkeypatch.setattr(api_market_chart, "_render_enriched_png", lambda *args, **kwargs: b"\x89PNG fake")
+
+    response = client.get(
+        "/market_chart/report",
+        params=[("symbol", "bitcoin"), ("currency", "usd"), ("days", 2), ("provider", "coingecko"), ("window_size", 7), ("frequency", "daily")],
+    )
+    assert response.status_code == 200
+    assert len(calls) == 1
+    assert calls[0]["window_size"] == [7]
+    assert calls[0]["frequency"] is ResampleFrequency.DAILY
+    data = response.json()
+    assert data["stats"]["mean_price"] == 105.0
+    assert data["stats"]["skewness"] is None
+    assert data["dataframe"]["columns"] == ["timestamp", "price", "pct_change"]
+    assert data["dataframe"]["rows"][1][1] == 110.0
+    assert base64.b64decode(data["image_png_base64"]) == b"\x89PNG fake"
+    assert "etag" in response.headers
+
+    async def fake_error(*args, **kwargs):
+        raise domain_errors.BusinessComputationError("Computation failed")
+
+    monkeypatch.setattr(api_market_chart, "compute_market_chart_report_async", fake_error)
+    response = client.get("/market_chart/report", params={"symbol": "bitcoin", "currency": "usd", "days": 2, "provider": "coingecko"})
+    assert response.status_code == 500
+
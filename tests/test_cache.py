@@ -0,0 +1,223 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint, Granularity
+from app.infrastructure import coingecko
+from app.infrastructure.cache import MarketChartCache
+from app.api.routes.admin import router as admin_router
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def _chart(n_points: int = 3, sym: Symbol = Symbol.BTC) -> MarketChartData:
+    base = datetime(2023, 1, 1)
+    return MarketChartData(sym, Currency.USD, [PricePoint(base + timedelta(hours=i), float(i)) for i in range(n_points)])
+
+
+# 1 ) MarketChartCache
+
+def test_cache_hit_miss_and_ttl():
+    clock = FakeClock()
+    cache = MarketChartCache(clock=clock)
+    chart = _chart()
+    assert cache.get('k') is None
+    cache.put('k', chart, ttl_seconds=300)
+    assert cache.get('k') is chart
+    clock.now = 299
+    assert cache.get('k') is chart
+    clock.now = 300
+    assert cache.get('k') is None #expired
+    stats = cache.stats()
+    assert stats['hits'] == 2
+    assert stats['misses'] == 2
+    assert stats['expirations'] == 1
+    assert stats['entries'] == 0
+    assert stats['bytes'] == 0
+
+def test_cache_lru_eviction_by_entries():
+    cache = MarketChartCache(max_entries=2)
+    cache.put('a', _chart(), 60)
+    cache.put('b', _chart(), 60)
+    cache.get('a') #'a' becomes most recently used
+    cache.put('c', _chart(), 60)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+def test_cache_eviction_by_bytes():
+    cache = MarketChartCache(max_entries=100, max_bytes=250, sizeof=lambda chart: 100)
+    cache.put('a', _chart(), 60)
+    cache.put('b', _chart(), 60)
+    cache.put('c', _chart(), 60)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] == 200
+    assert cache.get('a') is None
+    #a chart bigger than the whole cache is not stored
+    MarketChartCache(max_bytes=10, sizeof=lambda chart: 100).put('x', _chart(), 60)
+
+def test_cache_clear_and_disabled():
+    cache = MarketChartCache()
+    cache.put('a', _chart(), 60)
+    assert cache.clear() == 1
+    assert cache.get('a') is None
+    disabled = MarketChartCache(max_entries=0)
+    disabled.put('a', _chart(), 60)
+    assert disabled.get('a') is None
+
+
+# 2 ) Wired into the CoinGecko adapter
+
+def test_granularity_coingecko():
+    assert coingecko.infra_get_granularity_coingecko(1) == Granularity.FIVE_MINUTES
+    assert coingecko.infra_get_granularity_coingecko(2) == Granularity.HOURLY
+    assert coingecko.infra_get_granularity_coingecko(90) == Granularity.HOURLY
+    assert coingecko.infra_get_granularity_coingecko(91) == Granularity.DAILY
+
+def test_parsed_market_chart_served_from_cache(monkeypatch):
+    clock = FakeClock()
+    calls = []
+    def fake_fetch(sym, curr, days):
+        calls.append(days)
+        return _chart(sym=sym)
+
+    monkeypatch.setattr(coingecko, "_fetch_parsed_market_chart_coingecko", fake_fetch)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache(clock=clock))
+
+    first = coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    second = coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    assert first is second
+    assert calls == [1]
+
+    #TTL follows the granularity: 1 day -> 5 minutes
+    clock.now = 301
+    coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    assert calls == [1, 1]
+
+    #30 days -> hourly points -> 1 hour TTL
+    coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    clock.now += 3599
+    coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    assert calls == [1, 1, 90] #30 days is served from the 90-day hourly band series
+
+def test_range_request_slices_the_cached_window(monkeypatch):
+    calls = []
+    def fake_fetch(sym, curr, days):
+        calls.append(days)
+        return _chart(n_points=10)
+
+    monkeypatch.setattr(coingecko, "_fetch_parsed_market_chart_coingecko", fake_fetch)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache(clock=FakeClock()))
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", None)
+
+    full = coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+    sliced = coingecko.infra_get_parsed_market_chart_range_coingecko(Symbol.BTC, Currency.USD, 1, full.timestamps[2], full.timestamps[4])
+    assert calls == [1]
+    assert list(sliced.prices) == [2.0, 3.0, 4.0]
+    assert sliced.prices.base is not None #view of the cached arrays
+
+def test_parsed_market_chart_async_uses_cache(monkeypatch):
+    calls = []
+    async def fake_fetch(sym, curr, days):
+        calls.append(days)
+        return _chart(sym=sym)
+
+    monkeypatch.setattr(coingecko, "_fetch_parsed_market_chart_coingecko_async", fake_fetch)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache())
+
+    async def main():
+        first = await coingecko.infra_get_parsed_market_chart_coingecko_async(Symbol.ETH, Currency.USD, 7)
+        second = await coingecko.infra_get_parsed_market_chart_coingecko_async(Symbol.ETH, Currency.USD, 7)
+        return first, second
+
+    first, second = asyncio.run(main())
+    assert first is second
+    assert calls == [90]
+
+
+# 2b) Granularity bands: one cached series per band, every lookback of the band is a slice of it
+
+def _hourly_chart(days: int, end: datetime = datetime(2024, 6, 1)) -> MarketChartData:
+    n = days * 24 + 1
+    return MarketChartData(Symbol.BTC, Currency.USD, [PricePoint(end - timedelta(hours=n - 1 - i), float(i)) for i in range(n)])
+
+def test_lookbacks_of_one_band_share_one_fetch(monkeypatch):
+    calls = []
+    def fake_fetch(sym, curr, days):
+        calls.append(days)
+        return _hourly_chart(days)
+
+    monkeypatch.setattr(coingecko, "_fetch_parsed_market_chart_coingecko", fake_fetch)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache(clock=FakeClock()))
+    monkeypatch.setattr(coingecko, "_BAND_STATS", dict.fromkeys(coingecko._BAND_STATS, 0))
+
+    charts = {days: coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, days) for days in (7, 14, 30, 90)}
+    assert calls == [90]
+    for days, chart in charts.items():
+        #same points as a direct 'days' request: the last days * 24 hours (+ the first point of the window)
+        assert len(chart) == days * 24 + 1
+        assert chart.timestamps[-1] - chart.timestamps[0] == days * 24 * 3_600_000
+    assert np.shares_memory(charts[7].prices, charts[90].prices) #views of the band series
+
+    stats = coingecko.infra_get_market_chart_band_stats()
+    assert stats["requests"] == 4
+    assert stats["sliced_requests"] == 3
+    assert stats["slice_hits"] == 2 #7 days fetched the band, 14 and 30 were slices of the cached series
+    assert stats["band_fetches"] == 1
+    assert stats["slice_hit_ratio"] == 2 / 3
+
+    #daily band: 365 * k days
+    assert [coingecko.infra_get_band_days_coingecko(d) for d in (1, 2, 90, 91, 365, 366, 1000)] == [1, 90, 90, 365, 365, 730, 1095]
+
+def test_bands_can_be_disabled(monkeypatch):
+    calls = []
+    def fake_fetch(sym, curr, days):
+        calls.append(days)
+        return _hourly_chart(days)
+
+    monkeypatch.setattr(coingecko, "_fetch_parsed_market_chart_coingecko", fake_fetch)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache(clock=FakeClock()))
+    monkeypatch.setattr(coingecko, "MARKET_CHART_BANDS", False)
+    for days in (7, 30):
+        coingecko.infra_get_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, days)
+    assert calls == [7, 30]
+
+
+# 3 ) Admin endpoints
+
+def test_admin_cache_endpoints(monkeypatch):
+    cache = MarketChartCache()
+    cache.put((Provider.COINGECKO, Symbol.BTC, Currency.USD, 30), _chart(), 3600)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", cache)
+
+    app = FastAPI()
+    app.include_router(admin_router)
+    client = TestClient(app)
+
+    response = client.get("/admin/cache")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["entries"] == 1
+    assert data["items"][0]["key"] == ["coingecko", "bitcoin", "usd", 30]
+    assert data["items"][0]["points"] == 3
+
+    response = client.delete("/admin/cache")
+    assert response.json() == {"flushed": 1}
+    assert client.get("/admin/cache").json()["entries"] == 0
+
+def test_admin_band_endpoint(monkeypatch):
+    monkeypatch.setattr(coingecko, "_BAND_STATS", {"requests": 3, "sliced_requests": 2, "slice_hits": 1, "band_fetches": 2})
+    app = FastAPI()
+    app.include_router(admin_router)
+    data = TestClient(app).get("/admin/bands").json()
+    assert data["slice_hits"] == 1
+    assert data["slice_hit_ratio"] == 0.5
@@ -0,0 +1,150 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain import services
+from app.domain.entities import Symbol, Currency, Provider, CandleFrequency, MarketChartData
+from app.services.candles import CandleEngine, CandleEngineRegistry, Candles, bucket_starts, compute_candles
+
+HOUR_MS = 3_600_000
+T0 = 1_704_067_200_000 #2024-01-01 00:00 UTC (a Monday)
+
+#pandas rule of every frequency, with buckets labelled by their (left) start
+PANDAS_RULES = {
+    CandleFrequency.HOURLY: 'h',
+    CandleFrequency.FOUR_HOURS: '4h',
+    CandleFrequency.DAILY: 'D',
+    CandleFrequency.WEEKLY: 'W-MON',
+    CandleFrequency.MONTHLY: 'MS',
+    CandleFrequency.YEARLY: 'YS',
+}
+
+
+def random_series(rng, n, step_ms=HOUR_MS // 12):
+    #5-minute points with random gaps, starting in the middle of a week
+    steps = rng.choice([1, 1, 1, 2, 7, 300], n) * step_ms
+    timestamps = T0 + 3 * 24 * HOUR_MS + 17 * step_ms + np.cumsum(steps)
+    prices = 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    volumes = rng.random(n) * 1e9
+    return timestamps.astype(np.int64), prices, volumes
+
+def pandas_candles(timestamps, prices, volumes, frequency):
+    series = pd.Series(prices, index=pd.to_datetime(timestamps, unit='ms'))
+    rule = PANDAS_RULES[frequency]
+    resampled = series.resample(rule, label='left', closed='left')
+    expected = resampled.ohlc().dropna()
+    expected['volume'] = pd.Series(volumes, index=series.index).resample(rule, label='left', closed='left').last().loc[expected.index]
+    return expected
+
+def assert_candles_equal(candles: Candles, expected: pd.DataFrame):
+    assert list(candles.start.astype('datetime64[ms]')) == list(expected.index.values.astype('datetime64[ms]'))
+    for column in ('open', 'high', 'low', 'close', 'volume'):
+        assert np.array_equal(getattr(candles, column), expected[column].to_numpy()), column
+
+
+# 1 ) Cascade vs pandas resample().ohlc()
+
+@pytest.mark.parametrize('seed', range(5))
+def test_compute_candles_match_pandas(seed):
+    rng = np.random.default_rng(seed)
+    timestamps, prices, volumes = random_series(rng, 20_000)
+    levels = compute_candles(timestamps, prices, volumes)
+    for frequency in CandleFrequency:
+        assert_candles_equal(levels[frequency], pandas_candles(timestamps, prices, volumes, frequency))
+
+def test_bucket_starts():
+    t = np.array([T0 + 5 * 24 * HOUR_MS + 13 * HOUR_MS + 123]) #Saturday 2024-01-06 13:00:00.123
+    assert bucket_starts(t, CandleFrequency.HOURLY)[0] == T0 + 5 * 24 * HOUR_MS + 13 * HOUR_MS
+    assert bucket_starts(t, CandleFrequency.FOUR_HOURS)[0] == T0 + 5 * 24 * HOUR_MS + 12 * HOUR_MS
+    assert bucket_starts(t, CandleFrequency.WEEKLY)[0] == T0
+    assert bucket_starts(t, CandleFrequency.MONTHLY)[0] == T0
+    assert bucket_starts(t, CandleFrequency.YEARLY)[0] == T0
+
+
+# 2 ) Incremental engine: closed candles reused, same result as a full build
+
+def test_engine_incremental_updates_match_full_build():
+    rng = np.random.default_rng(11)
+    timestamps, prices, volumes = random_series(rng, 30_000)
+    engine = CandleEngine()
+    for end in (10_000, 10_001, 10_500, 22_000, 30_000):
+        #the provider window slides: each fetch drops old points and appends new ones
+        begin = max(0, end - 15_000)
+        engine.update(timestamps[begin:end], prices[begin:end], volumes[begin:end])
+    assert engine.rebuilds == 1
+    assert engine.incremental_updates == 4
+
+    full = compute_candles(timestamps, prices, volumes)
+    for frequency in CandleFrequency:
+        cached = engine.candles(frequency)
+        assert np.array_equal(cached.start, full[frequency].start)
+        for column in ('open', 'high', 'low', 'close', 'volume'):
+            assert np.array_equal(getattr(cached, column), getattr(full[frequency], column)), (frequency, column)
+
+def test_engine_no_new_points_and_gap():
+    timestamps = T0 + np.arange(100, dtype=np.int64) * HOUR_MS
+    prices = np.arange(100, dtype=float)
+    engine = CandleEngine()
+    engine.update(timestamps, prices)
+    engine.update(timestamps, prices) #nothing new
+    assert (engine.rebuilds, engine.incremental_updates) == (1, 0)
+    #next fetch starts after the cached open bucket -> rebuild
+    engine.update(timestamps + 1000 * HOUR_MS, prices)
+    assert engine.rebuilds == 2
+    assert engine.candles(CandleFrequency.HOURLY).start[0] == T0 + 1000 * HOUR_MS
+    assert engine.candles(CandleFrequency.DAILY).volume is None
+
+def test_engine_candles_from_start():
+    timestamps = T0 + np.arange(24 * 10, dtype=np.int64) * HOUR_MS
+    engine = CandleEngine()
+    engine.update(timestamps, np.ones(len(timestamps)))
+    daily = engine.candles(CandleFrequency.DAILY, start_ms=T0 + 3 * 24 * HOUR_MS + 5 * HOUR_MS)
+    assert len(daily) == 7
+    assert daily.start[0] == T0 + 3 * 24 * HOUR_MS
+
+def test_engine_shared_by_windows_of_one_series():
+    #one engine per granularity: a short window gets the same candles as an engine of its own, a longer one rebuilds
+    rng = np.random.default_rng(5)
+    timestamps, prices, volumes = random_series(rng, 5_000)
+    engine = CandleEngine()
+    for begin in (2_000, 3_333, 0, 4_321):
+        engine.update(timestamps[begin:], prices[begin:], volumes[begin:])
+        own = compute_candles(timestamps[begin:], prices[begin:], volumes[begin:])
+        for frequency in CandleFrequency:
+            window = engine.window(frequency, timestamps[begin:], prices[begin:], volumes[begin:])
+            assert np.array_equal(window.start, own[frequency].start)
+            for column in ('open', 'high', 'low', 'close', 'volume'):
+                assert np.array_equal(getattr(window, column), getattr(own[frequency], column)), (begin, frequency, column)
+    assert engine.rebuilds == 2 #first call + the longer window
+
+def test_engine_registry_is_bounded():
+    registry = CandleEngineRegistry(max_engines=2)
+    first = registry.get('a')
+    registry.get('b')
+    assert registry.get('a') is first #most recently used
+    registry.get('c') #drops 'b'
+    assert len(registry) == 2
+    assert registry.get('a') is first
+
+
+# 3 ) Domain use case
+
+def test_compute_market_chart_candles(monkeypatch):
+    services.CANDLE_ENGINES.reset()
+    timestamps = T0 + np.arange(48, dtype=np.int64) * HOUR_MS
+    prices = np.arange(48, dtype=float)
+    monkeypatch.setattr(services, 'fetch_market_chart', lambda *args, **kwargs: MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps, prices))
+    df = services.compute_market_chart_candles(Symbol.BTC, Currency.USD, 2, Provider.COINGECKO, CandleFrequency.DAILY)
+    assert list(df.columns) == ['timestamp', 'open', 'high', 'low', 'close']
+    assert df['open'].tolist() == [0.0, 24.0]
+    assert df['high'].tolist() == [23.0, 47.0]
+    assert df['timestamp'].iloc[1] == pd.Timestamp('2024-01-02')
+
+    #another lookback of the same granularity shares the engine, volumes become volume_24h
+    chart = MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps[30:], prices[30:], total_volumes=prices[30:] * 10)
+    monkeypatch.setattr(services, 'fetch_market_chart', lambda *args, **kwargs: chart)
+    df = services.compute_market_chart_candles(Symbol.BTC, Currency.USD, 1 + 1, Provider.COINGECKO, CandleFrequency.DAILY)
+    assert df['open'].tolist() == [30.0] and df['volume_24h'].tolist() == [470.0]
+    services.compute_market_chart_candles(Symbol.BTC, Currency.USD, 60, Provider.COINGECKO, CandleFrequency.DAILY)
+    assert len(services.CANDLE_ENGINES) == 1
+    services.CANDLE_ENGINES.reset()
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain import services
+from app.domain import errors as errors_domain
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.services.correlation import rolling_covariances, covariances_to_correlations, rolling_cross_moments
+
+HOUR_MS = 3_600_000
+T0 = 1_704_067_200_000
+
+
+def chart(symbol, timestamps, prices):
+    return MarketChartData.from_arrays(symbol, Currency.USD, np.asarray(timestamps, dtype=np.int64), np.asarray(prices, dtype=float))
+
+def pandas_rolling(values, window, method):
+    n, assets = values.shape
+    return getattr(pd.DataFrame(values).rolling(window), method)().to_numpy().reshape(n, assets, assets)[window - 1:]
+
+
+# 1 ) Prefix sums of cross-products vs pandas rolling().cov() / rolling().corr()
+
+@pytest.mark.parametrize('window', [3, 24, 500])
+def test_rolling_matrices_match_pandas(window):
+    rng = np.random.default_rng(window)
+    common = rng.normal(0, 0.01, (3000, 1))
+    values = 0.5 * common + rng.normal(0, 0.01, (3000, 5)) #correlated assets
+    covariance = rolling_covariances(values, window)
+    assert covariance.shape == (3000 - window + 1, 5, 5)
+    np.testing.assert_allclose(covariance, pandas_rolling(values, window, 'cov'), rtol=1e-8, atol=1e-16)
+    np.testing.assert_allclose(covariances_to_correlations(covariance), pandas_rolling(values, window, 'corr'), rtol=1e-8, atol=1e-10)
+
+def test_two_point_windows_are_perfectly_correlated():
+    #exact answer is +-1 (pandas itself drifts by ~1e-6 here)
+    values = np.random.default_rng(2).normal(0, 0.01, (1000, 4))
+    correlation = covariances_to_correlations(rolling_covariances(values, 2))
+    diffs = np.diff(values, axis=0)
+    np.testing.assert_allclose(correlation, np.sign(diffs[:, :, None] * diffs[:, None, :]), atol=1e-5)
+
+def test_flat_windows_have_no_correlation():
+    rng = np.random.default_rng(1)
+    values = rng.normal(0, 0.01, (400, 3))
+    values[100:200, 1] = 0.0 #asset without variance for a while
+    values[250:350, 2] = 0.002
+    correlation = covariances_to_correlations(rolling_covariances(values, 48))
+    expected = pandas_rolling(values, 48, 'corr')
+    flat = np.zeros(len(correlation), dtype=bool)
+    flat[100:200 - 47] = True
+    assert np.isnan(correlation[flat][:, 1]).all() and np.isnan(correlation[flat][:, :, 1]).all()
+    assert (correlation[~flat][:, 0, 0] == 1.0).all()
+    #pandas gives inf / garbage on the constant non-zero window, compare where it is finite
+    finite = np.isfinite(expected)
+    np.testing.assert_allclose(correlation[finite], expected[finite], atol=1e-9)
+
+def test_rolling_covariances_errors():
+    values = np.zeros((10, 2))
+    with pytest.raises(ValueError):
+        rolling_covariances(values, 1)
+    with pytest.raises(ValueError):
+        rolling_covariances(values, 11)
+
+
+# 2 ) Panel of charts: returns, window timestamps and betas
+
+def test_rolling_cross_moments_and_beta():
+    rng = np.random.default_rng(7)
+    n = 200
+    timestamps = T0 + np.arange(n) * HOUR_MS
+    btc_returns = rng.normal(0, 0.01, n - 1)
+    btc = chart(Symbol.BTC, timestamps, 100 * np.cumprod(np.concatenate(([1.0], 1 + btc_returns))))
+    #ETH moves twice as much as BTC -> beta 2, correlation 1
+    eth = chart(Symbol.ETH, timestamps, 10 * np.cumprod(np.concatenate(([1.0], 1 + 2 * btc_returns))))
+
+    moments = rolling_cross_moments([btc, eth], 24)
+    assert moments.labels == ['bitcoin', 'ethereum']
+    assert moments.timestamps[0] == timestamps[24] and moments.timestamps[-1] == timestamps[-1]
+    assert moments.covariance.shape == (n - 24, 2, 2)
+    np.testing.assert_allclose(moments.beta('bitcoin'), np.tile([1.0, 2.0], (n - 24, 1)))
+    np.testing.assert_allclose(moments.correlation, 1.0)
+
+
+# 3 ) Domain use case
+
+def test_compute_rolling_correlations_adds_benchmark(monkeypatch):
+    fetched = []
+    rng = np.random.default_rng(0)
+    def fake_fetch(symbol, currency, days, provider, start=None, end=None, exact_currency=False):
+        fetched.append(symbol)
+        return chart(symbol, T0 + np.arange(50) * HOUR_MS, 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 50))))
+    monkeypatch.setattr(services, 'fetch_market_chart', fake_fetch)
+
+    moments = services.compute_rolling_correlations([Symbol.ETH, Symbol.XRP], Currency.USD, 2, Provider.COINGECKO, window=10)
+    assert fetched == [Symbol.ETH, Symbol.XRP, Symbol.BTC]
+    assert moments.labels == ['ethereum', 'ripple', 'bitcoin']
+    np.testing.assert_allclose(moments.beta('bitcoin')[:, 2], 1.0)
+
+    with pytest.raises(errors_domain.BusinessComputationError):
+        services.compute_rolling_correlations([Symbol.ETH], Currency.USD, 2, Provider.COINGECKO, window=100)
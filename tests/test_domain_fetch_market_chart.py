@@ -1,8 +1,10 @@
+import asyncio
 import pytest
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timedelta, timezone
 
 from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint
-from app.domain.services import fetch_market_chart
+from app.domain.services import fetch_market_chart, fetch_market_chart_async, fetch_market_charts, fetch_market_charts_async, get_market_chart_version
 from app.domain import errors as errors_domain
 from app.infrastructure import errors as errors_infra
 
@@ -14,6 +16,8 @@ Tests:
 4. Malformed data from infrastructure raises BusinessMalformedDataError
 5. Infrastructure errors are mapped to BusinessProviderGeneralError
 6. Successful data fetch returns MarketChartData with correct attributes
+7. The async version validates and maps errors the same way
+8. Data version (conditional requests): last timestamp of every fetched series, max age = spacing of the points
 '''
 
 def test_fetch_market_chart_invalid_days():
@@ -91,4 +95,72 @@ def test_fetch_market_chart_success(monkeypatch):
     assert data.points[0].price == 30000.0
     assert data.points[1].timestamp == datetime(2023, 1, 2, 0, 0)
     assert data.points[2].price == 32000.0
-           
\ No newline at end of file
+
+def test_fetch_market_chart_range_mixes_naive_and_aware_bounds(monkeypatch):
+    ranges = []
+    def mock_range(sym, curr, days, start_ms, end_ms):
+        ranges.append((start_ms, end_ms))
+        return MarketChartData(sym, curr, [PricePoint(datetime(2023, 1, 1), 30000.0)])
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart_range_coingecko', mock_range)
+
+    #a naive datetime is UTC
+    fetch_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO, datetime(2020, 1, 1, tzinfo=timezone.utc), datetime(2030, 1, 1))
+    assert ranges == [(1_577_836_800_000, 1_893_456_000_000)]
+    with pytest.raises(errors_domain.BusinessValidationError):
+        fetch_market_chart(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO, datetime(2020, 1, 1, 2, tzinfo=timezone(timedelta(hours=-2))), datetime(2020, 1, 1, 3))
+
+def test_fetch_market_chart_async(monkeypatch):
+    async def mock_infra_get_parsed_market_chart_coingecko_async(sym, curr, days):
+        return MarketChartData(sym, curr, [PricePoint(datetime(2023, 1, 1), 30000.0)])
+
+    monkeypatch.setattr(
+        'app.domain.services.infra_get_parsed_market_chart_coingecko_async', 
+        mock_infra_get_parsed_market_chart_coingecko_async
+    )
+    data = asyncio.run(fetch_market_chart_async(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO))
+    assert data.points[0].price == 30000.0
+
+    with pytest.raises(errors_domain.BusinessValidationError):
+        asyncio.run(fetch_market_chart_async(Symbol.BTC, Currency.USD, 0, Provider.COINGECKO))
+
+    async def mock_timeout(sym, curr, days):
+        raise errors_infra.InfrastructureExternalApiTimeout('Timeout error')
+
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart_coingecko_async', mock_timeout)
+    with pytest.raises(errors_domain.BusinessProviderGeneralError):
+        asyncio.run(fetch_market_chart_async(Symbol.BTC, Currency.USD, 10, Provider.COINGECKO))
+
+def test_get_market_chart_version(monkeypatch):
+    last = {Symbol.BTC: 1_672_617_600_000, Symbol.ETH: 1_672_704_000_000}
+    fetched = []
+    def mock_infra(sym, curr, days):
+        fetched.append(sym)
+        if sym not in last:
+            return MarketChartData(sym, curr, [])
+        return MarketChartData.from_arrays(sym, curr, np.array([last[sym] - 3_600_000, last[sym]]), np.array([1.0, 2.0]))
+    async def mock_infra_async(sym, curr, days):
+        return mock_infra(sym, curr, days)
+
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart_coingecko', mock_infra)
+    monkeypatch.setattr('app.domain.services.infra_get_parsed_market_chart_coingecko_async', mock_infra_async)
+
+    #one fetch per distinct series, the version is read from the fetched charts
+    charts = fetch_market_charts([Symbol.BTC, Symbol.ETH, Symbol.BTC], Currency.USD, 30, Provider.COINGECKO)
+    assert fetched == [Symbol.BTC, Symbol.ETH]
+    version = get_market_chart_version(charts, 30)
+    assert version.last_timestamps == (1_672_617_600_000, 1_672_704_000_000)
+    assert version.last_modified_ms == 1_672_704_000_000
+    assert version.max_age == 3600 #hourly points
+
+    charts = asyncio.run(fetch_market_charts_async([Symbol.BTC], Currency.USD, 1, Provider.COINGECKO))
+    assert get_market_chart_version(charts, 1).max_age == 300
+    assert get_market_chart_version(charts, 365).max_age == 86400
+
+    with pytest.raises(errors_domain.BusinessValidationError):
+        fetch_market_charts([Symbol.BTC], Currency.USD, 0, Provider.COINGECKO)
+    with pytest.raises(errors_domain.BusinessValidationError):
+        fetch_market_charts([Symbol.BTC], Currency.USD, 30, Provider.COINGECKO, datetime(2023, 1, 3), datetime(2023, 1, 2))
+    with pytest.raises(errors_domain.BusinessValidationError):
+        fetch_market_charts([], Currency.USD, 30, Provider.COINGECKO)
+    with pytest.raises(errors_domain.BusinessNoDataError):
+        fetch_market_charts([Symbol.XRP], Currency.USD, 30, Provider.COINGECKO)
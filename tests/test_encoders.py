@@ -0,0 +1,84 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from app.api.encoders import iter_ndjson, iter_csv, iter_arrow, encode_parquet, negotiate_format, encode_market_chart_json
+from app.api.schemas import DataFrameFormat, MarketChartShape, MarketChartResponse, MarketChartColumnsResponse
+from app.domain.entities import Symbol, Currency, MarketChartData
+
+T0 = 1_704_067_200_000
+
+
+def frame(n):
+    return pd.DataFrame({
+        'timestamp': (T0 + np.arange(n, dtype=np.int64) * 3_600_000).view('datetime64[ms]'),
+        'price': np.arange(n) / 3,
+        'rolling_mean_3': np.where(np.arange(n) < 2, np.nan, np.arange(n)),
+    })
+
+
+def test_ndjson_batches_cover_every_row_once():
+    df = frame(12)
+    chunks = list(iter_ndjson(df, batch_rows=5))
+    assert len(chunks) == 3 #5 + 5 + 2 rows
+    rows = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+    assert len(rows) == 12
+    assert rows[0] == {'timestamp': '2024-01-01T00:00:00.000', 'price': 0.0, 'rolling_mean_3': None}
+    assert rows[-1]['timestamp'] == '2024-01-01T11:00:00.000'
+    np.testing.assert_allclose([row['price'] for row in rows], df['price'], rtol=1e-14)
+
+def test_csv_header_once_and_roundtrip():
+    df = frame(12)
+    chunks = list(iter_csv(df, batch_rows=5))
+    assert len(chunks) == 3
+    assert chunks[0].startswith(b'"timestamp","price","rolling_mean_3"\n2024-01-01 00:00:00.000,0,\n')
+    assert b'timestamp' not in chunks[1]
+    parsed = pd.read_csv(io.BytesIO(b''.join(chunks)), parse_dates=['timestamp'])
+    assert list(parsed['timestamp'].astype('datetime64[ms]')) == list(df['timestamp'])
+    pd.testing.assert_series_equal(parsed['price'], df['price'])
+    assert parsed['rolling_mean_3'].isna().sum() == 2
+
+def test_empty_frame():
+    df = frame(0)
+    assert b''.join(iter_ndjson(df)) == b''
+    assert b''.join(iter_csv(df)) == b'"timestamp","price","rolling_mean_3"\n'
+
+def test_arrow_stream_roundtrip():
+    df = frame(12)
+    chunks = list(iter_arrow(df, batch_rows=5))
+    assert len(chunks) == 5 #schema + 3 record batches + end of stream
+    decoded = pa.ipc.open_stream(b''.join(chunks)).read_pandas()
+    pd.testing.assert_frame_equal(decoded, df) #float64 values and ms timestamps as they are
+
+def test_parquet_roundtrip():
+    df = frame(12)
+    decoded = pd.read_parquet(io.BytesIO(encode_parquet(df)))
+    pd.testing.assert_frame_equal(decoded, df)
+
+def test_negotiate_format():
+    assert negotiate_format(None, None) is DataFrameFormat.JSON
+    assert negotiate_format(None, 'text/html,*/*;q=0.8') is DataFrameFormat.JSON
+    assert negotiate_format(None, 'application/vnd.apache.arrow.stream') is DataFrameFormat.ARROW
+    assert negotiate_format(None, 'application/x-parquet;q=0.9, text/csv') is DataFrameFormat.PARQUET
+    assert negotiate_format(None, 'application/json, text/csv') is DataFrameFormat.JSON
+    #the query parameter wins
+    assert negotiate_format(DataFrameFormat.CSV, 'application/vnd.apache.arrow.stream') is DataFrameFormat.CSV
+
+
+def test_market_chart_json_matches_response_models():
+    timestamps = T0 + np.arange(4, dtype=np.int64) * 3_600_000 + np.array([0, 12, 345, 0])
+    chart = MarketChartData.from_arrays(Symbol.ETH, Currency.EUR, timestamps, np.array([1 / 3, 2.5, 1e-9, 40_000.125]))
+
+    body = encode_market_chart_json(chart)
+    assert MarketChartResponse.model_validate_json(body) == MarketChartResponse.from_domain(chart)
+
+    columns = MarketChartColumnsResponse.model_validate_json(encode_market_chart_json(chart, MarketChartShape.COLUMNS))
+    assert columns.timestamps == [point.timestamp for point in MarketChartResponse.from_domain(chart).points]
+    assert columns.prices == chart.prices.tolist() #shortest round-trip floats, nothing lost
+
+def test_market_chart_json_missing_prices_are_null():
+    chart = MarketChartData.from_arrays(Symbol.BTC, Currency.USD, np.array([T0, T0 + 1000]), np.array([1.0, np.nan]))
+    assert json.loads(encode_market_chart_json(chart, MarketChartShape.COLUMNS))['prices'] == [1.0, None]
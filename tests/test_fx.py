@@ -0,0 +1,121 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from app.domain import services
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.services.fx import asof_values, fx_rate_series, cross_market_chart
+
+HOUR_MS = 3_600_000
+T0 = 1_704_067_200_000
+
+
+def chart(symbol, currency, timestamps, prices):
+    return MarketChartData.from_arrays(symbol, currency, np.asarray(timestamps, dtype=np.int64), np.asarray(prices, dtype=float))
+
+
+# 1 ) Vectorized as-of alignment and cross rates
+
+def test_asof_values():
+    source_ts = np.array([10, 20, 30])
+    values = np.array([1.0, 2.0, 3.0])
+    #before the first point -> first value, exact match -> that point, between -> previous point, after -> last
+    assert list(asof_values(np.array([5, 10, 15, 20, 29, 31]), source_ts, values)) == [1.0, 1.0, 1.0, 2.0, 2.0, 3.0]
+    with pytest.raises(ValueError):
+        asof_values(np.array([1]), np.array([], dtype=np.int64), np.array([]))
+
+def test_cross_market_chart():
+    ts = T0 + np.arange(5) * HOUR_MS
+    btc_usd = chart(Symbol.BTC, Currency.USD, ts, [40000, 40100, 40200, 40300, 40400])
+    #BTC/EUR timestamps a few seconds apart from the USD ones, one point missing
+    btc_eur = chart(Symbol.BTC, Currency.EUR, ts[[0, 1, 3, 4]] - 5000, [36000, 36180, 36270, 36360])
+    eth_usd = chart(Symbol.ETH, Currency.USD, ts + 60_000, [2000, 2010, 2020, 2030, 2040])
+
+    _, rate = fx_rate_series(btc_usd, btc_eur)
+    np.testing.assert_allclose(rate, [0.9, 36180 / 40100, 36180 / 40200, 0.9, 0.9])
+
+    eth_eur = cross_market_chart(eth_usd, btc_usd, btc_eur)
+    assert eth_eur.symbol is Symbol.ETH and eth_eur.currency is Currency.EUR
+    assert np.array_equal(eth_eur.timestamps, eth_usd.timestamps)
+    np.testing.assert_allclose(eth_eur.prices, eth_usd.prices * rate)
+    assert eth_eur.total_volumes is None
+
+    #volumes are converted with the same rate
+    volumes = np.array([1e9, 2e9, 3e9, 4e9, 5e9])
+    eth_usd = MarketChartData.from_arrays(Symbol.ETH, Currency.USD, eth_usd.timestamps, eth_usd.prices, total_volumes=volumes)
+    np.testing.assert_allclose(cross_market_chart(eth_usd, btc_usd, btc_eur).total_volumes, volumes * rate)
+
+
+# 2 ) Domain: the cross path only when it saves an upstream fetch, direct fetch otherwise or when exactness is required
+
+def fake_infra(calls):
+    def fetch(sym, curr, days):
+        calls.append((sym, curr))
+        ts = T0 + np.arange(10) * HOUR_MS
+        base = {Symbol.BTC: 40000.0, Symbol.ETH: 2000.0, Symbol.XRP: 0.5}[sym]
+        rate = {Currency.USD: 1.0, Currency.EUR: 0.9, Currency.JPY: 150.0}[curr]
+        return chart(sym, curr, ts, base * rate * (1 + np.arange(10) / 100))
+    return fetch
+
+def fake_cache(monkeypatch, cached):
+    monkeypatch.setattr(services, 'infra_is_market_chart_cached_coingecko', lambda sym, curr, days: (sym, curr) in cached)
+
+def test_fetch_market_chart_derives_currency_from_cross_rate(monkeypatch):
+    calls = []
+    cached = set()
+    monkeypatch.setattr(services, 'infra_get_parsed_market_chart_coingecko', fake_infra(calls))
+    monkeypatch.setattr(services, 'FX_CROSS_RATES', True)
+    fake_cache(monkeypatch, cached)
+
+    #cold: the cross would need 3 fetches -> the requested pair is fetched directly
+    services.fetch_market_chart(Symbol.ETH, Currency.EUR, 7, Provider.COINGECKO)
+    assert calls == [(Symbol.ETH, Currency.EUR)]
+
+    #the three series of the cross are cached, the requested pair is not -> derived without any fetch
+    calls.clear()
+    cached.update({(Symbol.ETH, Currency.USD), (Symbol.BTC, Currency.USD), (Symbol.BTC, Currency.EUR)})
+    eth_eur = services.fetch_market_chart(Symbol.ETH, Currency.EUR, 7, Provider.COINGECKO)
+    assert calls == [(Symbol.ETH, Currency.USD), (Symbol.BTC, Currency.USD), (Symbol.BTC, Currency.EUR)]
+    assert eth_eur.currency is Currency.EUR
+    np.testing.assert_allclose(eth_eur.prices, 2000.0 * 0.9 * (1 + np.arange(10) / 100))
+
+    #the requested pair is cached itself -> direct (cache hit)
+    calls.clear()
+    cached.add((Symbol.ETH, Currency.EUR))
+    services.fetch_market_chart(Symbol.ETH, Currency.EUR, 7, Provider.COINGECKO)
+    assert calls == [(Symbol.ETH, Currency.EUR)]
+
+    #one series of the cross is missing -> no fetch saved, direct
+    calls.clear()
+    cached.update({(Symbol.XRP, Currency.USD), (Symbol.BTC, Currency.USD)})
+    services.fetch_market_chart(Symbol.XRP, Currency.JPY, 7, Provider.COINGECKO)
+    assert calls == [(Symbol.XRP, Currency.JPY)]
+
+    #base currency and the proxy coin itself are fetched directly
+    calls.clear()
+    services.fetch_market_chart(Symbol.ETH, Currency.USD, 7, Provider.COINGECKO)
+    services.fetch_market_chart(Symbol.BTC, Currency.JPY, 7, Provider.COINGECKO)
+    assert calls == [(Symbol.ETH, Currency.USD), (Symbol.BTC, Currency.JPY)]
+
+    #exactness mode
+    calls.clear()
+    cached.add((Symbol.BTC, Currency.EUR))
+    services.fetch_market_chart(Symbol.XRP, Currency.EUR, 7, Provider.COINGECKO, exact_currency=True)
+    assert calls == [(Symbol.XRP, Currency.EUR)]
+    monkeypatch.setattr(services, 'FX_CROSS_RATES', False)
+    services.fetch_market_chart(Symbol.XRP, Currency.EUR, 7, Provider.COINGECKO)
+    assert calls == [(Symbol.XRP, Currency.EUR), (Symbol.XRP, Currency.EUR)]
+
+def test_fetch_market_chart_async_cross_rate(monkeypatch):
+    calls = []
+    sync_fetch = fake_infra(calls)
+    async def fetch(sym, curr, days):
+        return sync_fetch(sym, curr, days)
+    monkeypatch.setattr(services, 'infra_get_parsed_market_chart_coingecko_async', fetch)
+    monkeypatch.setattr(services, 'FX_CROSS_RATES', True)
+    fake_cache(monkeypatch, {(Symbol.XRP, Currency.USD), (Symbol.BTC, Currency.USD), (Symbol.BTC, Currency.JPY)})
+
+    xrp_jpy = asyncio.run(services.fetch_market_chart_async(Symbol.XRP, Currency.JPY, 30, Provider.COINGECKO))
+    assert sorted(calls, key=str) == sorted([(Symbol.XRP, Currency.USD), (Symbol.BTC, Currency.USD), (Symbol.BTC, Currency.JPY)], key=str)
+    np.testing.assert_allclose(xrp_jpy.prices, 0.5 * 150.0 * (1 + np.arange(10) / 100))
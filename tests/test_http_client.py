@@ -0,0 +1,50 @@
+import httpx
+from fastapi.testclient import TestClient
+
+from app.infrastructure import http_client
+from app.api.main import app
+
+
+def test_build_settings_from_env(monkeypatch):
+    monkeypatch.setenv("HTTP_MAX_CONNECTIONS", "7")
+    monkeypatch.setenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "3")
+    monkeypatch.setenv("HTTP_TIMEOUT", "2.5")
+    monkeypatch.setenv("HTTP_HTTP2", "false")
+    settings = http_client.build_http_client_settings()
+    assert settings["limits"].max_connections == 7
+    assert settings["limits"].max_keepalive_connections == 3
+    assert settings["timeout"].connect == 2.5
+    assert settings["timeout"].pool is None #requests beyond max_connections queue
+    assert settings["http2"] is False
+    monkeypatch.setenv("HTTP_POOL_TIMEOUT", "30")
+    assert http_client.build_http_client_settings()["timeout"].pool == 30.0
+
+def test_http2_falls_back_when_h2_missing(monkeypatch):
+    monkeypatch.setenv("HTTP_HTTP2", "true")
+    monkeypatch.setattr(http_client, "_http2_available", lambda: False)
+    assert http_client.build_http_client_settings()["http2"] is False
+
+def test_get_client_is_lazy_and_shared():
+    http_client.close_http_client()
+    client_1 = http_client.get_http_client()
+    client_2 = http_client.get_http_client()
+    assert isinstance(client_1, httpx.Client)
+    assert client_1 is client_2
+    http_client.close_http_client()
+    assert client_1.is_closed
+
+def test_init_replaces_and_closes_previous_client():
+    old = http_client.init_http_client()
+    injected = httpx.Client()
+    assert http_client.init_http_client(injected) is injected
+    assert old.is_closed
+    assert http_client.get_http_client() is injected
+    http_client.close_http_client()
+    assert injected.is_closed
+
+def test_app_lifespan_opens_and_closes_client():
+    http_client.close_http_client()
+    with TestClient(app):
+        client = http_client.get_http_client()
+        assert not client.is_closed
+    assert client.is_closed
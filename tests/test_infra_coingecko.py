@@ -1,13 +1,21 @@
-from app.infrastructure.coingecko import infra_clean_raw_market_chart_coingecko, infra_get_raw_market_chart_coingecko
+import asyncio
+from app.infrastructure.coingecko import infra_clean_raw_market_chart_coingecko, infra_parse_raw_market_chart_coingecko, infra_get_raw_market_chart_coingecko, infra_get_parsed_market_chart_coingecko_async
 from app.domain.entities import PricePoint
-from datetime import datetime
-from app.infrastructure.errors import InfrastructureExternalApiMalformedResponse, InfrastructureExternalApiError
+from datetime import datetime, timezone
+import numpy as np
+from app.infrastructure.errors import InfrastructureExternalApiMalformedResponse, InfrastructureExternalApiError, InfrastructureExternalApiTimeout
 import pytest
 import httpx
 from app.domain.entities import Symbol, Currency
+from app.infrastructure import coingecko
+from app.infrastructure.cache import MarketChartCache
 
 
 # 1 ) Test cleaner -> infra_clean_raw_market_chart_coingecko
+# Timestamps are UTC (naive datetimes holding UTC wall-clock time), whatever the timezone of the server.
+
+def utc(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000.0, timezone.utc).replace(tzinfo=None)
 
 def test_clean_raw_1_ok():
     TEST_CLEAN_RAW_OK = [
@@ -19,9 +27,9 @@ def test_clean_raw_1_ok():
             ]
         },  
         [
-            PricePoint(timestamp =  datetime.fromtimestamp(1622505600000 / 1000.0), price = 35000.0),
-            PricePoint(timestamp =  datetime.fromtimestamp(1622592000000 / 1000.0), price = 36000.0),
-            PricePoint(timestamp =  datetime.fromtimestamp(1622678400000 / 1000.0), price = 37000.0)
+            PricePoint(timestamp =  utc(1622505600000), price = 35000.0),
+            PricePoint(timestamp =  utc(1622592000000), price = 36000.0),
+            PricePoint(timestamp =  utc(1622678400000), price = 37000.0)
         ]
     )
 ]
@@ -44,9 +52,10 @@ def test_clean_raw_2_ok():
     assert isinstance(clean_points[0].timestamp, datetime) 
     assert isinstance(clean_points[0].price, float) 
     assert clean_points[0].price == 50000.0
-    assert clean_points[1].price == 60500.57657
-    assert clean_points[2].timestamp == datetime.fromtimestamp(1732411840000 / 1000.0)
-    assert clean_points[2].price == 980500.5678
+    #the input is not sorted: points come back in time order
+    assert clean_points[1].timestamp == utc(1732411840000)
+    assert clean_points[1].price == 980500.5678
+    assert clean_points[2].price == 60500.57657
     
 def test_clean_raw_empty_ok():
 
@@ -66,8 +75,74 @@ def test_clean_raw_empty_ok():
         infra_clean_raw_market_chart_coingecko(raw)
 
 
+# 1b) Test vectorized parser -> infra_parse_raw_market_chart_coingecko
+
+def test_parse_raw_to_utc_arrays():
+    raw = {'prices': [[1622505600000, 35000], [1622592000000, 36000.5]]}
+    chart = infra_parse_raw_market_chart_coingecko(raw, Symbol.BTC, Currency.USD)
+    assert chart.timestamps.dtype == np.int64 and chart.prices.dtype == np.float64
+    assert chart.timestamps.tolist() == [1622505600000, 1622592000000]
+    assert chart.prices.tolist() == [35000.0, 36000.5]
+    assert chart.points[0].timestamp == datetime(2021, 6, 1) #midnight UTC
+    assert chart.market_caps is None
+
+def test_parse_raw_sorts_and_keeps_last_duplicate():
+    raw = {'prices': [[3000, 3.0], [1000, 1.0], [2000, 2.0], [1000, 1.5]]}
+    chart = infra_parse_raw_market_chart_coingecko(raw, Symbol.BTC, Currency.USD)
+    assert chart.timestamps.tolist() == [1000, 2000, 3000]
+    assert chart.prices.tolist() == [1.5, 2.0, 3.0]
+
+def test_parse_raw_extras_aligned_to_prices():
+    raw = {
+        'prices':        [[1000, 1.0], [2000, 2.0], [3000, 3.0]],
+        'market_caps':   [[1000, 10.0], [2000, 20.0], [3000, 30.0]],
+        'total_volumes': [[1000, 100.0], [3000, 300.0]],
+    }
+    chart = infra_parse_raw_market_chart_coingecko(raw, Symbol.BTC, Currency.USD, with_extras=True)
+    assert chart.market_caps.tolist() == [10.0, 20.0, 30.0]
+    assert chart.total_volumes[0] == 100.0 and np.isnan(chart.total_volumes[1]) and chart.total_volumes[2] == 300.0
+
+def test_parse_raw_selected_extras():
+    raw = {
+        'prices':        [[1000, 1.0], [2000, 2.0]],
+        'market_caps':   [[1000, 10.0], [2000, 20.0]],
+        'total_volumes': [[1000, 100.0], [2000, 200.0]],
+    }
+    chart = infra_parse_raw_market_chart_coingecko(raw, Symbol.BTC, Currency.USD, extras=('total_volumes',))
+    assert chart.total_volumes.tolist() == [100.0, 200.0] and chart.market_caps is None
+
+def test_fetched_chart_keeps_volumes(monkeypatch):
+    #the request path parses the volumes (candles volume_24h), not the market caps
+    raw = {'prices': [[1000, 1.0], [2000, 2.0]], 'market_caps': [[1000, 10.0], [2000, 20.0]], 'total_volumes': [[1000, 5.0], [2000, 6.0]]}
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", None)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", lambda sym, curr, days: raw)
+    chart = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    assert chart.total_volumes.tolist() == [5.0, 6.0] and chart.market_caps is None
+
+def test_parse_raw_empty_prices_ok():
+    chart = infra_parse_raw_market_chart_coingecko({'prices': []}, Symbol.BTC, Currency.USD)
+    assert len(chart) == 0
+
+@pytest.mark.parametrize('raw', [
+    {'prices': [[1000, 1.0], [2000]]},               #ragged
+    {'prices': [[1000, 1.0, 5.0]]},                  #3 columns
+    {'prices': [1000, 2000]},                        #not pairs
+    {'prices': [[1000, 'abc']]},                     #non-numeric price
+    {'prices': [[None, 1.0]]},                       #missing timestamp
+    {'market_caps': [[1000, 1.0]]},                  #no prices
+    [[1000, 1.0]],                                   #not an object
+])
+def test_parse_raw_malformed(raw):
+    with pytest.raises(InfrastructureExternalApiMalformedResponse):
+        infra_parse_raw_market_chart_coingecko(raw, Symbol.BTC, Currency.USD)
+
+
 # 2 ) Test HTTP -> infra_get_raw_market_chart_coingecko
-# Use monketpatch to mock httpx.get and return predefined responses for different test cases.
+# Use monketpatch to replace the shared pooled client with a fake one that returns predefined responses for different test cases.
+
+class FakeClient:
+    def __init__(self, fake_get):
+        self.get = fake_get
 
 def test_infra_get_raw_market_chart_coingecko_200(monkeypatch):
     # fake response object
@@ -80,12 +155,12 @@ def test_infra_get_raw_market_chart_coingecko_200(monkeypatch):
     def fake_get_200(url, params=None, timeout=None):
         return FakeResponse_200()
 
-    # parcheamos httpx.get
-    monkeypatch.setattr(httpx, "get", fake_get_200)
+    # parcheamos el cliente compartido
+    monkeypatch.setattr(coingecko, "get_http_client", lambda: FakeClient(fake_get_200))
     # Now call the function
     raw_data = infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
-    #what is happening here? The fake_get function is called instead of httpx.get, returning our FakeResponse object.
-    #why? Because we have patched httpx.get with monkeypatch.setattr.
+    #what is happening here? The fake_get function is called instead of client.get, returning our FakeResponse object.
+    #why? Because we have patched get_http_client with monkeypatch.setattr.
     #inside python this is called "monkey patching", a technique to change or extend the behavior of libraries or modules at runtime.
     #it could be used with any library, not only httpx. for example:
     # monkeypatch.setattr(some_module, "some_function", fake_function)
@@ -100,7 +175,7 @@ def test_infra_get_raw_market_chart_coingecko_404(monkeypatch):
         text = "Not Found"
     def fake_get_404(url, params=None, timeout=None):
         return FakeResponse_404()  
-    monkeypatch.setattr(httpx, "get", fake_get_404)
+    monkeypatch.setattr(coingecko, "get_http_client", lambda: FakeClient(fake_get_404))
     with pytest.raises(InfrastructureExternalApiError): 
         infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)   
 
@@ -120,8 +195,53 @@ def test_infra_get_raw_market_chart_coingecko_200_malformed(monkeypatch):
     def fake_get_200_badjson(url, params=None, timeout=None):
         return FakeResponse_200_BadJSON()   
     
-    monkeypatch.setattr(httpx, "get", fake_get_200_badjson)
+    monkeypatch.setattr(coingecko, "get_http_client", lambda: FakeClient(fake_get_200_badjson))
     with pytest.raises(InfrastructureExternalApiMalformedResponse):
         infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
-        
-        
\ No newline at end of file
+
+def test_infra_get_raw_market_chart_coingecko_injected_client():
+    # An injected client is used instead of the shared one
+    calls = []
+    class FakeResponse_200:
+        status_code = 200
+        def json(self):
+            return {"prices": [[1732032000000, 50000.0]]}
+    def fake_get(url, params=None, timeout=None):
+        calls.append(params)
+        return FakeResponse_200()
+
+    raw_data = infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.EUR, 7, client=FakeClient(fake_get))
+    assert raw_data["prices"] == [[1732032000000, 50000.0]]
+    assert calls == [{'vs_currency': 'eur', 'days': 7}]
+
+def test_infra_get_raw_market_chart_coingecko_timeout(monkeypatch):
+    def fake_get_timeout(url, params=None, timeout=None):
+        raise httpx.ConnectTimeout("timeout")
+    monkeypatch.setattr(coingecko, "get_http_client", lambda: FakeClient(fake_get_timeout))
+    with pytest.raises(InfrastructureExternalApiTimeout):
+        infra_get_raw_market_chart_coingecko(Symbol.BTC, Currency.USD, 1)
+
+# 3 ) Test the async path -> infra_get_parsed_market_chart_coingecko_async with a fake AsyncClient
+def test_infra_get_parsed_market_chart_coingecko_async(monkeypatch):
+    class FakeResponse_200:
+        status_code = 200
+        def json(self):
+            return {"prices": [[1732032000000, 50000.0], [1732035600000, 50100.0]]}
+
+    class FakeAsyncClient:
+        async def get(self, url, params=None, timeout=None):
+            return FakeResponse_200()
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache(max_entries=0)) #always go to the (fake) HTTP client
+    monkeypatch.setattr(coingecko, "get_async_http_client", lambda: FakeAsyncClient())
+    chart = asyncio.run(infra_get_parsed_market_chart_coingecko_async(Symbol.BTC, Currency.USD, 1))
+    assert chart.symbol == Symbol.BTC
+    assert [p.price for p in chart.points] == [50000.0, 50100.0]
+
+    class FakeAsyncClientTimeout:
+        async def get(self, url, params=None, timeout=None):
+            raise httpx.ReadTimeout("timeout")
+
+    monkeypatch.setattr(coingecko, "get_async_http_client", lambda: FakeAsyncClientTimeout())
+    with pytest.raises(InfrastructureExternalApiTimeout):
+        asyncio.run(infra_get_parsed_market_chart_coingecko_async(Symbol.BTC, Currency.USD, 1))
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain import services
+from app.domain import errors as errors_domain
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.services.moments import Moments
+
+
+def assert_matches_pandas(moments: Moments, values: np.ndarray):
+    series = pd.Series(values).dropna()
+    assert moments.count == len(series)
+    assert moments.minimum == series.min() and moments.maximum == series.max()
+    assert moments.first == series.iloc[0] and moments.last == series.iloc[-1]
+    np.testing.assert_allclose(moments.mean, series.mean(), rtol=1e-12)
+    np.testing.assert_allclose(moments.variance, series.var(), rtol=1e-10)
+    np.testing.assert_allclose(moments.skewness, series.skew(), rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(moments.kurtosis, series.kurt(), rtol=1e-8, atol=1e-10)
+
+
+# 1 ) One pass and merges vs pandas
+
+@pytest.mark.parametrize('seed', range(4))
+def test_merged_chunks_match_pandas(seed):
+    rng = np.random.default_rng(seed)
+    values = 30000 * np.exp(np.cumsum(rng.normal(0, 0.02, 50_000)))
+    values[rng.integers(0, len(values), 20)] = np.nan
+    assert_matches_pandas(Moments.from_array(values), values)
+    #uneven chunks, some of them empty
+    cuts = np.sort(np.concatenate([rng.integers(0, len(values), 30), [0, 0, len(values)]]))
+    assert_matches_pandas(Moments.from_chunks(np.split(values, cuts)), values)
+
+def test_merge_is_associative_and_keeps_time_order():
+    values = np.arange(1.0, 101.0) ** 1.5
+    a, b, c = (Moments.from_array(chunk) for chunk in np.split(values, [30, 70]))
+    left, right = a.merge(b).merge(c), a.merge(b.merge(c))
+    for name in ('count', 'minimum', 'maximum', 'first', 'last'):
+        assert getattr(left, name) == getattr(right, name)
+    np.testing.assert_allclose([left.mean, left.m2, left.m3, left.m4], [right.mean, right.m2, right.m3, right.m4], rtol=1e-12)
+    assert left.first == 1.0 and left.last == 1000.0
+
+def test_small_and_constant_series():
+    empty = Moments.from_array(np.array([np.nan]))
+    assert empty.count == 0 and empty.merge(empty).count == 0
+    two = Moments.from_array(np.array([1.0, 3.0]))
+    assert two.variance == 2.0 and np.isnan(two.skewness) and np.isnan(two.kurtosis)
+    constant = Moments.from_chunks([np.full(10, 5.0), np.full(7, 5.0)])
+    assert (constant.variance, constant.skewness, constant.kurtosis) == (0.0, 0.0, 0.0)
+    assert Moments.from_dict(constant.to_dict()) == constant
+
+
+# 2 ) Stats merged from stored partition summaries
+
+def test_summary_stats_merge_partition_moments(monkeypatch):
+    rng = np.random.default_rng(9)
+    years = [rng.normal(100, 5, 1000) for _ in range(3)]
+    requested = []
+    def fake_summaries(sym, curr, days, name, build):
+        requested.append(name)
+        return [build(np.arange(len(prices)), prices) for prices in years], 2999
+    monkeypatch.setattr(services, 'infra_get_market_chart_summaries_coingecko', fake_summaries)
+
+    #the version of the data comes from the same summaries the statistics are computed from
+    source = services.fetch_market_chart_stats_source(Symbol.BTC, Currency.USD, 1095, Provider.COINGECKO)
+    assert source.chart is None and len(source.summaries) == 3
+    assert services.get_market_chart_stats_version(source, 1095).last_timestamps == (2999,)
+    stats = services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 1095, Provider.COINGECKO, source=source)
+    expected = pd.Series(np.concatenate(years))
+    assert requested == [services.STATS_SUMMARY]
+    assert stats['exact'] is False
+    assert stats['count'] == 3000
+    np.testing.assert_allclose([stats['mean_price'], stats['std_dev'], stats['skewness'], stats['kurtosis']],
+                               [expected.mean(), expected.std(), expected.skew(), expected.kurt()], rtol=1e-9)
+
+    monkeypatch.setattr(services, 'infra_get_market_chart_summaries_coingecko', lambda *args: ([], None))
+    with pytest.raises(errors_domain.BusinessNoDataError):
+        services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 1095, Provider.COINGECKO)
+
+def test_summary_stats_without_store(monkeypatch):
+    prices = np.array([100.0, 110.0, 105.0, 115.0, 120.0])
+    monkeypatch.setattr(services, 'infra_get_market_chart_summaries_coingecko', lambda *args: None)
+    monkeypatch.setattr(services, 'fetch_market_chart', lambda *args, **kwargs: MarketChartData.from_arrays(Symbol.BTC, Currency.USD, np.arange(5), prices))
+    source = services.fetch_market_chart_stats_source(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO, exact=False)
+    assert source.summaries is None and source.last_timestamp == 4
+    stats = services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 5, Provider.COINGECKO, exact=False, source=source)
+    #no stored summaries: the chart is in memory, the statistics are exact (no sketch)
+    assert stats['mean_price'] == 110.0 and stats['percent_change'] == 20.0
+    assert stats['median_price'] == 110.0 and stats['price_quantiles']['p50'] == 110.0
+    assert stats['exact'] is True
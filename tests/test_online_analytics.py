@@ -0,0 +1,206 @@
+import math
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain import services
+from app.domain import errors as errors_domain
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData, PricePoint
+from app.services.analytics import enrich_price_frame, compute_returns, compute_rolling_window, compute_volatility, normalize_series
+from app.services.online_analytics import OnlineEnrichment, OnlineEnrichmentRegistry
+
+T0 = datetime(2024, 1, 1)
+
+
+def random_prices(rng, n):
+    return 30000 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+def build_points(prices):
+    return [PricePoint(timestamp=T0 + timedelta(hours=i), price=float(p)) for i, p in enumerate(prices)]
+
+
+# 1 ) Online state vs batch functions: every emitted row must equal the same row of the batch pipeline
+
+@pytest.mark.parametrize('seed', range(10))
+def test_online_rows_match_batch(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(60, 1500))
+    prices = random_prices(rng, n)
+    if seed % 3 == 0:
+        prices = np.round(prices, -3) #flat stretches -> zero variance windows
+    windows = list(dict.fromkeys(int(w) for w in rng.integers(1, 50, 3)))
+    volatility_windows = list(dict.fromkeys(int(w) for w in rng.integers(2, 50, 2)))
+    normalize_base = 100.0 if seed % 2 else None
+
+    points = build_points(prices)
+    df = pd.DataFrame({'timestamp': [p.timestamp for p in points], 'price': prices})
+    expected = df.copy()
+    compute_returns(expected, 'price')
+    for window in dict.fromkeys(windows):
+        compute_rolling_window(expected, window, 'price')
+    for window in dict.fromkeys(volatility_windows):
+        compute_volatility(expected, 'price', window)
+    if normalize_base is not None:
+        normalize_series(expected, 'price', normalize_base)
+
+    state = OnlineEnrichment('price', windows, volatility_windows, normalize_base)
+    online = pd.DataFrame(state.extend(points))
+
+    assert list(online.columns) == list(expected.columns)
+    assert list(online['timestamp']) == list(expected['timestamp'])
+    for column in expected.columns[1:]:
+        np.testing.assert_allclose(online[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=column)
+
+def test_online_long_series_does_not_drift():
+    #100k updates of running sums: the last window must still match a direct computation
+    rng = np.random.default_rng(42)
+    prices = np.linspace(1.0, 1e6, 100_000) + rng.normal(0, 1, 100_000)
+    state = OnlineEnrichment('price', 20, 20)
+    for i, price in enumerate(prices):
+        row = state.update(T0 + timedelta(minutes=5 * i), price)
+    returns = prices[-21:][1:] / prices[-21:][:-1] - 1
+    assert math.isclose(row['rolling_mean_20'], prices[-20:].mean(), rel_tol=1e-12)
+    assert math.isclose(row['volatility_20'], returns.std(ddof=1), rel_tol=1e-9)
+
+def test_online_update_point_and_last_row():
+    state = OnlineEnrichment('price', 2, None, 100.0)
+    state.update_point(PricePoint(timestamp=T0, price=10.0))
+    row = state.update_point(PricePoint(timestamp=T0 + timedelta(hours=1), price=12.0))
+    assert row == state.last_row
+    assert row['pct_change'] == pytest.approx(20.0)
+    assert row['acum_pct_change'] == pytest.approx(20.0)
+    assert row['rolling_mean_2'] == pytest.approx(11.0)
+    assert row['normalized_price_base_100.0'] == pytest.approx(120.0)
+    assert state.last_timestamp == T0 + timedelta(hours=1)
+
+def test_online_errors():
+    with pytest.raises(ValueError):
+        OnlineEnrichment('price', window_size=0)
+    with pytest.raises(ValueError):
+        OnlineEnrichment('price', volatility_window=[5, 1])
+    state = OnlineEnrichment('price', 3)
+    state.update(T0, 1.0)
+    with pytest.raises(ValueError):
+        state.update(T0, 2.0) #not after the last point
+    with pytest.raises(ValueError):
+        OnlineEnrichment('price', normalize_base=100.0).update(T0, 0.0)
+
+def test_online_missing_prices_match_batch():
+    prices = random_prices(np.random.default_rng(7), 120)
+    prices[[0, 1, 30, 31, 32, 77]] = np.nan #leading and interior gaps
+    points = [(T0 + timedelta(hours=i), None if i == 77 else float(p)) for i, p in enumerate(prices)]
+    state = OnlineEnrichment('price', [5, 20], 10, 100.0)
+    online = pd.DataFrame([state.update(timestamp, price) for timestamp, price in points])
+
+    df = pd.DataFrame({'timestamp': [t for t, _ in points], 'price': prices})
+    with pytest.warns(FutureWarning):
+        expected = enrich_price_frame(df, 'price', [5, 20], 10, 100.0)
+    assert list(online.columns) == list(expected.columns)
+    for column in expected.columns[1:]:
+        np.testing.assert_allclose(online[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-12, equal_nan=True, err_msg=column)
+
+def test_online_rewind_replaces_last_point():
+    prices = random_prices(np.random.default_rng(8), 80)
+    state = OnlineEnrichment('price', [3, 50], [5, 40])
+    for i, p in enumerate(prices[:60]):
+        state.update(T0 + timedelta(hours=i), float(p))
+    state.update(T0 + timedelta(hours=59, minutes=37), 123.0) #live point, replaced by the aligned one below
+    assert state.rewind()
+    assert not state.rewind() #one point only
+    assert state.last_timestamp == T0 + timedelta(hours=59)
+    rows = [state.update(T0 + timedelta(hours=i), float(p)) for i, p in enumerate(prices[60:], start=60)]
+
+    df = pd.DataFrame({'timestamp': [T0 + timedelta(hours=i) for i in range(80)], 'price': prices})
+    expected = enrich_price_frame(df, 'price', [3, 50], [5, 40], None).iloc[-1]
+    np.testing.assert_allclose(pd.Series(rows[-1]).iloc[1:].to_numpy(dtype=float), expected.iloc[1:].to_numpy(dtype=float), rtol=1e-9)
+    fresh = OnlineEnrichment('price', 3)
+    assert not fresh.rewind()
+    fresh.update(T0, 1.0)
+    assert fresh.rewind() and fresh.last_timestamp is None
+    assert fresh.update(T0, 2.0)['acum_pct_change'] == 0.0 #anchored again at the new first point
+
+def test_online_registry():
+    registry = OnlineEnrichmentRegistry()
+    first = registry.get('btc', OnlineEnrichment)
+    assert registry.get('btc', OnlineEnrichment) is first
+    assert registry.get('eth', OnlineEnrichment) is not first
+    assert len(registry) == 2
+    registry.reset('btc')
+    assert registry.get('btc', OnlineEnrichment) is not first
+    registry.reset()
+    assert len(registry) == 0
+
+def test_online_registry_is_bounded():
+    registry = OnlineEnrichmentRegistry(max_states=2)
+    btc = registry.get('btc', OnlineEnrichment)
+    registry.get('eth', OnlineEnrichment)
+    assert registry.get('btc', OnlineEnrichment) is btc #btc becomes the most recently used
+    registry.get('sol', OnlineEnrichment) #drops eth
+    assert len(registry) == 2
+    assert registry.get('btc', OnlineEnrichment) is btc
+    eth = registry.get('eth', OnlineEnrichment) #new state, drops sol
+    assert registry.get('eth', OnlineEnrichment) is eth and len(registry) == 2
+
+
+# 2 ) Domain use case: each call ingests only the points that are new since the previous call
+
+def chart_of(prices, start=0):
+    timestamps = (np.arange(start, start + len(prices), dtype=np.int64) * 3_600_000) + 1_700_000_000_000
+    return MarketChartData.from_arrays(Symbol.BTC, Currency.USD, timestamps, np.asarray(prices, dtype=np.float64))
+
+def test_compute_latest_enriched_row_ingests_only_new_points(monkeypatch):
+    services.ONLINE_ENRICHMENTS.reset()
+    prices = random_prices(np.random.default_rng(3), 200)
+    charts = iter([chart_of(prices[:150]), chart_of(prices[10:200], start=10)]) #sliding provider window
+    monkeypatch.setattr(services, 'fetch_market_chart', lambda *args, **kwargs: next(charts))
+
+    ingested = []
+    original_update = OnlineEnrichment.update
+    def counting_update(self, timestamp, price):
+        ingested.append(timestamp)
+        return original_update(self, timestamp, price)
+    monkeypatch.setattr(OnlineEnrichment, 'update', counting_update)
+
+    services.compute_latest_enriched_row(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO, window_size=[5, 20], volatility_window=10)
+    assert len(ingested) == 150
+    latest = services.compute_latest_enriched_row(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO, window_size=[5, 20], volatility_window=10)
+    assert len(ingested) == 201 #the previous last point is taken back and ingested again
+
+    full = chart_of(prices)
+    df = pd.DataFrame({'timestamp': full.datetimes, 'price': full.prices})
+    expected = enrich_price_frame(df, 'price', [5, 20], 10, None).iloc[-1]
+    assert len(latest) == 1
+    assert list(latest.columns) == list(expected.index)
+    np.testing.assert_allclose(latest.iloc[0, 1:].to_numpy(dtype=float), expected.iloc[1:].to_numpy(dtype=float), rtol=1e-9)
+    services.ONLINE_ENRICHMENTS.reset()
+
+def test_compute_latest_enriched_row_invalid_window(monkeypatch):
+    services.ONLINE_ENRICHMENTS.reset()
+    monkeypatch.setattr(services, 'fetch_market_chart', lambda *args, **kwargs: chart_of([1.0, 2.0, 3.0]))
+    with pytest.raises(errors_domain.BusinessComputationError):
+        services.compute_latest_enriched_row(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO, volatility_window=1)
+    with pytest.raises(errors_domain.BusinessComputationError):
+        services.compute_latest_enriched_row(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO, window_size=10**9)
+    assert len(services.ONLINE_ENRICHMENTS) == 0 #rejected before any state is created
+    services.ONLINE_ENRICHMENTS.reset()
+
+def test_compute_latest_enriched_row_drops_live_point(monkeypatch):
+    services.ONLINE_ENRICHMENTS.reset()
+    prices = random_prices(np.random.default_rng(4), 100)
+    live = chart_of(prices[:61])
+    live_timestamps = live.timestamps.copy()
+    live_timestamps[-1] -= 23 * 60_000 #60th point fetched at 59:37 instead of 60:00
+    first = MarketChartData.from_arrays(Symbol.BTC, Currency.USD, live_timestamps, np.append(prices[:60], 1.0))
+    charts = iter([first, chart_of(prices)])
+    monkeypatch.setattr(services, 'fetch_market_chart', lambda *args, **kwargs: next(charts))
+
+    services.compute_latest_enriched_row(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO, window_size=[5, 50], volatility_window=[10, 60])
+    latest = services.compute_latest_enriched_row(Symbol.BTC, Currency.USD, 1, Provider.COINGECKO, window_size=[5, 50], volatility_window=[10, 60])
+
+    full = chart_of(prices)
+    df = pd.DataFrame({'timestamp': full.datetimes, 'price': full.prices})
+    expected = enrich_price_frame(df, 'price', [5, 50], [10, 60], None).iloc[-1]
+    np.testing.assert_allclose(latest.iloc[0, 1:].to_numpy(dtype=float), expected.iloc[1:].to_numpy(dtype=float), rtol=1e-9)
+    services.ONLINE_ENRICHMENTS.reset()
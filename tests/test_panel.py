@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.domain import services
+from app.domain import errors as errors_domain
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.services.analytics import compute_returns, compute_rolling_window, compute_volatility, normalize_series
+from app.services.panel import panel_index, align_panel, enrich_panel
+
+HOUR_MS = 3_600_000
+T0 = 1_704_067_200_000
+
+
+def chart(symbol, timestamps, prices):
+    return MarketChartData.from_arrays(symbol, Currency.USD, np.asarray(timestamps, dtype=np.int64), np.asarray(prices, dtype=float))
+
+
+# 1 ) Alignment on a common index
+
+def test_panel_index_and_asof_alignment():
+    btc = chart(Symbol.BTC, T0 + np.arange(6) * HOUR_MS, [10, 11, 12, 13, 14, 15])
+    #ETH starts later, its points are a few seconds off and one is missing (NaN)
+    eth = chart(Symbol.ETH, T0 + HOUR_MS + np.arange(5) * HOUR_MS - 3000, [1, 2, np.nan, 4, 5])
+
+    index = panel_index([btc, eth])
+    #period covered by both series, on the timestamps of the densest one (BTC), starting at the first common moment
+    assert list(index) == [T0 + HOUR_MS - 3000] + list(T0 + np.arange(1, 5) * HOUR_MS)
+
+    index, prices = align_panel([btc, eth], index)
+    assert prices.shape == (5, 2)
+    assert list(prices[:, 0]) == [10, 11, 12, 13, 14]
+    assert list(prices[:, 1]) == [1, 1, 2, 2, 4] #missing price -> previous one
+
+def test_panel_index_errors():
+    btc = chart(Symbol.BTC, [T0, T0 + HOUR_MS], [1, 2])
+    with pytest.raises(ValueError):
+        panel_index([])
+    with pytest.raises(ValueError):
+        panel_index([btc, chart(Symbol.ETH, [T0 + 5 * HOUR_MS], [1])])
+
+
+# 2 ) One vectorized pass = the single-series pipeline of every asset
+
+def test_enrich_panel_matches_single_series_pipeline():
+    rng = np.random.default_rng(3)
+    n = 3000
+    timestamps = T0 + np.arange(n) * HOUR_MS
+    charts = [chart(symbol, timestamps, 100 * (i + 1) * np.exp(np.cumsum(rng.normal(0, 0.01, n)))) for i, symbol in enumerate([Symbol.BTC, Symbol.ETH, Symbol.XRP])]
+
+    panel = enrich_panel(charts, window_size=[7, 30], volatility_window=24, normalize_base=100.0)
+    assert len(panel) == 3 * n
+    assert list(panel['asset'][:3]) == ['bitcoin', 'ethereum', 'ripple']
+
+    for mcd in charts:
+        expected = pd.DataFrame({'price': mcd.prices})
+        compute_returns(expected, 'price')
+        compute_rolling_window(expected, 7, 'price')
+        compute_rolling_window(expected, 30, 'price')
+        compute_volatility(expected, 'price', 24)
+        normalize_series(expected, 'price', 100.0)
+        rows = panel[panel['asset'] == mcd.symbol.value].reset_index(drop=True)
+        assert list(rows['timestamp'].astype('int64')) == list(timestamps)
+        for column in expected.columns:
+            np.testing.assert_allclose(rows[column].to_numpy(), expected[column].to_numpy(), rtol=1e-9, atol=1e-12, err_msg=column)
+
+def test_enrich_panel_window_errors():
+    charts = [chart(Symbol.BTC, T0 + np.arange(5) * HOUR_MS, np.arange(1, 6)), chart(Symbol.ETH, T0 + np.arange(5) * HOUR_MS, np.arange(1, 6))]
+    with pytest.raises(ValueError):
+        enrich_panel(charts, window_size=10)
+    with pytest.raises(ValueError):
+        enrich_panel(charts, labels=['btc'])
+
+
+# 3 ) Domain use case
+
+def test_compute_panel(monkeypatch):
+    fetched = []
+    def fake_fetch(symbol, currency, days, provider, start=None, end=None, exact_currency=False):
+        fetched.append(symbol)
+        return chart(symbol, T0 + np.arange(10) * HOUR_MS, np.arange(1, 11) * (2 if symbol is Symbol.ETH else 1))
+    monkeypatch.setattr(services, 'fetch_market_chart', fake_fetch)
+
+    df = services.compute_panel([Symbol.BTC, Symbol.ETH, Symbol.BTC], Currency.USD, 1, Provider.COINGECKO, window_size=3, normalize_base=100.0)
+    assert fetched == [Symbol.BTC, Symbol.ETH]
+    assert list(df.columns) == ['timestamp', 'asset', 'price', 'pct_change', 'acum_pct_change', 'rolling_mean_3', 'normalized_price_base_100.0']
+    assert df['normalized_price_base_100.0'].iloc[-2:].tolist() == [1000.0, 1000.0]
+
+    with pytest.raises(errors_domain.BusinessValidationError):
+        services.compute_panel([], Currency.USD, 1, Provider.COINGECKO)
+    with pytest.raises(errors_domain.BusinessComputationError):
+        services.compute_panel([Symbol.BTC], Currency.USD, 1, Provider.COINGECKO, volatility_window=1)
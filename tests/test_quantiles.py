@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from app.domain import services
+from app.domain.entities import Symbol, Currency, Provider, MarketChartData
+from app.services.analytics import QUANTILE_LEVELS, calculate_quantiles, percent_returns
+from app.services.quantiles import TDigest
+
+LEVELS = np.array(QUANTILE_LEVELS)
+
+
+def rank_errors(digest: TDigest, values: np.ndarray, levels: np.ndarray = LEVELS) -> np.ndarray:
+    ordered = np.sort(values)
+    return np.searchsorted(ordered, digest.quantile(levels)) / len(values) - levels
+
+
+# 1 ) Sketch accuracy and merges
+
+@pytest.mark.parametrize('compression', [100, 500])
+def test_digest_rank_error_within_bound(compression):
+    rng = np.random.default_rng(compression)
+    values = np.concatenate([rng.lognormal(0, 1, 150_000), rng.normal(50, 1, 50_000)]) #skewed, bimodal
+    digest = TDigest.from_array(values, compression)
+    assert len(digest.means) <= compression / 2 + 2
+    bound = np.pi / compression * 2 * np.sqrt(LEVELS * (1 - LEVELS)) #cluster width at every level
+    assert (np.abs(rank_errors(digest, values)) <= bound).all()
+    assert digest.quantile(0.0) == values.min() and digest.quantile(1.0) == values.max()
+
+def test_merged_digests_match_single_digest():
+    rng = np.random.default_rng(1)
+    values = 30000 * np.exp(np.cumsum(rng.normal(0, 0.002, 300_000)))
+    merged = TDigest()
+    for chunk in np.array_split(values, 12): #e.g. stored year partitions
+        merged = merged.merge(TDigest.from_dict(TDigest.from_array(chunk, 200).to_dict()))
+    assert merged.count == len(values)
+    assert len(merged.means) <= 102
+    assert (np.abs(rank_errors(merged, values)) <= np.pi / 200).all()
+
+def test_empty_digest_and_nans():
+    assert np.isnan(TDigest().quantile(0.5))
+    digest = TDigest.from_array(np.array([np.nan, 3.0, 1.0, np.nan, 2.0]))
+    assert digest.count == 3
+    assert digest.quantile(0.5) == 2.0
+    assert TDigest().merge(digest) is digest
+
+
+# 2 ) Stats: exact for short windows, sketches for long ones
+
+def fake_fetch(prices):
+    return lambda *args, **kwargs: MarketChartData.from_arrays(Symbol.BTC, Currency.USD, np.arange(len(prices), dtype=np.int64), prices)
+
+def test_exact_stats_quantiles(monkeypatch):
+    prices = np.random.default_rng(2).lognormal(10, 0.5, 2000)
+    monkeypatch.setattr(services, 'fetch_market_chart', fake_fetch(prices))
+    stats = services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 30, Provider.COINGECKO)
+    assert stats['exact'] is True
+    assert stats['median_price'] == np.median(prices)
+    assert list(stats['price_quantiles']) == ['p1', 'p5', 'p50', 'p95', 'p99']
+    assert stats['price_quantiles']['p99'] == np.quantile(prices, 0.99)
+    assert stats['return_quantiles'] == calculate_quantiles(percent_returns(prices))
+
+def test_long_windows_use_sketches(monkeypatch):
+    rng = np.random.default_rng(3)
+    years = [30000 * np.exp(np.cumsum(rng.normal(0, 0.01, 8760))) for _ in range(4)]
+    monkeypatch.setattr(services, 'infra_get_market_chart_summaries_coingecko',
+                        lambda sym, curr, days, name, build: ([build(np.arange(len(p)), p) for p in years], 4 * 8760 - 1))
+    monkeypatch.setattr(services, 'fetch_market_chart', fake_fetch(np.concatenate(years)))
+
+    approximate = services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 1460, Provider.COINGECKO)
+    exact = services.compute_market_chart_stats(Symbol.BTC, Currency.USD, 1460, Provider.COINGECKO, exact=True)
+    assert (approximate['exact'], exact['exact']) == (False, True)
+    assert approximate['count'] == exact['count']
+    for label in ('p1', 'p50', 'p99'):
+        assert approximate['price_quantiles'][label] == pytest.approx(exact['price_quantiles'][label], rel=0.02)
+    assert approximate['median_price'] == approximate['price_quantiles']['p50']
@@ -33,7 +33,7 @@ def _build_fake_marketchartdata(days: int = 10) -> MarketChartData:
     return MarketChartData(Symbol.BTC, Currency.USD, points)
 
 
-def _fake_fetch_market_chart(symbol, currency, days, provider) -> MarketChartData:
+def _fake_fetch_market_chart(symbol, currency, days, provider, start=None, end=None, exact_currency=False) -> MarketChartData:
     # Ignore parameters and just return deterministic data
     return _build_fake_marketchartdata(days=days)
 
@@ -72,6 +72,11 @@ def test_compute_enriched_market_chart_basic(monkeypatch):
     assert df["price"].iloc[0] == 100.0
     assert df["timestamp"].iloc[-1] == datetime(2023, 1, 5)
     assert df["price"].iloc[-1] == 140.0
+
+    #the caller owns the frame, even over a cached chart (read-only arrays)
+    df.loc[0, "price"] = -1.0
+    df["price"] *= 2
+    assert df["price"].iloc[0] == -2.0
     
 
 
@@ -154,7 +159,7 @@ def test_compute_enriched_market_chart_invalid_params_propagate(monkeypatch):
     from app.domain import errors as domain_errors
     from app.domain.services import compute_enriched_market_chart
 
-    def fake_fetch_invalid(symbol, currency, days, provider):
+    def fake_fetch_invalid(symbol, currency, days, provider, start=None, end=None, exact_currency=False):
         raise domain_errors.BusinessValidationError("Invalid combination")
 
     monkeypatch.setattr(domain_services, "fetch_market_chart", fake_fetch_invalid)
@@ -175,3 +180,27 @@ def test_compute_enriched_market_chart_invalid_params_propagate(monkeypatch):
 # --- END OF FILE ------------------------------------------------------------
 
 
+
+
+def test_compute_market_chart_report_stats_describe_the_enriched_frame(monkeypatch):
+    """
+    One fetch for the report; the stats are those of the enriched (resampled) frame.
+    """
+    fetches = []
+
+    def fake_fetch(*args, **kwargs):
+        fetches.append(args)
+        return _build_fake_marketchartdata(days=21)
+
+    monkeypatch.setattr(domain_services, "fetch_market_chart", fake_fetch)
+
+    df, stats = domain_services.compute_market_chart_report(
+        Symbol.BTC, Currency.USD, 21, Provider.COINGECKO, frequency=ResampleFrequency.WEEKLY, window_size=2,
+    )
+    assert len(fetches) == 1
+    assert "rolling_mean_2" in df.columns
+    assert stats["count"] == len(df) < 21
+    assert stats["last_price"] == df["price"].iloc[-1]
+    assert stats["mean_price"] == pytest.approx(df["price"].mean())
+    assert stats["return_quantiles"]["p50"] == pytest.approx(df["pct_change"].median())
+    assert stats["exact"] is True
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+from datetime import datetime
+
+import pytest
+
+from app.domain.entities import Symbol, Currency, MarketChartData, PricePoint
+from app.infrastructure import coingecko
+from app.infrastructure.singleflight import SingleFlight, AsyncSingleFlight
+from app.infrastructure.cache import MarketChartCache
+
+
+# 1 ) Threaded path
+
+def test_singleflight_threads_share_one_execution():
+    flight = SingleFlight()
+    n_threads = 8
+    release = threading.Event()
+    executions = []
+
+    def slow_fetch():
+        executions.append(1)
+        release.wait(timeout=5)
+        return object()
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', slow_fetch))) for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    #wait until every thread has joined the flight before releasing the leader
+    while flight.stats()['calls'] < n_threads:
+        pass
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(executions) == 1
+    assert len(results) == n_threads
+    assert all(r is results[0] for r in results)
+    stats = flight.stats()
+    assert stats['executions'] == 1
+    assert stats['coalesced'] == n_threads - 1
+    assert stats['in_flight'] == 0
+
+def test_singleflight_threads_propagate_errors_and_release_key():
+    flight = SingleFlight()
+
+    def failing():
+        raise ValueError('upstream down')
+
+    with pytest.raises(ValueError):
+        flight.do('key', failing)
+    #the key is released: the next call runs again
+    assert flight.do('key', lambda: 42) == 42
+    assert flight.stats()['executions'] == 2
+
+def test_singleflight_different_keys_do_not_coalesce():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.stats()['coalesced'] == 0
+
+
+# 2 ) asyncio path
+
+def test_async_singleflight_shares_one_execution():
+    flight = AsyncSingleFlight()
+    executions = []
+
+    async def slow_fetch():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return object()
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', slow_fetch) for _ in range(50)))
+
+    results = asyncio.run(main())
+    assert len(executions) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats()['coalesced'] == 49
+    assert flight.stats()['in_flight'] == 0
+
+def test_async_singleflight_leader_cancellation_does_not_cancel_followers():
+    flight = AsyncSingleFlight()
+
+    async def slow_fetch():
+        await asyncio.sleep(0.02)
+        return 'data'
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do('key', slow_fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do('key', slow_fetch))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == 'data'
+
+def test_async_singleflight_propagates_errors():
+    flight = AsyncSingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0)
+        raise ValueError('upstream down')
+
+    async def main():
+        return await asyncio.gather(*(flight.do('key', failing) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+
+
+# 3 ) Wired into the CoinGecko adapter
+
+def test_parsed_market_chart_coalesces_concurrent_async_fetches(monkeypatch):
+    calls = []
+
+    async def fake_fetch(sym, curr, days):
+        calls.append((sym, curr, days))
+        await asyncio.sleep(0.01)
+        return MarketChartData(sym, curr, [PricePoint(datetime(2023, 1, 1), 1.0)])
+
+    monkeypatch.setattr(coingecko, "_fetch_parsed_market_chart_coingecko_async", fake_fetch)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_FLIGHT_ASYNC", AsyncSingleFlight())
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", MarketChartCache(max_entries=0))
+
+    async def main():
+        return await asyncio.gather(
+            coingecko.infra_get_parsed_market_chart_coingecko_async(Symbol.BTC, Currency.USD, 30),
+            coingecko.infra_get_parsed_market_chart_coingecko_async(Symbol.BTC, Currency.USD, 30),
+            coingecko.infra_get_parsed_market_chart_coingecko_async(Symbol.ETH, Currency.USD, 30),
+        )
+
+    btc_1, btc_2, eth = asyncio.run(main())
+    assert btc_1 is btc_2
+    assert eth.symbol == Symbol.ETH
+    assert len(calls) == 2
+    assert coingecko.infra_get_market_chart_flight_stats()['async']['coalesced'] == 1
+
+def test_admin_singleflight_endpoint():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routes.admin import router as admin_router
+
+    app = FastAPI()
+    app.include_router(admin_router)
+    response = TestClient(app).get("/admin/singleflight")
+    assert response.status_code == 200
+    assert set(response.json()) == {"threaded", "async"}
+    assert "coalesced" in response.json()["async"]
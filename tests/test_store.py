@@ -0,0 +1,331 @@
+import asyncio
+import threading
+
+import numpy as np
+
+from app.domain.entities import Symbol, Currency, Provider, Granularity
+from app.infrastructure import coingecko
+from app.infrastructure.store import MarketChartStore
+
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+KEY = (Provider.COINGECKO, Symbol.BTC, Currency.USD, Granularity.HOURLY)
+T0 = 1_703_980_800_000 #2023-12-31 00:00 UTC
+
+
+# 1 ) MarketChartStore
+
+def test_store_merge_read_and_bounds(tmp_path):
+    store = MarketChartStore(tmp_path)
+    assert store.bounds(KEY) is None
+
+    #48 hourly points crossing the new year -> two year partitions
+    ts = T0 + np.arange(48) * HOUR_MS
+    store.merge(KEY, ts, np.arange(48, dtype=float))
+    assert sorted(p.name for p in store.partition_dir(KEY).iterdir()) == ['year=2023.parquet', 'year=2024.parquet']
+    assert str(store.partition_dir(KEY)).endswith('provider=coingecko/symbol=bitcoin/currency=usd/granularity=hourly')
+    assert store.bounds(KEY) == (T0, T0 + 47 * HOUR_MS)
+
+    read_ts, read_px = store.read(KEY)
+    assert np.array_equal(read_ts, ts)
+    assert read_px[-1] == 47.0
+
+    #range read only returns the requested points
+    read_ts, read_px = store.read(KEY, start_ms=T0 + 10 * HOUR_MS, end_ms=T0 + 12 * HOUR_MS)
+    assert list(read_px) == [10.0, 11.0, 12.0]
+
+def test_store_merge_deduplicates_keeping_new_values(tmp_path):
+    store = MarketChartStore(tmp_path)
+    store.merge(KEY, T0 + np.arange(3) * HOUR_MS, [1.0, 2.0, 3.0])
+    store.merge(KEY, T0 + np.arange(2, 5) * HOUR_MS, [30.0, 4.0, 5.0])
+    _, prices = store.read(KEY)
+    assert list(prices) == [1.0, 2.0, 30.0, 4.0, 5.0]
+    assert store.bounds(KEY) == (T0, T0 + 4 * HOUR_MS)
+
+def test_store_merge_replaces_from_timestamp(tmp_path):
+    store = MarketChartStore(tmp_path)
+    #the last stored point of 2023 is an unaligned live point
+    store.merge(KEY, [T0, T0 + HOUR_MS, T0 + 23 * HOUR_MS + 600_000], [1.0, 2.0, 99.0])
+    store.merge(KEY, [T0 + 23 * HOUR_MS + 300_000, T0 + 24 * HOUR_MS], [24.0, 25.0], replace_from_ms=T0 + 23 * HOUR_MS)
+    timestamps, prices = store.read(KEY)
+    assert list(timestamps) == [T0, T0 + HOUR_MS, T0 + 23 * HOUR_MS + 300_000, T0 + 24 * HOUR_MS]
+    assert list(prices) == [1.0, 2.0, 24.0, 25.0]
+    #replacing a whole year file removes it
+    store.merge(KEY, [T0 + 25 * HOUR_MS], [26.0], replace_from_ms=T0 + 24 * HOUR_MS)
+    assert list(store.read(KEY)[1]) == [1.0, 2.0, 24.0, 26.0]
+    store.merge(KEY, [T0 + 25 * HOUR_MS], [26.0], replace_from_ms=T0)
+    assert sorted(p.name for p in store.partition_dir(KEY).iterdir()) == ['year=2024.parquet']
+    assert store.bounds(KEY) == (T0 + 25 * HOUR_MS, T0 + 25 * HOUR_MS)
+
+def test_store_bounds_survive_a_concurrent_merge(tmp_path):
+    store = MarketChartStore(tmp_path)
+    store.merge(KEY, T0 + np.arange(3) * HOUR_MS, np.ones(3))
+
+    class DroppedAtOnce(dict):
+        #a merge landing right after the fill drops the entry
+        def __setitem__(self, key, value):
+            pass
+    store._bounds = DroppedAtOnce()
+    assert store.bounds(KEY) == (T0, T0 + 2 * HOUR_MS)
+
+def test_store_keeps_volumes(tmp_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    store = MarketChartStore(tmp_path)
+    store.merge(KEY, T0 + np.arange(3) * HOUR_MS, [1.0, 2.0, 3.0], [10.0, np.nan, 30.0])
+    store.merge(KEY, T0 + np.arange(3, 5) * HOUR_MS, [4.0, 5.0]) #no volumes -> NaN
+    timestamps, prices, volumes = store.read(KEY, with_volumes=True)
+    assert list(prices) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert volumes[0] == 10.0 and volumes[2] == 30.0 and np.isnan(volumes[[1, 3, 4]]).all()
+    assert len(store.read(KEY)) == 2
+
+    #a year file written before the volume column existed reads as NaN volumes
+    path = store.partition_dir(KEY) / 'year=2023.parquet'
+    pq.write_table(pa.table({'timestamp': pa.array([T0], pa.int64()), 'price': [7.0]}), path)
+    store.merge(KEY, [T0 + HOUR_MS], [8.0], [80.0])
+    _, prices, volumes = store.read(KEY, end_ms=T0 + HOUR_MS, with_volumes=True)
+    assert list(prices) == [7.0, 8.0] and np.isnan(volumes[0]) and volumes[1] == 80.0
+
+
+# 2 ) Delta fetch in the CoinGecko adapter
+
+def _raw(start_ms: int, n: int, step_ms: int, first_price: float = 0.0) -> dict:
+    return {'prices': [[start_ms + i * step_ms, first_price + i] for i in range(n)]}
+
+def test_store_backed_fetch_full_then_delta_then_none(tmp_path, monkeypatch):
+    now = {'ms': T0 + 30 * DAY_MS}
+    full_calls, range_calls = [], []
+
+    def fake_full(sym, curr, days):
+        full_calls.append(days)
+        return _raw(now['ms'] - days * DAY_MS, days * 24 + 1, HOUR_MS)
+
+    def fake_range(sym, curr, from_s, to_s):
+        range_calls.append((from_s, to_s))
+        #short range -> CoinGecko answers with 5-minute points
+        start = from_s * 1000
+        n = (to_s * 1000 - start) // 300_000 + 1
+        return _raw(start, n, 300_000, first_price=1000.0)
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", MarketChartStore(tmp_path))
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now['ms'])
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", fake_full)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_range_coingecko", fake_range)
+
+    # first call: nothing stored -> full download
+    chart = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    assert full_calls == [30]
+    assert len(chart.points) == 30 * 24 + 1
+
+    # 10 minutes later: younger than one hourly step -> served from disk only
+    now['ms'] += 10 * 60_000
+    chart = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 7)
+    assert full_calls == [30]
+    assert range_calls == []
+    assert len(chart.points) == 7 * 24
+
+    # 3 hours later: only the missing tail is downloaded, thinned back to hourly points
+    now['ms'] += 3 * HOUR_MS
+    last_stored = T0 + 30 * DAY_MS
+    chart = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    assert full_calls == [30]
+    assert range_calls == [(last_stored // 1000, now['ms'] // 1000)]
+    timestamps, _ = coingecko.MARKET_CHART_STORE.read(KEY, start_ms=last_stored)
+    assert list(np.diff(timestamps)) == [HOUR_MS] * 3
+
+    # a longer window than the stored history -> full download again
+    coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 60)
+    assert full_calls == [30, 60]
+
+def test_store_backed_fetch_keeps_volumes(tmp_path, monkeypatch):
+    now_ms = T0 + 30 * DAY_MS
+
+    def fake_full(sym, curr, days):
+        raw = _raw(now_ms - days * DAY_MS, days * 24 + 1, HOUR_MS)
+        raw['total_volumes'] = [[t, 2 * p] for t, p in raw['prices']]
+        return raw
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", MarketChartStore(tmp_path))
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now_ms)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", fake_full)
+    chart = coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    assert np.array_equal(chart.total_volumes, 2 * chart.prices)
+
+    #series stored without volumes -> no volume column
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", lambda sym, curr, days: _raw(now_ms - days * DAY_MS, days * 24 + 1, HOUR_MS))
+    chart = coingecko._fetch_parsed_market_chart_coingecko(Symbol.ETH, Currency.USD, 30)
+    assert chart.total_volumes is None
+
+def test_store_thins_on_the_absolute_grid_and_replaces_the_live_point(tmp_path, monkeypatch):
+    #CoinGecko hourly points are a few minutes past the hour, and every answer ends with the live price of the request time
+    offset = 5 * 60_000
+    now = {'ms': T0 + 30 * DAY_MS + 2 * 60_000} #hh:02, before the hh:05 point exists
+
+    def with_live_point(points):
+        return {'prices': points + [[now['ms'], -1.0]]}
+
+    def fake_full(sym, curr, days):
+        first = (now['ms'] - days * DAY_MS) // HOUR_MS * HOUR_MS + HOUR_MS + offset
+        return with_live_point([[t, float(t // HOUR_MS)] for t in range(first, now['ms'], HOUR_MS)])
+
+    def fake_range(sym, curr, from_s, to_s):
+        #5-minute points at hh:00:30, hh:05:30, ...
+        return with_live_point([[t, float(t // HOUR_MS)] for t in range(from_s * 1000 + 30_000, to_s * 1000, 300_000)])
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", MarketChartStore(tmp_path))
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now['ms'])
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", fake_full)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_range_coingecko", fake_range)
+
+    coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    timestamps, prices = coingecko.MARKET_CHART_STORE.read(KEY)
+    #the live point is alone in the current hour: stored for now
+    assert timestamps[-1] == now['ms'] and prices[-1] == -1.0
+    live_ms = now['ms']
+
+    now['ms'] += 3 * HOUR_MS
+    coingecko._fetch_parsed_market_chart_coingecko(Symbol.BTC, Currency.USD, 30)
+    timestamps, prices = coingecko.MARKET_CHART_STORE.read(KEY)
+    #one point per hour of the absolute grid, the old live point replaced by the first point of its hour
+    assert len(np.unique(timestamps // HOUR_MS)) == len(timestamps)
+    assert live_ms not in timestamps
+    assert live_ms // HOUR_MS * HOUR_MS + 30_000 in timestamps
+    assert -1.0 not in prices[:-1]
+
+def test_store_backed_range_fetch_reads_only_the_range(tmp_path, monkeypatch):
+    now_ms = T0 + 30 * DAY_MS
+
+    def fake_full(sym, curr, days):
+        return _raw(now_ms - days * DAY_MS, days * 24 + 1, HOUR_MS)
+
+    store = MarketChartStore(tmp_path)
+    reads = []
+    original_read = store.read
+    def spy_read(key, start_ms=None, end_ms=None, **kwargs):
+        reads.append((start_ms, end_ms))
+        return original_read(key, start_ms, end_ms, **kwargs)
+    store.read = spy_read
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", store)
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now_ms)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", fake_full)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", coingecko.MarketChartCache())
+
+    start_ms, end_ms = now_ms - 2 * DAY_MS, now_ms - DAY_MS
+    chart = coingecko.infra_get_parsed_market_chart_range_coingecko(Symbol.BTC, Currency.USD, 30, start_ms, end_ms)
+    assert reads == [(start_ms, end_ms)]
+    assert len(chart) == 25
+    assert chart.timestamps[0] == start_ms and chart.timestamps[-1] == end_ms
+    #partial results are not cached
+    assert coingecko.MARKET_CHART_CACHE.stats()['entries'] == 0
+
+    #a start older than the window is clamped to the window
+    chart = coingecko.infra_get_parsed_market_chart_range_coingecko(Symbol.BTC, Currency.USD, 30, 0, None)
+    assert reads[-1] == (now_ms - 30 * DAY_MS, None)
+    assert len(chart) == 30 * 24 + 1
+
+def test_store_backed_fetch_async(tmp_path, monkeypatch):
+    now_ms = T0 + 30 * DAY_MS
+
+    async def fake_full(sym, curr, days):
+        return _raw(now_ms - days * DAY_MS, days * 24 + 1, HOUR_MS)
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", MarketChartStore(tmp_path))
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now_ms)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko_async", fake_full)
+
+    parsed_in = []
+    original_parse = coingecko.infra_parse_raw_market_chart_coingecko
+    def spy_parse(*args, **kwargs):
+        parsed_in.append(threading.current_thread())
+        return original_parse(*args, **kwargs)
+    monkeypatch.setattr(coingecko, "infra_parse_raw_market_chart_coingecko", spy_parse)
+
+    chart = asyncio.run(coingecko._fetch_parsed_market_chart_coingecko_async(Symbol.BTC, Currency.USD, 10))
+    assert len(chart.points) == 10 * 24 + 1
+    #parsed in a worker thread, not on the event loop
+    assert parsed_in and threading.main_thread() not in parsed_in
+    assert coingecko.MARKET_CHART_STORE.bounds(KEY) == (now_ms - 10 * DAY_MS, now_ms)
+
+
+# 3 ) Per-year summaries
+
+def _count_summary(timestamps, prices):
+    return {'n': len(prices), 'sum': float(prices.sum())}
+
+def test_store_summaries_use_sidecars_for_whole_years(tmp_path):
+    store = MarketChartStore(tmp_path)
+    #daily points over 2022, 2023 and the start of 2024
+    key = (Provider.COINGECKO, Symbol.BTC, Currency.USD, Granularity.DAILY)
+    ts = np.datetime64('2022-01-01', 'ms').astype(np.int64) + np.arange(800) * DAY_MS
+    store.merge(key, ts, np.ones(800))
+
+    reads = []
+    original_read_file = store._read_file
+    def spy_read_file(path, start_ms=None, end_ms=None):
+        reads.append((path.name, start_ms))
+        return original_read_file(path, start_ms, end_ms)
+    store._read_file = spy_read_file
+
+    start = int(ts[100])
+    assert store.summaries(key, 'count', _count_summary, start_ms=start) == ([{'n': 265, 'sum': 265.0}, {'n': 365, 'sum': 365.0}, {'n': 70, 'sum': 70.0}], int(ts[-1]))
+    assert store.summaries(key, 'count', _count_summary, end_ms=int(ts[500])) == ([{'n': 365, 'sum': 365.0}, {'n': 136, 'sum': 136.0}], int(ts[500]))
+    assert store.summaries(key, 'count', _count_summary, start_ms=int(ts[-1]) + 1) == ([], None)
+    #sidecars built once per year, the cut year (2022) also reads its range
+    assert sorted(p.name for p in store.partition_dir(key).glob('*.json')) == ['year=2022.count.json', 'year=2023.count.json', 'year=2024.count.json']
+    reads.clear()
+    assert sum(s['n'] for s in store.summaries(key, 'count', _count_summary, start_ms=start)[0]) == 700
+    assert reads == [('year=2022.parquet', start)]
+
+    #a merge rewrites 2024 and drops its stale summary only
+    store.merge(key, ts[-1:] + DAY_MS, [1.0])
+    assert not (store.partition_dir(key) / 'year=2024.count.json').exists()
+    assert (store.partition_dir(key) / 'year=2023.count.json').exists()
+    assert store.summaries(key, 'count', _count_summary)[0][-1] == {'n': 71, 'sum': 71.0}
+
+def test_store_backed_summaries_fetch(tmp_path, monkeypatch):
+    now_ms = T0 + 30 * DAY_MS
+    full_calls = []
+
+    def fake_full(sym, curr, days):
+        full_calls.append(days)
+        return _raw(now_ms - days * DAY_MS, days * 24 + 1, HOUR_MS)
+
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now_ms)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko", fake_full)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", None)
+    assert coingecko.infra_get_market_chart_summaries_coingecko(Symbol.BTC, Currency.USD, 30, 'count', _count_summary) is None
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", MarketChartStore(tmp_path))
+    summaries, last_ms = coingecko.infra_get_market_chart_summaries_coingecko(Symbol.BTC, Currency.USD, 30, 'count', _count_summary)
+    #the store is filled like a fetch, the window spans 2023 and 2024
+    assert full_calls == [30]
+    assert [s['n'] for s in summaries] == [24, 30 * 24 + 1 - 24]
+    assert last_ms == now_ms
+
+def test_store_update_is_single_flight(tmp_path, monkeypatch):
+    #concurrent summaries and range reads of one series share one download and one merge, then each reads its part
+    now_ms = T0 + 30 * DAY_MS
+    full_calls = []
+
+    async def fake_full(sym, curr, days):
+        full_calls.append(days)
+        await asyncio.sleep(0.05)
+        return _raw(now_ms - days * DAY_MS, days * 24 + 1, HOUR_MS)
+
+    monkeypatch.setattr(coingecko, "MARKET_CHART_STORE", MarketChartStore(tmp_path))
+    monkeypatch.setattr(coingecko, "_now_ms", lambda: now_ms)
+    monkeypatch.setattr(coingecko, "infra_get_raw_market_chart_coingecko_async", fake_full)
+    monkeypatch.setattr(coingecko, "MARKET_CHART_CACHE", coingecko.MarketChartCache())
+    monkeypatch.setattr(coingecko, "MARKET_CHART_FLIGHT_ASYNC", coingecko.AsyncSingleFlight())
+
+    async def requests():
+        summaries = [coingecko.infra_get_market_chart_summaries_coingecko_async(Symbol.BTC, Currency.USD, 30, 'count', _count_summary) for _ in range(4)]
+        ranges = [coingecko.infra_get_parsed_market_chart_range_coingecko_async(Symbol.BTC, Currency.USD, 30, now_ms - i * DAY_MS, None) for i in range(1, 5)]
+        return await asyncio.gather(*summaries, *ranges)
+
+    results = asyncio.run(requests())
+    assert full_calls == [30]
+    assert all(sum(s['n'] for s in summaries) == 30 * 24 + 1 and last_ms == now_ms for summaries, last_ms in results[:4])
+    assert [len(chart) for chart in results[4:]] == [i * 24 + 1 for i in range(1, 5)]
+
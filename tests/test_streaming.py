@@ -0,0 +1,116 @@
+import asyncio
+import json
+import tracemalloc
+
+import httpx
+import numpy as np
+import pytest
+
+from app.domain.entities import Symbol, Currency
+from app.infrastructure import coingecko
+from app.infrastructure.errors import InfrastructureExternalApiMalformedResponse, InfrastructureExternalApiError
+from app.infrastructure.streaming import MarketChartStreamDecoder, decode_market_chart_stream
+
+T0 = 1_700_000_000_000
+HOUR_MS = 3_600_000
+
+
+def build_body(rows: int, indent: int | None = None) -> bytes:
+    data = {
+        'prices':        [[T0 + i * HOUR_MS, 30000.25 + i] for i in range(rows)],
+        'market_caps':   [],
+        'total_volumes': [[T0 + i * HOUR_MS, None if i == 1 else i * 1.5] for i in range(rows)],
+    }
+    return json.dumps(data, indent=indent).encode()
+
+def chunked(body: bytes, size: int):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+# 1 ) Decoder
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 64, 4096, 10**7])
+def test_decoder_any_chunk_boundaries(chunk_size):
+    body = build_body(500, indent=1 if chunk_size == 7 else None)
+    series = decode_market_chart_stream(chunked(body, chunk_size))
+    timestamps, prices = series['prices']
+    assert timestamps.dtype == np.int64 and prices.dtype == np.float64
+    assert np.array_equal(timestamps, T0 + np.arange(500) * HOUR_MS)
+    assert np.array_equal(prices, 30000.25 + np.arange(500))
+    assert len(series['market_caps'][0]) == 0
+    volumes = series['total_volumes'][1]
+    assert np.isnan(volumes[1]) and volumes[2] == 3.0
+
+def test_decoder_only_requested_keys():
+    series = decode_market_chart_stream(chunked(build_body(10), 100), keys=('prices',))
+    assert list(series) == ['prices']
+
+@pytest.mark.parametrize('body', [
+    b'{"prices": [[1, 2], [3, "x"]]}',
+    b'{"prices": [[1, 2, 3]]}',
+    b'{"prices": [[1], [2, 3]]}',
+    b'{"prices": [[null, 2]]}',
+])
+def test_decoder_malformed(body):
+    with pytest.raises(InfrastructureExternalApiMalformedResponse):
+        decode_market_chart_stream(chunked(body, 5))
+
+def test_decoder_truncated_body():
+    body = build_body(50)
+    decoder = MarketChartStreamDecoder()
+    decoder.feed(body[:len(body) // 3])
+    with pytest.raises(InfrastructureExternalApiMalformedResponse):
+        decoder.finish()
+
+def test_decoder_memory_ceiling():
+    #A 100k-point history (~5 MB of JSON) decoded in 64 KiB chunks: the peak stays close to the size of the output arrays,
+    #while response.json() alone allocates several times the payload.
+    rows = 100_000
+    body = build_body(rows)
+    tracemalloc.start()
+    try:
+        series = decode_market_chart_stream(chunked(body, 64 * 1024), keys=('prices',))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    output_bytes = rows * 16
+    assert len(series['prices'][0]) == rows
+    assert peak < 4 * output_bytes + 1024 * 1024
+
+    tracemalloc.start()
+    try:
+        json.loads(body)
+        _, json_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak * 4 < json_peak
+
+
+# 2 ) CoinGecko streamed fetch through an injected client
+
+def mock_transport(body: bytes, status_code: int = 200) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(status_code, content=body)
+    return httpx.MockTransport(handler)
+
+def test_streamed_market_chart_sync():
+    with httpx.Client(transport=mock_transport(build_body(100))) as client:
+        chart = coingecko.infra_get_streamed_market_chart_coingecko(Symbol.BTC, Currency.USD, 365, client=client)
+    assert len(chart) == 100
+    assert chart.prices[0] == 30000.25
+
+def test_streamed_market_chart_async():
+    async def run():
+        async with httpx.AsyncClient(transport=mock_transport(build_body(100))) as client:
+            return await coingecko.infra_get_streamed_market_chart_coingecko_async(Symbol.BTC, Currency.USD, 365, client=client)
+    chart = asyncio.run(run())
+    assert len(chart) == 100
+
+def test_streamed_market_chart_errors():
+    with httpx.Client(transport=mock_transport(b'Too Many Requests', 429)) as client:
+        with pytest.raises(InfrastructureExternalApiError):
+            coingecko.infra_get_streamed_market_chart_coingecko(Symbol.BTC, Currency.USD, 365, client=client)
+    with httpx.Client(transport=mock_transport(b'{"error": "oops"}')) as client:
+        with pytest.raises(InfrastructureExternalApiMalformedResponse):
+            coingecko.infra_get_streamed_market_chart_coingecko(Symbol.BTC, Currency.USD, 365, client=client)